@@ -0,0 +1,246 @@
+import re
+
+import numpy as np
+
+# Small rule language for entry/exit signals, compiled once into NumPy
+# evaluators. A condition is an expression such as
+#
+#     macd crosses_above signal and rsi[1] < rsi_entry_min
+#
+# Operands are column names, numbers (-1 included) or parameter names given at
+# compile time; name[n] is the value n candles back. Operators: > < >= <= == != crosses_above
+# crosses_below, combined with and / or / not and parentheses. A bare column
+# name is true where the column is true (boolean flags).
+#
+# Evaluators take a DataFrame or a dict of arrays, 1-D (time) or 2-D
+# (symbols, time) as produced by indicators.kernels, and return boolean arrays
+# of the same shape, so one call covers every symbol and every candle.
+
+TOKEN = re.compile(r'\s*(?:(-?(?:\d+(?:\.\d*)?|\.\d+))|([A-Za-z_]\w*)|(>=|<=|==|!=|>|<|\[|\]|\(|\)))')
+COMPARISONS = {
+    '>': np.greater,
+    '<': np.less,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+CROSSES = ('crosses_above', 'crosses_below')
+KEYWORDS = ('and', 'or', 'not') + CROSSES
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Invalid rule syntax at '{expression[position:]}' in: {expression}")
+        number, name, symbol = match.groups()
+        tokens.append(('number', float(number)) if number else ('name', name) if name else ('symbol', symbol))
+        position = match.end()
+    return tokens
+
+
+def shift(values, periods):
+    """ values periods candles back along the time axis, NaN where there is no history """
+    values = np.asarray(values, dtype=np.float64)
+    if periods == 0:
+        return values
+    out = np.full(values.shape, np.nan)
+    if periods < values.shape[-1]:
+        out[..., periods:] = values[..., :-periods]
+    return out
+
+
+class _Columns:
+    # Column lookup with the conversion to float arrays done once per evaluation
+    def __init__(self, values):
+        self.values = values
+        self.cache = {}
+
+    def __getitem__(self, name):
+        if name not in self.cache:
+            try:
+                column = self.values[name]
+            except KeyError:
+                raise KeyError(f"Column {name} not found for rule evaluation.")
+            column = np.asarray(column)
+            self.cache[name] = column.astype(np.float64) if column.dtype == bool else column
+        return self.cache[name]
+
+
+class _Parser:
+    def __init__(self, expression, params):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.params = params
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None:
+            raise ValueError(f"Unexpected end of rule: {self.expression}")
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValueError(f"Expected {value or kind} at token {self.position} in: {self.expression}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected '{self.peek()[1]}' in: {self.expression}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ('name', 'or'):
+            self.take()
+            left, right = node, self.parse_and()
+            node = lambda columns, left=left, right=right: left(columns) | right(columns)
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ('name', 'and'):
+            self.take()
+            left, right = node, self.parse_not()
+            node = lambda columns, left=left, right=right: left(columns) & right(columns)
+        return node
+
+    def parse_not(self):
+        if self.peek() == ('name', 'not'):
+            self.take()
+            inner = self.parse_not()
+            return lambda columns: ~inner(columns)
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        if self.peek() == ('symbol', '('):
+            self.take()
+            node = self.parse_or()
+            self.take('symbol', ')')
+            return node
+        left = self.parse_operand()
+        kind, value = self.peek()
+        if kind == 'symbol' and value in COMPARISONS:
+            self.take()
+            right = self.parse_operand()
+            compare = COMPARISONS[value]
+            return lambda columns: _compare(compare, left(columns), right(columns))
+        if kind == 'name' and value in CROSSES:
+            self.take()
+            right = self.parse_operand()
+            above = value == 'crosses_above'
+            return lambda columns: _cross(left, right, columns, above)
+        # A bare operand is a boolean flag
+        return lambda columns: _compare(np.equal, left(columns), 1.0)
+
+    def parse_operand(self):
+        kind, value = self.take()
+        if kind == 'number':
+            return _constant(value)
+        if kind != 'name' or value in KEYWORDS:
+            raise ValueError(f"Expected a column, number or parameter instead of '{value}' in: {self.expression}")
+        if value in self.params:
+            return _constant(float(self.params[value]))
+        periods = 0
+        if self.peek() == ('symbol', '['):
+            self.take()
+            periods = self.take('number')[1]
+            if periods < 0 or periods != int(periods):
+                raise ValueError(f"Lookback of {value} has to be a whole number of candles >= 0 in: {self.expression}")
+            periods = int(periods)
+            self.take('symbol', ']')
+        return lambda columns, name=value, periods=periods: shift(columns[name], periods) if periods else columns[name]
+
+
+def _constant(value):
+    return lambda columns: value
+
+
+def _compare(compare, left, right):
+    with np.errstate(invalid='ignore'):
+        return np.asarray(compare(left, right), dtype=bool)
+
+
+def _cross(left, right, columns, above):
+    # Same as (a > b) & (a.shift() <= b.shift()) in pandas, NaN never crosses
+    a, b = left(columns), right(columns)
+    a_before, b_before = shift(a, 1) if np.ndim(a) else a, shift(b, 1) if np.ndim(b) else b
+    if above:
+        return _compare(np.greater, a, b) & _compare(np.less_equal, a_before, b_before)
+    return _compare(np.less, a, b) & _compare(np.greater_equal, a_before, b_before)
+
+
+def lookback(expression):
+    """ Candles of history a condition reads besides the current one """
+    tokens = _tokenize(expression)
+    periods = [int(tokens[i + 1][1]) for i, token in enumerate(tokens[:-1]) if token == ('symbol', '[')]
+    crosses = any(token[0] == 'name' and token[1] in CROSSES for token in tokens)
+    return max(periods, default=0) + int(crosses)
+
+
+def compile_condition(expression, **params):
+    """ Evaluator for one condition: evaluator(values) -> boolean array """
+    node = _Parser(expression, params).parse()
+    return lambda values: node(values if isinstance(values, _Columns) else _Columns(values))
+
+
+class Rule:
+    """
+    Named conditions that must all hold, e.g. the entry rule of a bot.
+    Compiled once; evaluate() returns (signal, {condition name: mask}).
+    """
+    def __init__(self, conditions, **params):
+        self.conditions = dict(conditions)
+        self.params = params
+        self.evaluators = {name: compile_condition(expression, **params) for name, expression in self.conditions.items()}
+        # Rows an incremental evaluation has to keep, the current one included
+        self.window = max((lookback(expression) for expression in self.conditions.values()), default=0) + 1
+
+    def evaluate(self, values):
+        columns = _Columns(values)
+        masks = {name: evaluator(columns) for name, evaluator in self.evaluators.items()}
+        signal = None
+        for mask in masks.values():
+            signal = mask if signal is None else signal & mask
+        return signal, masks
+
+    @staticmethod
+    def failed_conditions(masks, index=-1):
+        """
+        Names of the conditions that did not hold at candle index. For 2-D
+        values a list per symbol is returned.
+        """
+        names = list(masks)
+        if not names:
+            return []
+        held = np.stack([masks[name][..., index] for name in names], axis=-1)
+        if held.ndim == 1:
+            return [name for name, ok in zip(names, held) if not ok]
+        return [[name for name, ok in zip(names, row) if not ok] for row in held]
+
+
+class SignalRules:
+    """
+    Ordered (label, condition) pairs mapped onto one label per candle. Later
+    matches override earlier ones, like successive df.loc[...] assignments.
+    """
+    def __init__(self, rules, default, **params):
+        self.rules = [(label, compile_condition(expression, **params)) for label, expression in rules]
+        self.default = default
+
+    def evaluate(self, values):
+        columns = _Columns(values)
+        labels = None
+        for label, evaluator in self.rules:
+            mask = evaluator(columns)
+            if labels is None:
+                labels = np.full(mask.shape, self.default, dtype=np.array([self.default] + [rule[0] for rule in self.rules]).dtype)
+            labels[mask] = label
+        return labels
@@ -0,0 +1,127 @@
+import inspect
+from collections import deque
+
+import numpy as np
+
+from analysis.rules import Rule
+from indicators import kernels
+from indicators.frames import cached_columns
+from indicators.streaming import IndicatorSet
+
+# A strategy is its entry conditions (rules language) over the indicators of
+# kernels.compute_indicators / IndicatorSet, defined once and run two ways:
+# signals() over a whole close history for backtests, and stream() one closed
+# candle at a time for the live bots. Both compute the same indicators with the
+# same warm-up, so they give the same signal on every candle (parity_mismatches
+# checks it).
+
+# Parameters of kernels.compute_indicators, the others are rule parameters
+INDICATOR_PARAMS = {name: parameter.default for name, parameter in
+                    inspect.signature(kernels.compute_indicators).parameters.items() if name != 'closes'}
+
+
+class Strategy:
+    """
+    Named entry rule plus its parameters, e.g.
+    Strategy('claude', conditions, rsi_entry_min=50, fast_length=12).
+    Indicator parameters (INDICATOR_PARAMS) take their kernel defaults.
+    """
+    def __init__(self, name, conditions, **params):
+        self.name = name
+        self.conditions = dict(conditions)
+        self.indicator_params = {key: params.get(key, default) for key, default in INDICATOR_PARAMS.items()}
+        self.rule_params = {key: value for key, value in params.items() if key not in INDICATOR_PARAMS}
+        self.rule = Rule(self.conditions, **self.rule_params)
+
+    @property
+    def params(self):
+        return {**self.indicator_params, **self.rule_params}
+
+    def replace(self, **params):
+        """ Same conditions with some parameters changed """
+        return Strategy(self.name, self.conditions, **{**self.params, **params})
+
+    def indicators(self, close):
+        """ {column: array} for a close array, 1-D or (symbols, time) """
+        values = kernels.compute_indicators(close, **self.indicator_params)
+        return {name: value for name, value in values.items() if name != 'close'}
+
+    def add_indicators(self, df, interval=None):
+        """ Adds the indicator columns to df, memoized in the shared IndicatorCache """
+        return cached_columns(df, 'indicator_set', self.indicator_params, self.indicators, interval=interval)
+
+    def signals(self, close):
+        """ Vectorized: (signal, {condition name: mask}) for every candle of close """
+        close = np.asarray(close, dtype=np.float64)
+        return self.rule.evaluate({'close': close, **self.indicators(close)})
+
+    def stream(self):
+        return StrategyStream(self)
+
+
+class StrategyStream:
+    """
+    Incremental state of a strategy for one symbol. update(close) consumes a
+    closed candle in O(1) and returns (signal, {condition name: bool});
+    peek(close) does the same for the still open candle without changing the
+    state.
+    """
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.indicators = IndicatorSet(**strategy.indicator_params)
+        # Only the candles the conditions look back at are kept
+        self.history = deque(maxlen=strategy.rule.window)
+        self.count = 0
+        # Open time and result of the last candle consumed
+        self.open_time = None
+        self.last = (False, {})
+
+    def _evaluate(self, rows):
+        values = {name: np.array([np.nan if row[name] is None else row[name] for row in rows]) for name in rows[-1]}
+        signal, masks = self.strategy.rule.evaluate(values)
+        return bool(signal[-1]), {name: bool(mask[-1]) for name, mask in masks.items()}
+
+    def update(self, close, open_time=None):
+        self.history.append(self.indicators.update(float(close)))
+        self.count += 1
+        self.open_time = open_time
+        self.last = self._evaluate(list(self.history))
+        return self.last
+
+    def peek(self, close):
+        rows = list(self.history)[1:] if len(self.history) == self.history.maxlen else list(self.history)
+        return self._evaluate(rows + [self.indicators.peek(float(close))])
+
+    def warm_up(self, closes):
+        result = None
+        for close in closes:
+            result = self.update(close)
+        return result
+
+
+def parity_mismatches(strategy, close):
+    """
+    Candle indexes where the vectorized and the incremental mode of strategy
+    disagree over close, on the signal or on any condition; empty when both
+    modes agree on every candle.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    batch, batch_masks = strategy.signals(close)
+    stream = strategy.stream()
+    differs = np.zeros(len(close), dtype=bool)
+    for i, value in enumerate(close.tolist()):
+        signal, masks = stream.update(value)
+        differs[i] = signal != batch[i] or any(masks[name] != batch_masks[name][i] for name in masks)
+    return np.flatnonzero(differs).tolist()
+
+
+# Entry rule of CryptoTradingBot (trading_bot/claude.py), every condition has to hold on the candle
+CLAUDE_STRATEGY = Strategy('claude_macd_rsi_ema', {
+    'macd_cross': 'macd crosses_above signal',
+    'macd_above_zero': 'macd > 0',
+    'rsi_cross': 'rsi[1] < rsi_entry_min and rsi > rsi_entry_min',
+    'rsi_below_max': 'rsi < rsi_entry_max',
+    'price_above_ema200': 'close > ema_200',
+    #'volume_above_avg': 'volume > volume_sma_20'
+}, fast_length=12, slow_length=26, signal_smoothing=9, rsi_length=14, rsi_entry_min=50, rsi_entry_max=70)
+
@@ -1,22 +1,24 @@
-import ta
+from analysis.rules import SignalRules
+from indicators.frames import add_indicators_batch, add_rsi_sma
 import time
 
-from db.database import fetch_data, store_last_signal
+from db.feature_store import fetch_feature_candles, last_feature_time, last_signal_open_time, store_features, store_signals
 from analysis.send_signal import send_signal
 
+# Candles loaded before the first new one, so the indicators of new candles match a full recompute
+FEATURE_WARMUP = 500
+FEATURE_INDICATORS = ['rsi', 'sma_50', 'sma_200', 'macd', 'signal', 'bb_high', 'bb_mid', 'bb_low']
+
+# Later rules override earlier ones, candles matching none are HOLD
+SIGNAL_TYPES = SignalRules([
+    ('SELL', '(death_cross and overbought) or (golden_cross and overbought)'),
+    ('BUY', '(golden_cross and oversold) or (death_cross and oversold)'),
+    ('HOLD', '(golden_cross and not oversold and not overbought) or (death_cross and not oversold and not overbought)'),
+], default='HOLD')
+
 def calculate_indicators(df):
-    # Symbol
-    df['symbol'] = df['symbol']
-    # Calculate the 14-period RSI
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
-    
-    # Calculate the 50-period SMA
-    df['sma_50'] = ta.trend.SMAIndicator(df['close'], window=50).sma_indicator()
-    
-    # Calculate the 200-period SMA
-    df['sma_200'] = ta.trend.SMAIndicator(df['close'], window=200).sma_indicator()
-    
-    return df
+    # 14-period RSI, 50-period SMA and 200-period SMA
+    return add_rsi_sma(df)
 
 def analyze_signals(df):
     # Golden Cross
@@ -36,46 +38,58 @@ def signal_type(df):
         if column not in df.columns:
             raise KeyError(f"Column {column} not found in DataFrame.")
 
-    # Initialize the 'last_signal' column with empty strings
-    df['last_signal'] = 'HOLD'
+    df['last_signal'] = SIGNAL_TYPES.evaluate(df)
+    return df
 
-    # Apply SELL signals
-    df.loc[(df['death_cross'] & df['overbought']) | (df['golden_cross'] & df['overbought']), 'last_signal'] = 'SELL'
 
-    # Apply BUY signals
-    df.loc[(df['golden_cross'] & df['oversold']) | (df['death_cross'] & df['oversold']), 'last_signal'] = 'BUY'
+def update_features(symbols, interval='1d'):
+    """
+    Computes indicators and signal flags for the candles each symbol got since
+    the last run and upserts them into the feature store. The last stored candle
+    is computed again, it may still have been open. Returns {symbol: new rows}.
+    """
+    since = {symbol: last_feature_time(symbol, interval) for symbol in symbols}
+    frames = {symbol: fetch_feature_candles(symbol, interval, since[symbol], FEATURE_WARMUP) for symbol in symbols}
+    # Indicators for every symbol in one batched pass
+    frames = add_indicators_batch(frames, columns=FEATURE_INDICATORS, interval=interval)
+    features = {}
+    for symbol, df in frames.items():
+        df = analyze_signals(df)  # Analyze for trading signals
+        df = signal_type(df) # set signal type
+        df['signal_type'] = df['last_signal']
+        if since[symbol] is not None:
+            df = df[df['open_time'] >= since[symbol]]
+        store_features(symbol, interval, df)
+        features[symbol] = df
+    return features
 
-    # Apply HOLD signals
-    df.loc[(df['golden_cross'] & ~df['oversold'] & ~df['overbought']) | (df['death_cross'] & ~df['oversold'] & ~df['overbought']), 'last_signal'] = 'HOLD'
 
-    return df
+def backfill_signals(symbols, interval='1d', full=True):
+    """
+    Brings the feature store up to date and writes its signals to
+    trading_signals in one transaction: the whole stored history with full,
+    otherwise only candles from the last stored signal on.
+    """
+    update_features(symbols, interval)
+    since = {symbol: None if full else last_signal_open_time(symbol) for symbol in symbols}
+    return store_signals(since, interval)
 
 
-def start_market_pair_analysis(symbols=['BTCUSDT'], sleep=86400):
+def start_market_pair_analysis(symbols=['BTCUSDT'], sleep=86400, backfill=True):
+    if backfill:
+        start = time.perf_counter()
+        rows = backfill_signals(symbols)
+        print(f"Backfilled {rows} signals for {len(symbols)} symbols in {time.perf_counter() - start:.2f}s")
     while True:
-        for symbol in symbols:
-            df = fetch_data(symbol)
-            df = calculate_indicators(df)  # Calculate technical indicators
-            df = analyze_signals(df)  # Analyze for trading signals
-            df = signal_type(df) # set signal type
-
-            # Assuming analyze_signals returns a DataFrame with a 'last_signal' column
-            last_signal_row = df.iloc[-1]  # Get the last row which should have the latest signal
-
-            store_last_signal(symbol, last_signal_row['start_time'], 
-                              last_signal_row['last_signal'], 
-                              last_signal_row['rsi'], 
-                              last_signal_row['sma_50'],
-                              last_signal_row['sma_200'],
-                              int(last_signal_row['golden_cross']),
-                              int(last_signal_row['death_cross']),
-                              int(last_signal_row['overbought']),
-                              int(last_signal_row['oversold'])
-                              )
+        features = {symbol: df for symbol, df in update_features(symbols).items() if not df.empty}
+        # Every new candle goes to trading_signals, not only the last one
+        store_signals({symbol: df['open_time'].iloc[0] for symbol, df in features.items()})
+        for symbol, df in features.items():
+            # The last row holds the latest signal
+            last_signal_row = df.iloc[-1]
 
             # Optional: Print or log the analysis
             print(f"Last signal for {symbol}: {last_signal_row['last_signal']} at {last_signal_row['start_time']}")
             if last_signal_row['last_signal'] == 'SELL' or last_signal_row['last_signal'] == 'BUY':
                 send_signal(last_signal_row['last_signal'],symbol,'TELEGRAM')
         time.sleep(sleep)        
-
@@ -0,0 +1,15 @@
+from flask import request
+from flask_restful import Resource
+
+from db.feature_store import fetch_features
+
+
+class FeatureList(Resource):
+    def get(self, symbol):
+        # Optional ?interval=1d&start=<ms>&end=<ms>&columns=rsi,sma_50
+        columns = request.args.get('columns')
+        df = fetch_features(symbol.upper(), request.args.get('interval', '1d'),
+                            request.args.get('start', type=int), request.args.get('end', type=int),
+                            columns.split(',') if columns else None)
+        # NaN is not valid JSON
+        return df.astype(object).where(df.notna(), None).to_dict('records')
@@ -7,10 +7,12 @@ from db.database import get_db_cursor
 class SignalList(Resource):
     def get(self):
         conn = get_db_cursor()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM trading_signals")
-        orders = cursor.fetchall()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM trading_signals")
+            orders = cursor.fetchall()
+        finally:
+            conn.close()
 
         # Convert rows to a list of dicts
         orders_list = [dict(order) for order in orders]
@@ -1,17 +1,14 @@
 import pandas as pd
-import ta
+from indicators.frames import add_macd_rsi
 from binance.client import Client
 import matplotlib.pyplot as plt
-from configuration.binance_config import config as binance_config
+from backtesting.data import load_candles
+from db.backtest_results import run_hash, store_result, stored_hashes
+from db.database import setup_database
 import numpy as np
-import os
-import csv
 import math
+import time
 
-binance_config = binance_config()
-api_key = binance_config['api_key']
-api_secret = binance_config['api_secret']
-client = Client(api_key, api_secret)
 
 symbols = ['TRXUSDT', 'BTCUSDT','ETHUSDT']  # Example symbol
 timeframe = Client.KLINE_INTERVAL_1HOUR  
@@ -27,22 +24,16 @@ initial_balance = 1180  # Initial balance in USDT
 investment_percentage = 0.15  # equity per trade
 stop_loss_percentage = 0.05  # 2% stop los5
 commission_percentage = 0.001  # 0.1% commission
-metrics_file = 'backtest_metrics.csv'
+# Name of this strategy in the backtest results store
+strategy = 'buy_low_sell_high'
 
-# Fetch historical data (you may need to replace this with your data source)
+# Fetch historical data from the local candle database, downloading only missing ranges
 def fetch_historical_data(symbol, interval, start_str, end_str=None):
-    klines = client.get_historical_klines(symbol, interval, start_str, end_str)
-    df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-    df['close'] = df['close'].astype(float)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    return df
+    return load_candles(symbol, interval, start_str, end_str)
 
 # Calculate indicators
 def calculate_indicators(df):
-    macd = ta.trend.MACD(df['close'], window_slow=slow_length, window_fast=fast_length, window_sign=signal_smoothing)
-    df['macd'] = macd.macd()
-    df['signal'] = macd.macd_signal()
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=rsi_length).rsi()
+    add_macd_rsi(df, fast_length, slow_length, signal_smoothing, rsi_length)
     return df
 
 # Generate signals
@@ -130,22 +121,18 @@ def calculate_performance_metrics(trades, equity_curve, initial_balance):
         'sharpe_ratio': sharpe_ratio
     }
 
-# Function to write metrics to a CSV file
-def write_metrics_to_file(metrics, positions, symbol):
-    file_exists = os.path.isfile(metrics_file)
-    
-    with open(metrics_file, 'a', newline='') as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(['symbol', 'timeframe', 'fast_length', 'slow_length', 'signal_smoothing', 'rsi_length',
-                              'rsi_entry_min', 'rsi_entry_max', 'initial_balance',
-                             'investment_percentage', 'stop_loss_percentage', 'commission_percentage', 'win_rate',
-                             'avg_profit_loss', 'max_drawdown', 'sharpe_ratio','open_positions'])
-        
-        writer.writerow([symbol, timeframe, fast_length, slow_length, signal_smoothing, rsi_length, 
-                         rsi_entry_min, rsi_entry_max, initial_balance, investment_percentage,
-                         stop_loss_percentage, commission_percentage, metrics['win_rate'], metrics['avg_profit_loss'],
-                         metrics['max_drawdown'], metrics['sharpe_ratio'], len(positions)])
+# Parameters that identify a run in the backtest results store
+def backtest_params():
+    return {'timeframe': timeframe, 'fast_length': fast_length, 'slow_length': slow_length,
+            'signal_smoothing': signal_smoothing, 'rsi_length': rsi_length, 'rsi_entry_min': rsi_entry_min,
+            'rsi_entry_max': rsi_entry_max, 'initial_balance': initial_balance,
+            'investment_percentage': investment_percentage, 'stop_loss_percentage': stop_loss_percentage,
+            'commission_percentage': commission_percentage}
+
+# Store metrics in the backtest results store, keyed by the candle range actually tested
+def store_metrics(metrics, positions, symbol, start_date, end_date, seconds=None):
+    return store_result(strategy, symbol, start_date, end_date, backtest_params(),
+                        {**metrics, 'open_positions': len(positions)}, seconds)
 
 
 def plot_graphs(df, trades):
@@ -196,6 +183,11 @@ def plot_graphs(df, trades):
 # Main function to run the backtest
 def main(symbol):
     df = fetch_historical_data(symbol, timeframe, '2024-06-01')
+    start_date, end_date = df['timestamp'].iloc[0], df['timestamp'].iloc[-1]
+    if stored_hashes([run_hash(strategy, symbol, start_date, end_date, backtest_params())]):
+        print(f"Backtest for {symbol} from {start_date} to {end_date} is already stored, skipped")
+        return
+    started = time.perf_counter()
     df = calculate_indicators(df)
     df = generate_signals(df)
     df, trades, equity_curve , positions = backtest_strategy(df, initial_balance, investment_percentage, stop_loss_percentage, commission_percentage, symbol)
@@ -207,12 +199,13 @@ def main(symbol):
     for key, value in metrics.items():
         print(f"{key}: {value:.2f}")
     
-    # Write metrics to file
-    write_metrics_to_file(metrics, positions, symbol)
+    # Write metrics to the results store
+    store_metrics(metrics, positions, symbol, start_date, end_date, time.perf_counter() - started)
     plot_graphs(df, trades)   
     
 
 if __name__ == "__main__":
+    setup_database()
     for symbol in symbols:
         print(f'### {symbol} ### \n')
         main(symbol)
\ No newline at end of file
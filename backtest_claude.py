@@ -1,12 +1,38 @@
-import os
-import pandas as pd
-import numpy as np
+import time
 from binance.client import Client
-import ta
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
-from ta.trend import SMAIndicator
-import math
+from analysis.strategy import CLAUDE_STRATEGY
+from backtesting.data import load_candles
+from backtesting.engine import simulate_take_profit
+from db.backtest_results import run_hash, store_results, stored_hashes, top_results
+from db.database import setup_database
+
+# Name of this strategy in the backtest results store
+STRATEGY = f'{CLAUDE_STRATEGY.name}_take_profit'
+# Parameters that identify a run, and the run_backtest column holding each of them
+PARAM_COLUMNS = {
+    'trade_profit_percentage': 'take_profit_percentage_foreach_trade',
+    'diversification_percentage': 'diversification_percentage',
+    'fast_length': 'fast_length',
+    'slow_length': 'slow_length',
+    'signal_smoothing': 'signal_smoothing',
+    'rsi_length': 'rsi_length',
+    'rsi_entry_min': 'rsi_entry_min',
+    'rsi_entry_max': 'rsi_entry_max',
+    'initial_balance': 'initial_balance',
+}
+METRICS = ['total_profit', 'profit_percentage', 'num_trades', 'final_balance', 'open_positions_value']
+
+def result_record(result, seconds=None):
+    """ store_results entry of a run_backtest (or sweep) row """
+    return {
+        'strategy': result.get('strategy', STRATEGY),
+        'symbol': result['symbol'],
+        'start_date': result['start_date'],
+        'end_date': result['end_date'],
+        'params': {name: result[column] for name, column in PARAM_COLUMNS.items()},
+        'metrics': {name: result[name] for name in METRICS},
+        'seconds': seconds,
+    }
 
 class CryptoTradingBotBacktest:
     def __init__(self, symbol, start_date, end_date, initial_balance=10000):
@@ -26,66 +52,45 @@ class CryptoTradingBotBacktest:
         self.trade_profit_percentage = 0.05
         self.diversification_percentage = 0.1
 
+    def params(self):
+        return {name: getattr(self, name) for name in PARAM_COLUMNS}
+
+    def run_hash(self):
+        return run_hash(STRATEGY, self.symbol, self.start_date, self.end_date, self.params())
+
+    def strategy(self):
+        # The live strategy with this backtest's parameters
+        return CLAUDE_STRATEGY.replace(fast_length=self.fast_length, slow_length=self.slow_length,
+                                       signal_smoothing=self.signal_smoothing, rsi_length=self.rsi_length,
+                                       rsi_entry_min=self.rsi_entry_min, rsi_entry_max=self.rsi_entry_max)
+
     def get_historical_data(self):
-        client = Client()
-        klines = client.get_historical_klines(self.symbol, Client.KLINE_INTERVAL_1HOUR, self.start_date, self.end_date)
-        df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['close'] = df['close'].astype(float)
-        return df
+        # Local candles, only the missing ranges are downloaded
+        return load_candles(self.symbol, Client.KLINE_INTERVAL_1HOUR, self.start_date, self.end_date)
     
     def calculate_indicators(self, df):
-        macd = ta.trend.MACD(df['close'], window_slow=self.slow_length, window_fast=self.fast_length, window_sign=self.signal_smoothing)
-        df['macd'] = macd.macd()
-        df['signal'] = macd.macd_signal()
-        df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=self.rsi_length).rsi()
-        return df
-
-    def generate_buy_signal(self, row, prev_row):
-        # rsi_condition = row['rsi'] < 30
-        # bb_condition = prev_row['close'] <= prev_row['bb_lower'] and row['close'] > row['bb_lower']
-        # sma_condition = prev_row['sma50'] <= prev_row['sma200'] and row['sma50'] > row['sma200']
-        buysignal = ((row['macd'] > row['signal']) & 
-                        (prev_row['macd'] <= prev_row['signal']) &
-                        (row['rsi'] > self.rsi_entry_min) & 
-                        (row['rsi'] < self.rsi_entry_max))
-
-        return buysignal
+        return self.strategy().add_indicators(df)
+
+    def generate_buy_signals(self, df):
+        buy_signals, _ = self.strategy().rule.evaluate(df)
+        return buy_signals
 
     def simulate_trading(self, df, take_profit_percentage=0.03, diversification_percentage=0.1):
-        for i in range(1, len(df)):
-            current_row = df.iloc[i]
-            prev_row = df.iloc[i-1]
-
-            if self.generate_buy_signal(current_row, prev_row):
-                investment_amount = math.ceil(self.balance * diversification_percentage)
-                if investment_amount > 10:
-                    quantity = investment_amount / float(current_row['close'])
-                    entry_price = float(current_row['close'])
-                    take_profit_price = entry_price * (1 + take_profit_percentage)
-
-                    self.balance -= investment_amount
-                    self.positions.append({
-                        'entry_price': entry_price,
-                        'quantity': quantity,
-                        'take_profit_price': take_profit_price
-                    })
-
-            # Check for take profit
-            for position in self.positions[:]:
-                if float(current_row['high']) >= position['take_profit_price']:
-                    profit = (position['take_profit_price'] - position['entry_price']) * position['quantity']
-                    self.balance += position['quantity'] * position['take_profit_price']
-                    self.trades.append({
-                        'entry_price': position['entry_price'],
-                        'exit_price': position['take_profit_price'],
-                        'quantity': position['quantity'],
-                        'profit': profit
-                    })
-                    self.positions.remove(position)
-        # Calculate the value of remaining open positions
-        open_positions_value = sum(position['quantity'] * df.iloc[-1]['close'] for position in self.positions)
-        return open_positions_value             
+        buy_signals = self.generate_buy_signals(df)
+        # Vectorized engine, same trades as walking the bars one by one
+        result = simulate_take_profit(df['close'].to_numpy(dtype=float), df['high'].to_numpy(dtype=float), buy_signals,
+                                      self.balance, take_profit_percentage, diversification_percentage)
+        self.balance = result['balance']
+        trades = result['trades']
+        self.trades += [{'entry_price': entry_price, 'exit_price': exit_price, 'quantity': quantity, 'profit': profit}
+                        for entry_price, exit_price, quantity, profit in zip(trades['entry_price'].tolist(), trades['exit_price'].tolist(),
+                                                                             trades['quantity'].tolist(), trades['profit'].tolist())]
+        positions = result['positions']
+        self.positions += [{'entry_price': entry_price, 'quantity': quantity, 'take_profit_price': take_profit_price}
+                           for entry_price, quantity, take_profit_price in zip(positions['entry_price'].tolist(), positions['quantity'].tolist(),
+                                                                               positions['take_profit_price'].tolist())]
+        # Value of the remaining open positions
+        return result['open_positions_value']
 
     def run_backtest(self):
         df = self.get_historical_data()
@@ -118,39 +123,34 @@ class CryptoTradingBotBacktest:
         }
 
 # Run the backtest
-symbols = ['TRXUSDT', 'BTCUSDT','ETHUSDT', 'SOLUSDT', 'XRPUSDT', 'ADAUSDT'] 
-start_date = "1 Jan, 2024"
-end_date = "5 Dec, 2024"
-initial_balance = 3000
-
-# Define file name
-file_name = 'claude_backtest_results.csv'
-
-# Prepare a list to store results
-results_list = []
-
-for symbol in symbols:
-    backtest = CryptoTradingBotBacktest(symbol, start_date, end_date, initial_balance)
-    results = backtest.run_backtest()
-    results_list.append(results)
-
-    print(f"Backtest Results for {symbol} from {start_date} to {end_date}")
-    print(f"Initial Balance: ${initial_balance}")
-    print(f"Final Balance: ${results['final_balance']:.2f}")
-    print(f"Open Positions Value: ${results['open_positions_value']:.2f}")
-    print(f"Total Profit: ${results['total_profit']:.2f}")
-    print(f"Profit Percentage: {results['profit_percentage']:.2f}%")
-    print(f"Number of Trades: {results['num_trades']}")
-    print(f"Open positions: {len(backtest.positions)}")
-
-# Save results to a CSV file, appending if the file already exists
-results_df = pd.DataFrame(results_list)
-
-if os.path.exists(file_name):
-    existing_df = pd.read_csv(file_name)
-    combined_df = pd.concat([existing_df, results_df], ignore_index=True)
-    combined_df.to_csv(file_name, index=False)
-else:
-    results_df.to_csv(file_name, index=False)
-
-print(f"Backtest results have been {'appended to' if os.path.exists(file_name) else 'saved to'} '{file_name}'.")
+if __name__ == "__main__":
+    symbols = ['TRXUSDT', 'BTCUSDT','ETHUSDT', 'SOLUSDT', 'XRPUSDT', 'ADAUSDT'] 
+    start_date = "1 Jan, 2024"
+    end_date = "5 Dec, 2024"
+    initial_balance = 3000
+    setup_database()
+
+    # Prepare a list to store results
+    results_list = []
+
+    for symbol in symbols:
+        backtest = CryptoTradingBotBacktest(symbol, start_date, end_date, initial_balance)
+        if stored_hashes([backtest.run_hash()]):
+            print(f"Backtest for {symbol} from {start_date} to {end_date} is already stored, skipped")
+            continue
+        started = time.perf_counter()
+        results = backtest.run_backtest()
+        results_list.append(result_record(results, time.perf_counter() - started))
+
+        print(f"Backtest Results for {symbol} from {start_date} to {end_date}")
+        print(f"Initial Balance: ${initial_balance}")
+        print(f"Final Balance: ${results['final_balance']:.2f}")
+        print(f"Open Positions Value: ${results['open_positions_value']:.2f}")
+        print(f"Total Profit: ${results['total_profit']:.2f}")
+        print(f"Profit Percentage: {results['profit_percentage']:.2f}%")
+        print(f"Number of Trades: {results['num_trades']}")
+        print(f"Open positions: {len(backtest.positions)}")
+
+    # Save results to the backtest results store, runs already stored are skipped
+    print(f"{store_results(results_list)} backtest results stored.")
+    print(top_results('profit_percentage', 10, strategy=STRATEGY))
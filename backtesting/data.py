@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+import pandas as pd
+from binance.client import Client
+from binance.helpers import date_to_milliseconds, interval_to_milliseconds
+
+from brokers.binance import process_klines
+from db.database import (fetch_market_data_coverage, fetch_market_data_range, insert_market_data,
+                         insert_market_data_coverage, setup_database)
+
+# Historical candles for backtests from the local market_data table. Only open
+# times that are neither stored nor recorded as downloaded are requested from
+# Binance, so a repeated backtest runs offline. Downloaded ranges are recorded
+# in market_data_coverage, which also remembers ranges where the exchange has
+# no candles (listing dates, maintenance) so they are not asked for again.
+
+# Weekly candles open on Monday 00:00 UTC, four days after the epoch (a Thursday)
+GRID_OFFSETS = {'1w': 4 * 24 * 60 * 60 * 1000}
+
+_client = None
+_database_ready = False
+
+
+def _public_client():
+    # Klines need no API key; created on the first download only
+    global _client
+    if _client is None:
+        _client = Client()
+    return _client
+
+
+def _ready():
+    global _database_ready
+    if not _database_ready:
+        setup_database()
+        _database_ready = True
+
+
+def _milliseconds(value):
+    if value is None:
+        return None
+    return date_to_milliseconds(value) if isinstance(value, str) else int(value)
+
+
+def missing_ranges(symbol, interval, start, end):
+    """
+    [(first_open_time, last_open_time)] runs of candle open times between start
+    and end (epoch ms, both inclusive) that are neither stored nor covered.
+    Only candles that have closed by now are considered.
+    """
+    interval_ms = interval_to_milliseconds(interval)
+    if interval_ms is None:
+        raise ValueError(f"Local candles are not supported for interval {interval}")
+    offset = GRID_OFFSETS.get(interval, 0)
+    first = start + (offset - start) % interval_ms
+    last = min(end, int(time.time() * 1000) - interval_ms)
+    if last < first:
+        return []
+    grid = np.arange(first, last + 1, interval_ms, dtype=np.int64)
+    missing = ~np.isin(grid, fetch_market_data_range(symbol, interval, first, last + 1)['open_time'].to_numpy(dtype=np.int64))
+    for covered_first, covered_last in fetch_market_data_coverage(symbol, interval):
+        missing &= (grid < covered_first) | (grid > covered_last)
+    grid = grid[missing]
+    if len(grid) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(grid) != interval_ms)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(grid) - 1]))
+    return [(int(grid[a]), int(grid[b])) for a, b in zip(starts, ends)]
+
+
+def download(symbol, interval, first_open_time, last_open_time, client=None):
+    """ Stores the closed candles of one range and records it as covered. Returns the number of candles. """
+    client = client if client is not None else _public_client()
+    now = int(time.time() * 1000)
+    klines = [kline for kline in client.get_historical_klines(symbol, interval, first_open_time, last_open_time)
+              if kline[6] < now]
+    rows = process_klines(klines, symbol, interval)
+    for row in rows:
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            row[column] = float(row[column])
+    if rows:
+        insert_market_data(rows)
+    insert_market_data_coverage(symbol, interval, first_open_time, last_open_time)
+    return len(rows)
+
+
+def load_candles(symbol, interval, start_str, end_str=None, client=None, fetch_missing=True):
+    """
+    Closed candles of symbol with start_str <= open time <= end_str (dates as
+    accepted by get_historical_klines or epoch ms, up to now when end_str is
+    None), read from the database after downloading the missing ranges.
+    fetch_missing=False never touches the network. Returns a DataFrame with
+    timestamp (datetime), open, high, low, close, volume and close_time.
+    """
+    _ready()
+    start = _milliseconds(start_str)
+    end = _milliseconds(end_str) if end_str is not None else int(time.time() * 1000)
+    if fetch_missing:
+        ranges = missing_ranges(symbol, interval, start, end)
+        for first_open_time, last_open_time in ranges:
+            print(f"Downloading {symbol} {interval} candles {first_open_time} - {last_open_time}")
+            download(symbol, interval, first_open_time, last_open_time, client)
+    df = fetch_market_data_range(symbol, interval, start, end + 1)
+    df['timestamp'] = pd.to_datetime(df['open_time'], unit='ms')
+    df = df[['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time']]
+    return df.astype({'open': float, 'high': float, 'low': float, 'close': float, 'volume': float})
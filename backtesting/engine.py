@@ -0,0 +1,103 @@
+import heapq
+import math
+
+import numpy as np
+
+# Take-profit backtest over NumPy arrays. Same trades, balances and profits as
+# the bar-by-bar loop of CryptoTradingBotBacktest.simulate_trading, but the
+# Python work is per signal instead of per bar: the exit bar of a position only
+# depends on its take-profit price, so it is found with a vectorized search,
+# and the balance is replayed over entry and exit events in bar order.
+
+
+def first_at_or_above(values, start, threshold, suffix_max=None, chunk=64):
+    """ First index >= start with values[index] >= threshold, len(values) when there is none """
+    n = len(values)
+    if start >= n or (suffix_max is not None and suffix_max[start] < threshold):
+        return n
+    while start < n:
+        end = min(start + chunk, n)
+        hits = np.flatnonzero(values[start:end] >= threshold)
+        if len(hits):
+            return start + int(hits[0])
+        start = end
+        chunk *= 2
+    return n
+
+
+def simulate_take_profit(close, high, buy_signals, initial_balance, take_profit_percentage=0.03,
+                         diversification_percentage=0.1):
+    """
+    On every signal bar (from the second bar on) ceil(balance * diversification)
+    is invested at the close when it exceeds 10, and the position is sold at
+    entry * (1 + take_profit_percentage) on the first bar, the entry bar
+    included, whose high reaches that price. Returns a dict with the final cash
+    balance, the closed trades and the open positions (dicts of arrays, in the
+    order the loop produced them) and open_positions_value at the last close.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    n = len(close)
+    signal_bars = np.flatnonzero(np.asarray(buy_signals, dtype=bool)[1:n]) + 1
+    take_profit_prices = close[signal_bars] * (1 + take_profit_percentage)
+    suffix_max = np.maximum.accumulate(high[::-1])[::-1] if n else high
+
+    # Positions in entry order, compact arrays indexed by position number
+    count = len(signal_bars)
+    entry_bar = np.empty(count, dtype=np.int64)
+    entry_price = np.empty(count)
+    quantity = np.empty(count)
+    take_profit = np.empty(count)
+    exit_bar = np.empty(count, dtype=np.int64)
+    opened = 0
+    # Pending exits ordered like the loop closes them: by bar, then entry order
+    exits = []
+    trades = []
+    balance = initial_balance
+
+    def close_until(bar):
+        nonlocal balance
+        while exits and exits[0][0] < bar:
+            _, position = heapq.heappop(exits)
+            balance += quantity[position] * take_profit[position]
+            trades.append(position)
+
+    for bar, take_profit_price in zip(signal_bars.tolist(), take_profit_prices.tolist()):
+        # Sales on earlier bars come before this bar's purchase
+        close_until(bar)
+        investment_amount = math.ceil(balance * diversification_percentage)
+        if investment_amount > 10:
+            price = close[bar]
+            entry_bar[opened] = bar
+            entry_price[opened] = price
+            quantity[opened] = investment_amount / float(price)
+            take_profit[opened] = take_profit_price
+            exit_bar[opened] = first_at_or_above(high, bar, take_profit_price, suffix_max)
+            balance -= investment_amount
+            if exit_bar[opened] < n:
+                heapq.heappush(exits, (int(exit_bar[opened]), opened))
+            opened += 1
+    close_until(n)
+
+    closed = np.asarray(trades, dtype=np.int64)
+    still_open = np.setdiff1d(np.arange(opened), closed)
+    last_close = close[-1] if n else 0.0
+    open_positions_value = sum(quantity[position] * last_close for position in still_open.tolist())
+    return {
+        'balance': balance,
+        'trades': {
+            'entry_bar': entry_bar[closed],
+            'exit_bar': exit_bar[closed],
+            'entry_price': entry_price[closed],
+            'exit_price': take_profit[closed],
+            'quantity': quantity[closed],
+            'profit': (take_profit[closed] - entry_price[closed]) * quantity[closed],
+        },
+        'positions': {
+            'entry_bar': entry_bar[still_open],
+            'entry_price': entry_price[still_open],
+            'quantity': quantity[still_open],
+            'take_profit_price': take_profit[still_open],
+        },
+        'open_positions_value': open_positions_value,
+    }
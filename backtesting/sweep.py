@@ -0,0 +1,276 @@
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from analysis.rules import Rule
+from analysis.strategy import CLAUDE_STRATEGY
+from backtest_claude import STRATEGY, CryptoTradingBotBacktest
+from backtesting.engine import simulate_take_profit
+from db.backtest_results import run_hash, stored_hashes
+from indicators import kernels
+from indicators.surface import macd_rsi_surface
+
+# Parameter sweeps of the backtest_claude take-profit strategy over a process
+# pool. Prices are copied once into shared memory and every worker maps them;
+# jobs only carry a symbol and a slice of the indicator grid. A job computes
+# the MACD/RSI surface for its slice in one pass and runs the engine for every
+# entry band, take profit and diversification on top of it.
+
+# Backtest defaults, used for parameters the grid leaves out
+DEFAULT_GRID = {
+    'trade_profit_percentage': [0.05],
+    'diversification_percentage': [0.1],
+    'fast_length': [12],
+    'slow_length': [26],
+    'signal_smoothing': [9],
+    'rsi_length': [14],
+    'rsi_entry_min': [50],
+    'rsi_entry_max': [70],
+}
+
+# Set in every worker by _init_worker
+_memory = None
+_prices = None
+_settings = None
+
+
+class SharedPrices:
+    """
+    close and high of every symbol in one shared memory block. Workers attach
+    by name and get read-only NumPy views, nothing is pickled per job.
+    """
+    def __init__(self, prices):
+        self.layout = {}
+        offset = 0
+        for symbol, (close, _) in prices.items():
+            self.layout[symbol] = (offset, len(close))
+            offset += 2 * len(close)
+        self.memory = SharedMemory(create=True, size=max(offset, 1) * 8)
+        buffer = np.ndarray((offset,), dtype=np.float64, buffer=self.memory.buf)
+        for symbol, (close, high) in prices.items():
+            start, length = self.layout[symbol]
+            buffer[start:start + length] = close
+            buffer[start + length:start + 2 * length] = high
+        self.name = self.memory.name
+
+    @staticmethod
+    def attach(name, layout):
+        # Workers share the resource tracker of the creating process, which unlinks the block
+        memory = SharedMemory(name=name)
+        buffer = np.ndarray((memory.size // 8,), dtype=np.float64, buffer=memory.buf)
+        arrays = {}
+        for symbol, (start, length) in layout.items():
+            close, high = buffer[start:start + length], buffer[start + length:start + 2 * length]
+            close.flags.writeable = False
+            high.flags.writeable = False
+            arrays[symbol] = (close, high)
+        return memory, arrays
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _init_worker(name, layout, settings):
+    global _memory, _prices, _settings
+    _memory, _prices = SharedPrices.attach(name, layout)
+    _settings = settings
+    # One compiled entry rule per RSI band
+    _settings['rules'] = {band: Rule(settings['conditions'], **{**settings['rule_params'], 'rsi_entry_min': band[0], 'rsi_entry_max': band[1]})
+                          for band in settings['bands']}
+
+
+def summarize(symbol, params, result, initial_balance):
+    """ One row with the columns of CryptoTradingBotBacktest.run_backtest """
+    total_profit = sum(result['trades']['profit'].tolist())
+    final_balance = result['balance'] + result['open_positions_value']
+    return {
+        'symbol': symbol,
+        'take_profit_percentage_foreach_trade': params['trade_profit_percentage'],
+        'diversification_percentage': params['diversification_percentage'],
+        'fast_length': params['fast_length'],
+        'slow_length': params['slow_length'],
+        'signal_smoothing': params['signal_smoothing'],
+        'rsi_length': params['rsi_length'],
+        'rsi_entry_min': params['rsi_entry_min'],
+        'rsi_entry_max': params['rsi_entry_max'],
+        'initial_balance': initial_balance,
+        'total_profit': total_profit,
+        'profit_percentage': (final_balance - initial_balance) / initial_balance * 100,
+        'num_trades': len(result['trades']['profit']),
+        'final_balance': float(final_balance),
+        'open_positions_value': float(result['open_positions_value']),
+    }
+
+
+def run_job(symbol, indicator_grid, close, high, settings):
+    """ Every combination of one symbol and a slice of (fast, slow, signal, rsi_length) not in settings['skip'] """
+    surface = macd_rsi_surface(close, indicator_grid)
+    # Columns that do not depend on the grid are computed once and broadcast
+    values = {'close': close, 'ema_200': kernels.ema(close, settings['ema_long'], adjust=True, min_periods=1),
+              'macd': surface[:, 0], 'signal': surface[:, 1], 'rsi': surface[:, 2]}
+    rows = []
+    for (rsi_entry_min, rsi_entry_max), rule in settings['rules'].items():
+        signals, _ = rule.evaluate(values)
+        for (fast, slow, signal, rsi_length), buy_signals in zip(indicator_grid, signals):
+            for take_profit, diversification in settings['trading']:
+                params = {'trade_profit_percentage': take_profit, 'diversification_percentage': diversification,
+                          'fast_length': fast, 'slow_length': slow, 'signal_smoothing': signal, 'rsi_length': rsi_length,
+                          'rsi_entry_min': rsi_entry_min, 'rsi_entry_max': rsi_entry_max}
+                if settings['skip'] and _hash(symbol, params, settings) in settings['skip']:
+                    continue
+                result = simulate_take_profit(close, high, buy_signals, settings['initial_balance'], take_profit, diversification)
+                rows.append({**summarize(symbol, params, result, settings['initial_balance']), 'strategy': settings['name']})
+    return rows
+
+
+def _hash(symbol, params, settings):
+    return run_hash(settings['name'], symbol, settings['start_date'], settings['end_date'],
+                    {**params, 'initial_balance': settings['initial_balance']})
+
+
+def _combinations(symbols, indicator_grid, settings):
+    for symbol in symbols:
+        for (fast, slow, signal, rsi_length), (rsi_entry_min, rsi_entry_max), (take_profit, diversification) in itertools.product(
+                indicator_grid, settings['bands'], settings['trading']):
+            yield symbol, {'trade_profit_percentage': take_profit, 'diversification_percentage': diversification,
+                           'fast_length': fast, 'slow_length': slow, 'signal_smoothing': signal, 'rsi_length': rsi_length,
+                           'rsi_entry_min': rsi_entry_min, 'rsi_entry_max': rsi_entry_max}
+
+
+def _run_job(job):
+    symbol, indicator_grid = job
+    close, high = _prices[symbol]
+    started = time.perf_counter()
+    rows = run_job(symbol, indicator_grid, close, high, _settings)
+    seconds = time.perf_counter() - started
+    # Per-run timing, the job's time shared by its backtests
+    for row in rows:
+        row['seconds'] = seconds / len(rows)
+    return rows, seconds
+
+
+def _split(grid, jobs_per_symbol):
+    size = max(1, math.ceil(len(grid) / jobs_per_symbol))
+    return [grid[i:i + size] for i in range(0, len(grid), size)]
+
+
+def run_sweep(prices, grid, initial_balance=3000, processes=None, strategy=None, progress_interval=5.0,
+              skip_stored=False, **fields):
+    """
+    Backtests every combination of grid (lists per DEFAULT_GRID key) for every
+    symbol of prices ({symbol: (close, high)} arrays or DataFrames) on a pool of
+    processes (all cores by default). Yields one result row per combination as
+    jobs finish, in no particular order, and prints progress and throughput
+    every progress_interval seconds. fields (e.g. start_date) are added to rows,
+    seconds holds the run time. strategy (analysis.strategy.Strategy, the live
+    CLAUDE_STRATEGY by default) supplies the entry conditions; the grid sets its
+    MACD/RSI lengths and entry band. skip_stored=True leaves out combinations
+    already in the backtest results store for fields start_date and end_date.
+    """
+    strategy = CLAUDE_STRATEGY if strategy is None else strategy
+    grid = {**DEFAULT_GRID, **grid}
+    prices = {symbol: _price_arrays(value) for symbol, value in prices.items()}
+    indicator_grid = [params for params in itertools.product(grid['fast_length'], grid['slow_length'],
+                                                             grid['signal_smoothing'], grid['rsi_length'])
+                      if params[0] < params[1]]
+    settings = {
+        'name': f'{strategy.name}_take_profit',
+        'conditions': strategy.conditions,
+        'rule_params': strategy.rule_params,
+        'ema_long': strategy.indicator_params['ema_long'],
+        'bands': list(itertools.product(grid['rsi_entry_min'], grid['rsi_entry_max'])),
+        'trading': list(itertools.product(grid['trade_profit_percentage'], grid['diversification_percentage'])),
+        'initial_balance': initial_balance,
+        'start_date': fields.get('start_date'),
+        'end_date': fields.get('end_date'),
+        'skip': set(),
+    }
+    if skip_stored:
+        settings['skip'] = stored_hashes(_hash(symbol, params, settings)
+                                         for symbol, params in _combinations(prices, indicator_grid, settings))
+    processes = processes or os.cpu_count() or 1
+    # A few jobs per core keep every process busy until the end
+    jobs_per_symbol = max(1, math.ceil(processes * 4 / max(len(prices), 1)))
+    jobs = [(symbol, chunk) for symbol in prices for chunk in _split(indicator_grid, jobs_per_symbol)]
+    total = len(prices) * len(indicator_grid) * len(settings['bands']) * len(settings['trading']) - len(settings['skip'])
+    if settings['skip']:
+        print(f"Sweep: {len(settings['skip'])} backtests already stored, skipped")
+
+    shared = SharedPrices(prices)
+    started = time.perf_counter()
+    reported = started
+    done = 0
+    busy = 0.0
+    try:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(shared.name, shared.layout, settings)) as pool:
+            for rows, seconds in pool.imap_unordered(_run_job, jobs):
+                done += len(rows)
+                busy += seconds
+                for row in rows:
+                    yield {**row, **fields}
+                now = time.perf_counter()
+                if now - reported >= progress_interval or (rows and done == total):
+                    reported = now
+                    elapsed = now - started
+                    rate = done / elapsed if elapsed else 0.0
+                    eta = (total - done) / rate if rate else 0.0
+                    print(f"Sweep: {done}/{total} backtests, {rate:.0f}/s, "
+                          f"{busy / elapsed / processes * 100 if elapsed else 0:.0f}% of {processes} processes busy, eta {eta:.0f}s")
+    finally:
+        shared.close()
+
+
+def _price_arrays(value):
+    if isinstance(value, tuple):
+        close, high = value
+    else:
+        close, high = value['close'], value['high']
+    return np.asarray(close, dtype=np.float64), np.asarray(high, dtype=np.float64)
+
+
+def load_prices(symbols, start_date, end_date):
+    """ {symbol: (close, high)} from CryptoTradingBotBacktest.get_historical_data """
+    prices = {}
+    for symbol in symbols:
+        df = CryptoTradingBotBacktest(symbol, start_date, end_date).get_historical_data()
+        prices[symbol] = _price_arrays(df)
+    return prices
+
+
+if __name__ == "__main__":
+    from backtest_claude import result_record
+    from db.backtest_results import store_results, top_results
+    from db.database import setup_database
+
+    symbols = ['TRXUSDT', 'BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT', 'ADAUSDT']
+    start_date = "1 Jan, 2024"
+    end_date = "5 Dec, 2024"
+    grid = {
+        'trade_profit_percentage': [0.01, 0.02, 0.03, 0.05, 0.08, 0.1, 0.2, 0.3],
+        'diversification_percentage': [0.05, 0.1, 0.2],
+        'fast_length': [8, 12, 16],
+        'slow_length': [21, 26, 34],
+        'signal_smoothing': [7, 9],
+        'rsi_length': [10, 14],
+        'rsi_entry_min': [40, 50],
+        'rsi_entry_max': [70],
+    }
+    setup_database()
+    # Stored in batches, one transaction each
+    batch = []
+    stored = 0
+    for row in run_sweep(load_prices(symbols, start_date, end_date), grid, skip_stored=True,
+                         start_date=start_date, end_date=end_date):
+        batch.append(result_record(row, row['seconds']))
+        if len(batch) >= 1000:
+            stored += store_results(batch)
+            batch = []
+    stored += store_results(batch)
+    print(f"{stored} sweep results stored.")
+    print(top_results('profit_percentage', 10, strategy=STRATEGY))
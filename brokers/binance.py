@@ -1,7 +1,15 @@
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from binance.client import Client
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+from binance.helpers import interval_to_milliseconds
 import pprint
-from db.database import insert_data
+import requests
+import time
+from brokers.rate_limiter import RequestWeightLimiter, rate_limit_client
+from db.connection import transaction
+from db.database import fetch_market_data_coverage, fetch_market_data_gaps, insert_market_data, insert_market_data_coverage
+from db.writer import DatabaseWriter
 from helpers.data_manipulation import transform_timestamp_to_date
 
 
@@ -12,29 +20,119 @@ def trading_pairs():
     return ['BTCUSDT', 'ETHUSDT', 'BNBUSDT','SOLUSDT','ADAUSDT','DOGEUSDT','AVAXUSDT','DOTUSDT','LINKUSDT','TRXUSDT','ICPUSDT','MATICUSDT','NEARUSDT','UNIUSDT']
 
 # High-order function to process trading pairs
-def process_trading_pairs(client, pairs, process_fn):
+# With max_workers set the pairs are downloaded concurrently (see process_trading_pairs_concurrently)
+def process_trading_pairs(client, pairs, process_fn, max_workers=None, **kwargs):
+    if max_workers:
+        return process_trading_pairs_concurrently(client, pairs, process_fn, max_workers, **kwargs)
     return [process_fn(client, pair) for pair in pairs]
 
+def process_trading_pairs_concurrently(client, pairs, process_fn, max_workers=4, limiter=None, retries=3, backoff=2):
+    """
+    Runs process_fn for every pair on a bounded thread pool. REST calls share one
+    request-weight budget, failed pairs are retried with exponential backoff and
+    all database writes are funnelled through a single writer thread.
+    Results are returned in the order of pairs (None for pairs that kept failing).
+    """
+    limiter = limiter or RequestWeightLimiter()
+    rate_limit_client(client, limiter)
+    with DatabaseWriter() as writer:
+        def store(klines, symbol, interval, coverage=None):
+            return writer.submit(store_klines, klines, symbol, interval, coverage).result()
+
+        def run(pair):
+            return run_with_retry(process_fn, client, pair, store, limiter, retries, backoff)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='binance') as executor:
+            return list(executor.map(run, pairs))
+
+def run_with_retry(process_fn, client, pair, store, limiter, retries=3, backoff=2):
+    for attempt in range(retries + 1):
+        try:
+            return process_fn(client, pair, store=store)
+        except BinanceAPIException as e:
+            if e.status_code in (418, 429):
+                # Rate limited: every worker has to wait, not only this one
+                limiter.pause(int(e.response.headers.get('Retry-After', backoff ** (attempt + 1))))
+            elif e.status_code < 500:
+                print(f"{pair}: Binance API error, not retrying: {e}")
+                return None
+            error = e
+        except (BinanceRequestException, requests.exceptions.RequestException) as e:
+            error = e
+        if attempt < retries:
+            delay = backoff ** attempt
+            print(f"{pair}: attempt {attempt + 1} failed ({error}), retrying in {delay}s")
+            time.sleep(delay)
+    print(f"{pair}: giving up after {retries + 1} attempts: {error}")
+    return None
+
 # Function to fetch and process candlesticks data
-def fetch_and_process_candlesticks(client, symbol, interval=Client.KLINE_INTERVAL_1DAY):
+def fetch_and_process_candlesticks(client, symbol, interval=Client.KLINE_INTERVAL_1DAY, store=None):
     klines = client.get_klines(symbol=symbol, interval=interval, limit=1)
     pprint.pprint(klines)
-    # Data processing (functional approach)
-    data = process_kline(klines[0],symbol)
-    insert_data(**data)
+    return (store or store_klines)(klines, symbol, interval)
 
 # Function to fetch and process historical data    
-def fetch_and_process_historical_data(client, symbol,start_str = "1 Jan, 2021", interval=Client.KLINE_INTERVAL_1DAY):
+def fetch_and_process_historical_data(client, symbol,start_str = "1 Jan, 2021", interval=Client.KLINE_INTERVAL_1DAY, store=None):
     klines = client.get_historical_klines(symbol, interval, start_str)
-    for kline in klines:
-        data = process_kline(kline,symbol)
-        insert_data(**data)
+    return (store or store_klines)(klines, symbol, interval)
+
+# Incremental backfill: only request candles that are not stored yet
+def backfill_historical_data(client, symbol, start_str="1 Jan, 2021", interval=Client.KLINE_INTERVAL_1DAY, store=None):
+    store = store or store_klines
+    last_open_time, gaps = fetch_market_data_gaps(symbol, interval, interval_to_milliseconds(interval))
+    if last_open_time is None:
+        return fetch_and_process_historical_data(client, symbol, start_str, interval, store)
+    # Gaps already fetched once are holes on the exchange side (maintenance, delistings), not missing downloads
+    coverage = fetch_market_data_coverage(symbol, interval)
+    gaps = [(start_ms, end_ms) for start_ms, end_ms in gaps
+            if not any(first <= start_ms and end_ms <= last for first, last in coverage)]
+    # The last stored candle may still have been open when it was written, so it is fetched again
+    ranges = gaps + [(last_open_time, None)]
+    result = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    for start_ms, end_ms in ranges:
+        klines = client.get_historical_klines(symbol, interval, start_ms, end_ms)
+        # A gap lies between stored candles, so it is closed; recorded as covered even when the exchange returned nothing
+        coverage = (start_ms, end_ms) if end_ms is not None else None
+        for key, value in store(klines, symbol, interval, coverage).items():
+            result[key] += value
+    return result
+
+# Columnar store backfill, resumes after the last stored candle
+def fetch_into_candle_store(client, symbol, candle_store, start_str="1 Jan, 2021", interval=Client.KLINE_INTERVAL_1DAY):
+    last_open_time = candle_store.last_open_time(symbol, interval)
+    start = start_str if last_open_time is None else last_open_time + interval_to_milliseconds(interval)
+    klines = client.get_historical_klines(symbol, interval, start)
+    # Only closed candles are appended, the store is append-only
+    now = int(time.time() * 1000)
+    return candle_store.append_klines(symbol, interval, [kline for kline in klines if kline[6] < now])
+
+# Bulk ingestion: one batched upsert in a single transaction per call, together
+# with the (first_open_time, last_open_time) range the klines cover if given
+def store_klines(klines, symbol, interval, coverage=None):
+    started = time.perf_counter()
+    with transaction():
+        result = insert_market_data(process_klines(klines, symbol, interval))
+        if coverage is not None:
+            insert_market_data_coverage(symbol, interval, *coverage)
+    elapsed = time.perf_counter() - started
+    rate = len(klines) / elapsed if elapsed > 0 else 0
+    print(f"{symbol}: {result['inserted']} inserted, {result['updated']} updated, {result['skipped']} skipped "
+          f"({len(klines)} klines in {elapsed:.2f}s, {rate:.0f} rows/s)")
+    return result
+
+def process_klines(klines, symbol, interval):
+    event_timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return [process_kline(kline, symbol, interval, event_timestamp) for kline in klines]
 
-def process_kline(kline, symbol):
+def process_kline(kline, symbol, interval, event_timestamp=None):
     return {
+        'interval': interval,
+        'open_time': int(kline[0]),
+        'close_time': int(kline[6]),
         'start_time': transform_timestamp_to_date(kline[0]),
         'end_time': transform_timestamp_to_date(kline[6]),
-        'event_timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'event_timestamp': event_timestamp or datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'open': kline[1],
         'high': kline[2],
         'low': kline[3],
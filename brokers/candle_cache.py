@@ -0,0 +1,118 @@
+import threading
+import time
+
+import numpy as np
+from binance.helpers import date_to_milliseconds, interval_to_milliseconds
+
+from db.candle_store import CandleStore
+
+# Klines returned by a single REST call
+MAX_KLINES_PER_REQUEST = 1000
+
+
+class CandleCache:
+    """
+    Rolling window of klines per (symbol, interval) shared by all bots in the
+    process. Closed candles are also kept on disk in a CandleStore, so a restart
+    only downloads what is missing. A refresh asks Binance only for the candles
+    from the last cached one onwards; callers asking for the same key at the same
+    time wait for one fetch instead of sending their own.
+    """
+    def __init__(self, candle_store=None, window=1000, min_refresh=1.0):
+        self.candle_store = candle_store if candle_store is not None else CandleStore()
+        self.window = window
+        self.min_refresh = min_refresh
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def _entry(self, symbol, interval):
+        with self.lock:
+            key = (symbol, interval)
+            if key not in self.entries:
+                self.entries[key] = {'lock': threading.Lock(), 'klines': None, 'refreshed': 0.0}
+            return self.entries[key]
+
+    def _load_from_disk(self, symbol, interval, interval_ms):
+        columns = self.candle_store.read_last(symbol, interval, self.window)
+        open_time = np.asarray(columns['open_time'])
+        if len(open_time) == 0:
+            return []
+        # Only the contiguous tail is usable, older candles may sit before a gap
+        breaks = np.flatnonzero(np.diff(open_time) != interval_ms)
+        start = breaks[-1] + 1 if len(breaks) else 0
+        rows = zip(*(np.asarray(columns[name][start:]).tolist() for name in columns))
+        return [[int(t), o, h, l, c, v, int(ct), qv, int(n), tb, tq, '0'] for t, o, h, l, c, v, ct, qv, n, tb, tq in rows]
+
+    def get_klines(self, client, symbol, interval, limit=500, closed=False):
+        """
+        Same result as client.get_klines(symbol=..., interval=..., limit=...).
+        closed=True leaves out the candle that is still open.
+        """
+        if closed:
+            now = int(time.time() * 1000)
+            return [kline for kline in self.get_klines(client, symbol, interval, limit + 1) if kline[6] < now][-limit:]
+        entry = self._entry(symbol, interval)
+        with entry['lock']:
+            if entry['klines'] is None or time.monotonic() - entry['refreshed'] >= self.min_refresh or len(entry['klines']) < limit:
+                entry['klines'] = self._refresh(client, symbol, interval, entry['klines'], limit)
+                entry['refreshed'] = time.monotonic()
+            return entry['klines'][-limit:]
+
+    def _refresh(self, client, symbol, interval, klines, limit):
+        interval_ms = interval_to_milliseconds(interval)
+        window = max(self.window, limit)
+        if klines is None:
+            klines = self._load_from_disk(symbol, interval, interval_ms)
+        now = int(time.time() * 1000)
+        # The delta brings at least the currently open candle, which the disk copy never has
+        if klines and len(klines) + 1 >= limit and (now - klines[-1][0]) // interval_ms < MAX_KLINES_PER_REQUEST:
+            # Delta: the last cached candle (possibly still open) and everything after it
+            new = client.get_klines(symbol=symbol, interval=interval, startTime=klines[-1][0], limit=MAX_KLINES_PER_REQUEST)
+            klines = [kline for kline in klines if kline[0] < new[0][0]] + new if new else klines
+        elif limit <= MAX_KLINES_PER_REQUEST:
+            klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+        else:
+            start = now - limit * interval_ms
+            klines = client.get_historical_klines(symbol, interval, start)
+        klines = klines[-window:]
+        closed = [kline for kline in klines if kline[6] < now]
+        self.candle_store.append_klines(symbol, interval, closed)
+        return klines
+
+    def put_kline(self, symbol, interval, kline):
+        """
+        Adds a closed candle received from a stream (REST layout), so the next
+        get_klines returns it without a REST call. Ignored when it does not
+        continue the cached window.
+        """
+        entry = self._entry(symbol, interval)
+        with entry['lock']:
+            klines = entry['klines']
+            if not klines:
+                return False
+            if klines[-1][0] == kline[0]:
+                klines = klines[:-1] + [kline]
+            elif klines[-1][0] + interval_to_milliseconds(interval) == kline[0]:
+                klines = (klines + [kline])[-max(self.window, len(klines)):]
+            else:
+                return False
+            entry['klines'] = klines
+            entry['refreshed'] = time.monotonic()
+        self.candle_store.append_klines(symbol, interval, [kline])
+        return True
+
+    def get_historical_klines(self, client, symbol, interval, start_str, closed=False):
+        """ Cached replacement for client.get_historical_klines(symbol, interval, start_str) over a recent range """
+        start = date_to_milliseconds(start_str) if isinstance(start_str, str) else int(start_str)
+        limit = (int(time.time() * 1000) - start) // interval_to_milliseconds(interval) + 1
+        return [kline for kline in self.get_klines(client, symbol, interval, limit, closed) if kline[0] >= start]
+
+
+# One cache per process, shared by every bot module
+shared_candle_cache = CandleCache()
+
+def get_klines(client, symbol, interval, limit=500, closed=False):
+    return shared_candle_cache.get_klines(client, symbol, interval, limit, closed)
+
+def get_historical_klines(client, symbol, interval, start_str, closed=False):
+    return shared_candle_cache.get_historical_klines(client, symbol, interval, start_str, closed)
@@ -0,0 +1,125 @@
+import threading
+import time
+from decimal import ROUND_DOWN, ROUND_UP, Decimal
+
+# exchangeInfo for every symbol costs 20 request weight, load it once per TTL
+DEFAULT_TTL = 3600
+
+
+def quantizer(step, rounding=ROUND_DOWN):
+    """
+    Exact rounding to a multiple of step (a Binance stepSize or tickSize string).
+    Returns a function value -> Decimal with the step's number of decimals.
+    """
+    step = Decimal(str(step))
+    if step == 0:
+        return lambda value: Decimal(str(value))
+    places = Decimal(1).scaleb(min(step.normalize().as_tuple().exponent, 0))
+
+    def quantize(value):
+        steps = (Decimal(str(value)) / step).to_integral_value(rounding=rounding)
+        return (steps * step).quantize(places)
+    return quantize
+
+
+def format_decimal(value):
+    # Plain notation for order parameters, str(1e-05) would be rejected
+    return format(Decimal(str(value)), 'f')
+
+
+class SymbolRules:
+    """
+    LOT_SIZE, PRICE_FILTER and (MIN_)NOTIONAL of one symbol, compiled once into
+    Decimal rounding functions. quantity() and price() round down to the step
+    and tick, so results are always accepted by the exchange filters.
+    """
+    def __init__(self, info):
+        self.symbol = info['symbol']
+        self.base_asset = info.get('baseAsset')
+        self.quote_asset = info.get('quoteAsset')
+        filters = {filt['filterType']: filt for filt in info.get('filters', [])}
+        lot = filters.get('LOT_SIZE', {})
+        self.min_qty = Decimal(lot.get('minQty', '0'))
+        self.max_qty = Decimal(lot.get('maxQty', '0'))
+        self.step_size = Decimal(lot.get('stepSize', '0'))
+        prices = filters.get('PRICE_FILTER', {})
+        self.min_price = Decimal(prices.get('minPrice', '0'))
+        self.max_price = Decimal(prices.get('maxPrice', '0'))
+        self.tick_size = Decimal(prices.get('tickSize', '0'))
+        notional = filters.get('NOTIONAL') or filters.get('MIN_NOTIONAL') or {}
+        self.min_notional = Decimal(notional.get('minNotional', '0'))
+        self.has_lot_size = 'LOT_SIZE' in filters
+        self.has_price_filter = 'PRICE_FILTER' in filters
+        self.has_notional = bool(notional)
+        self._floor_quantity = quantizer(self.step_size)
+        self._floor_price = quantizer(self.tick_size)
+        self._ceil_price = quantizer(self.tick_size, ROUND_UP)
+
+    def quantity(self, value):
+        """ value rounded down to the step size """
+        return self._floor_quantity(value)
+
+    def check_quantity(self, value):
+        quantity = self.quantity(value)
+        if quantity < self.min_qty:
+            raise ValueError(f"Amount {value} is less than the minimum allowed quantity {self.min_qty} for {self.symbol}")
+        if self.max_qty and quantity > self.max_qty:
+            raise ValueError(f"Amount {value} is greater than the maximum allowed quantity {self.max_qty} for {self.symbol}")
+        return quantity
+
+    def price(self, value, round_up=False):
+        """ value on the tick grid (down unless round_up) and inside the allowed price range """
+        price = self._ceil_price(value) if round_up else self._floor_price(value)
+        if self.max_price:
+            price = min(price, self._floor_price(self.max_price))
+        return max(price, self._ceil_price(self.min_price))
+
+    def meets_notional(self, quantity, price):
+        return Decimal(str(quantity)) * Decimal(str(price)) >= self.min_notional
+
+
+class ExchangeInfoCache:
+    """
+    SymbolRules for every symbol from a single exchangeInfo call, reloaded once
+    ttl seconds have passed. Shared by all bots of the process, so placing an
+    order needs no metadata request.
+    """
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.rules = {}
+        self.loaded = None
+        self.lock = threading.Lock()
+
+    def _stale(self):
+        return self.loaded is None or time.monotonic() - self.loaded >= self.ttl
+
+    def _load(self, info):
+        self.rules = {symbol['symbol']: SymbolRules(symbol) for symbol in info['symbols']}
+        self.loaded = time.monotonic()
+
+    def get(self, client, symbol):
+        """ SymbolRules of symbol, None when the exchange does not list it """
+        with self.lock:
+            if self._stale():
+                self._load(client.get_exchange_info())
+            return self.rules.get(symbol)
+
+    async def get_async(self, client, symbol):
+        """ get() for an AsyncClient """
+        if self._stale():
+            info = await client.get_exchange_info()
+            with self.lock:
+                self._load(info)
+        return self.rules.get(symbol)
+
+    def clear(self):
+        with self.lock:
+            self.rules = {}
+            self.loaded = None
+
+
+# One cache per process, shared by every bot module
+shared_exchange_info = ExchangeInfoCache()
+
+def symbol_rules(client, symbol):
+    return shared_exchange_info.get(client, symbol)
@@ -0,0 +1,86 @@
+import threading
+import time
+
+# Binance allows 6000 request weight per minute per IP, keep a safety margin
+DEFAULT_WEIGHT_PER_MINUTE = 4800
+
+
+def request_weight(uri, params):
+    """ Approximate request weight of a REST call, klines weight depends on the limit """
+    if uri.endswith('/klines'):
+        limit = int(params.get('limit', 500))
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+    if uri.endswith('/exchangeInfo') or uri.endswith('/account'):
+        return 20
+    return 1
+
+
+class RequestWeightLimiter:
+    """
+    Token bucket shared by all threads talking to the Binance REST API.
+    acquire() blocks until the requested weight fits into the per-minute budget.
+    """
+    def __init__(self, weight_per_minute=DEFAULT_WEIGHT_PER_MINUTE):
+        self.capacity = weight_per_minute
+        self.refill_rate = weight_per_minute / 60.0
+        self.tokens = float(weight_per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def acquire(self, weight=1):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = (weight - self.tokens) / self.refill_rate
+            time.sleep(wait)
+
+    def sync(self, used_weight):
+        # Align with the weight Binance reports for the current minute (X-MBX-USED-WEIGHT-1M)
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, max(0.0, self.capacity - used_weight))
+
+    def pause(self, seconds):
+        # Drain the bucket after a 429/418 so every thread backs off together
+        with self.lock:
+            self.tokens = -self.refill_rate * seconds
+            self.updated = time.monotonic()
+
+
+def rate_limit_client(client, limiter):
+    """ Route every REST request of a python-binance Client through the limiter """
+    if getattr(client, 'rate_limiter', None) is not None:
+        client.rate_limiter = limiter
+        return client
+    request = client._request
+    handle_response = client._handle_response
+
+    def limited_request(method, uri, signed, force_params=False, **kwargs):
+        client.rate_limiter.acquire(request_weight(uri, kwargs.get('params') or kwargs.get('data') or {}))
+        return request(method, uri, signed, force_params, **kwargs)
+
+    def synced_handle_response(response):
+        # The response of this very call; client.response is shared by every thread using the client
+        used_weight = response.headers.get('x-mbx-used-weight-1m')
+        if used_weight:
+            client.rate_limiter.sync(int(used_weight))
+        return handle_response(response)
+
+    client.rate_limiter = limiter
+    client._request = limited_request
+    client._handle_response = synced_handle_response
+    return client
@@ -22,6 +22,12 @@ if __name__ == "__main__":
         required=True,
         help="Percentage investment amount to set for all trading pairs (e.g., 0.1 for 10%)."
     )
+    parser.add_argument(
+        "--engine",
+        choices=["events", "async", "loop"],
+        default="events",
+        help="events: evaluate on candle close, async: concurrent asyncio cycles, loop: hourly sleep loop."
+    )
     args = parser.parse_args()
     
     # Command-line argument for percentage_investment_amount
@@ -66,7 +72,10 @@ if __name__ == "__main__":
 
     bot = CryptoTradingBot(trading_pairs_config)
     try:
-        bot.run()
+        if args.engine == "async":
+            asyncio.run(bot.run_async())
+        else:
+            bot.run(event_driven=args.engine == "events")
     except Exception as e: 
         telegram("CLAUDE has STOPPED with error! " + str(e))
         raise
@@ -0,0 +1,126 @@
+import datetime
+import functools
+import hashlib
+import json
+import math
+
+import pandas as pd
+from binance.helpers import date_to_milliseconds
+
+from db.database import connect_db
+
+# Backtest results, one backtest_runs row per (strategy, symbol, date range,
+# parameters) and one backtest_metrics row per metric of a run. Metrics are
+# indexed by (metric, value), so a top-N query reads N index entries however
+# many runs are stored.
+
+# Host parameter limit of older SQLite builds is 999
+HASH_BATCH = 500
+
+# Sweeps hash the same few date strings millions of times
+_date_to_milliseconds = functools.lru_cache(maxsize=256)(date_to_milliseconds)
+
+
+def _timestamp(value):
+    # Dates as strings, datetimes or epoch ms, so equal ranges hash the same however they were written
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return _date_to_milliseconds(value)
+    if isinstance(value, (datetime.datetime, pd.Timestamp)):
+        return int(pd.Timestamp(value).timestamp() * 1000)
+    return int(value)
+
+
+def _json_value(value):
+    # NumPy scalars as plain numbers
+    return value.item() if hasattr(value, 'item') else value
+
+
+def run_hash(strategy, symbol, start_date, end_date, params):
+    """ Hex key of one backtest, the same for the same strategy, symbol, range and parameters """
+    key = json.dumps([strategy, symbol, _timestamp(start_date), _timestamp(end_date),
+                      {name: _json_value(value) for name, value in params.items()}],
+                     sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def stored_hashes(hashes):
+    """ The subset of hashes that is already stored """
+    hashes = list(hashes)
+    found = set()
+    conn = connect_db()
+    try:
+        for i in range(0, len(hashes), HASH_BATCH):
+            batch = hashes[i:i + HASH_BATCH]
+            rows = conn.execute(f'SELECT run_hash FROM backtest_runs WHERE run_hash IN ({", ".join("?" for _ in batch)})', batch)
+            found.update(row[0] for row in rows)
+    finally:
+        conn.close()
+    return found
+
+
+def store_results(results):
+    """
+    Stores backtest results in a single transaction, dicts with strategy,
+    symbol, start_date, end_date, params and metrics (dicts) and optionally
+    seconds (run time). Runs already stored are skipped. Returns the number of
+    runs written.
+    """
+    created_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    written = 0
+    conn = connect_db()
+    try:
+        with conn:
+            for result in results:
+                params = {name: _json_value(value) for name, value in result['params'].items()}
+                key = run_hash(result['strategy'], result['symbol'], result['start_date'], result['end_date'], params)
+                cursor = conn.execute('''INSERT OR IGNORE INTO backtest_runs (run_hash, strategy, symbol, start_time, end_time, params, seconds, created_at)
+                                         VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                                      (key, result['strategy'], result['symbol'], _timestamp(result['start_date']),
+                                       _timestamp(result['end_date']), json.dumps(params, sort_keys=True),
+                                       result.get('seconds'), created_at))
+                if cursor.rowcount == 0:
+                    continue
+                metrics = [(metric, cursor.lastrowid, None if math.isnan(float(value)) else float(value))
+                           for metric, value in result['metrics'].items()]
+                conn.executemany('INSERT INTO backtest_metrics (metric, run_id, value) VALUES (?, ?, ?)', metrics)
+                written += 1
+    finally:
+        conn.close()
+    return written
+
+
+def store_result(strategy, symbol, start_date, end_date, params, metrics, seconds=None):
+    """ Stores one run, False when it was already stored """
+    return store_results([{'strategy': strategy, 'symbol': symbol, 'start_date': start_date, 'end_date': end_date,
+                           'params': params, 'metrics': metrics, 'seconds': seconds}]) == 1
+
+
+def top_results(metric, n=10, strategy=None, symbol=None, ascending=False):
+    """
+    The n runs with the highest (lowest when ascending) value of metric,
+    optionally of one strategy and symbol. One row per run with its
+    parameters, every stored metric and the run time.
+    """
+    filters = ''.join([' AND r.strategy = :strategy' if strategy is not None else '',
+                       ' AND r.symbol = :symbol' if symbol is not None else ''])
+    query = f'''SELECT r.id, r.strategy, r.symbol, r.start_time, r.end_time, r.params, r.seconds
+                FROM backtest_metrics m JOIN backtest_runs r ON r.id = m.run_id
+                WHERE m.metric = :metric AND m.value IS NOT NULL{filters}
+                ORDER BY m.value {'ASC' if ascending else 'DESC'}
+                LIMIT :n'''
+    conn = connect_db()
+    try:
+        runs = conn.execute(query, {'metric': metric, 'n': n, 'strategy': strategy, 'symbol': symbol}).fetchall()
+        ids = [run[0] for run in runs]
+        metrics = {}
+        if ids:
+            rows = conn.execute(f'SELECT run_id, metric, value FROM backtest_metrics WHERE run_id IN ({", ".join("?" for _ in ids)})', ids)
+            for run_id, name, value in rows:
+                metrics.setdefault(run_id, {})[name] = value
+    finally:
+        conn.close()
+    return pd.DataFrame([{'strategy': strategy_name, 'symbol': run_symbol, 'start_time': start_time, 'end_time': end_time,
+                          **json.loads(params), **metrics.get(run_id, {}), 'seconds': seconds}
+                         for run_id, strategy_name, run_symbol, start_time, end_time, params, seconds in runs])
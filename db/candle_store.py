@@ -0,0 +1,111 @@
+import os
+import threading
+
+import numpy as np
+
+# Column layout of the on-disk candle files, one raw little-endian file per column
+COLUMNS = {
+    'open_time': '<i8',
+    'open': '<f8',
+    'high': '<f8',
+    'low': '<f8',
+    'close': '<f8',
+    'volume': '<f8',
+    'close_time': '<i8',
+    'quote_asset_volume': '<f8',
+    'number_of_trades': '<i8',
+    'taker_buy_base_asset_volume': '<f8',
+    'taker_buy_quote_asset_volume': '<f8',
+}
+# open_time is written last, so its length is the number of complete rows
+DATA_COLUMNS = [name for name in COLUMNS if name != 'open_time']
+
+
+class CandleStore:
+    """
+    Append-only columnar candle store, one directory per symbol and interval
+    (<root>/<SYMBOL>/<interval>/<column>.bin). Reads return zero-copy NumPy
+    views over memory-mapped files, sliced to the requested time range.
+    """
+    def __init__(self, root='candles'):
+        self.root = root
+        self.lock = threading.Lock()
+        self.maps = {}
+
+    def path(self, symbol, interval, column=None):
+        directory = os.path.join(self.root, symbol.upper(), interval)
+        return directory if column is None else os.path.join(directory, f'{column}.bin')
+
+    def keys(self):
+        if not os.path.isdir(self.root):
+            return
+        for symbol in sorted(os.listdir(self.root)):
+            for interval in sorted(os.listdir(os.path.join(self.root, symbol))):
+                yield symbol, interval
+
+    def count(self, symbol, interval):
+        path = self.path(symbol, interval, 'open_time')
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def last_open_time(self, symbol, interval):
+        n = self.count(symbol, interval)
+        if n == 0:
+            return None
+        with open(self.path(symbol, interval, 'open_time'), 'rb') as f:
+            f.seek((n - 1) * 8)
+            return int(np.frombuffer(f.read(8), dtype='<i8')[0])
+
+    def append_klines(self, symbol, interval, klines):
+        """
+        Appends REST-layout klines. Only candles newer than the last stored one are
+        written, so callers can pass overlapping ranges. Returns the rows appended.
+        """
+        if len(klines) == 0:
+            return 0
+        values = np.array([kline[:len(COLUMNS)] for kline in klines], dtype=np.float64)
+        columns = {name: values[:, i].astype(COLUMNS[name]) for i, name in enumerate(COLUMNS)}
+        return self.append_columns(symbol, interval, columns)
+
+    def append_columns(self, symbol, interval, columns):
+        with self.lock:
+            open_time = np.asarray(columns['open_time'], dtype='<i8')
+            last = self.last_open_time(symbol, interval)
+            keep = slice(None) if last is None else slice(np.searchsorted(open_time, last, side='right'), None)
+            if len(open_time[keep]) == 0:
+                return 0
+            os.makedirs(self.path(symbol, interval), exist_ok=True)
+            n = self.count(symbol, interval)
+            for name in DATA_COLUMNS + ['open_time']:
+                path = self.path(symbol, interval, name)
+                with open(path, 'ab') as f:
+                    # Drop the tail of a partially written append before adding new rows
+                    f.truncate(n * 8)
+                    f.write(np.ascontiguousarray(np.asarray(columns[name])[keep], dtype=COLUMNS[name]).tobytes())
+            return len(open_time[keep])
+
+    def _map(self, symbol, interval):
+        n = self.count(symbol, interval)
+        key = (symbol.upper(), interval)
+        cached = self.maps.get(key)
+        if cached is not None and len(cached['open_time']) == n:
+            return cached
+        maps = {name: np.memmap(self.path(symbol, interval, name), dtype=dtype, mode='r', shape=(n,))
+                for name, dtype in COLUMNS.items()} if n else {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.maps[key] = maps
+        return maps
+
+    def read(self, symbol, interval, start=None, end=None, columns=None):
+        """
+        Returns {column: array} for candles with start <= open_time < end
+        (epoch milliseconds, open ended when None). The arrays are read-only
+        views into the memory-mapped files, nothing is copied.
+        """
+        maps = self._map(symbol, interval)
+        open_time = maps['open_time']
+        lo = 0 if start is None else int(np.searchsorted(open_time, start, side='left'))
+        hi = len(open_time) if end is None else int(np.searchsorted(open_time, end, side='left'))
+        return {name: maps[name][lo:hi] for name in (columns or COLUMNS)}
+
+    def read_last(self, symbol, interval, limit, columns=None):
+        maps = self._map(symbol, interval)
+        return {name: maps[name][-limit:] for name in (columns or COLUMNS)}
@@ -0,0 +1,145 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB_FILE = 'trading_bot.db'
+# Seconds a writer waits for the lock before "database is locked" is raised
+BUSY_TIMEOUT = 30
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that goes back to its pool on close(). Code written for
+    plain connections (connect, use, close) keeps working, but the connection,
+    its WAL setup and its prepared statement cache are reused. Anything left
+    uncommitted is rolled back on close, just like closing a real connection.
+    As a context manager it is a transaction: committed on success, rolled back
+    on error. A with block inside an open transaction (nested transaction()
+    calls share the thread's connection) is a SAVEPOINT, so only the outermost
+    block commits.
+    """
+    def __enter__(self):
+        if self.scopes or self.in_transaction:
+            if not self.in_transaction:
+                self.execute('BEGIN IMMEDIATE')
+            savepoint = f'nested_{len(self.scopes)}'
+            self.execute(f'SAVEPOINT {savepoint}')
+        else:
+            savepoint = None
+        self.scopes.append(savepoint)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        savepoint = self.scopes.pop()
+        if savepoint is None:
+            return super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            self.execute(f'ROLLBACK TO {savepoint}')
+        self.execute(f'RELEASE {savepoint}')
+        return False
+
+    def close(self):
+        if self.refs <= 0:
+            # Already back in the pool
+            return
+        self.refs -= 1
+        if self.refs > 0:
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.scopes.clear()
+        _local.held.pop(self.key, None)
+        self.pool.release(self)
+
+    def dispose(self):
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(self, db_file, row_factory=None, size=POOL_SIZE):
+        self.db_file = db_file
+        self.row_factory = row_factory
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def create(self):
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT, factory=PooledConnection,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                               # Writers take the lock when their transaction starts, so busy_timeout applies
+                               isolation_level='IMMEDIATE')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT * 1000}')
+        conn.row_factory = self.row_factory
+        conn.pool = self
+        conn.scopes = []
+        return conn
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.create()
+
+    def release(self, conn):
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.dispose()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool(db_file=DEFAULT_DB_FILE, row_factory=None):
+    key = (os.path.abspath(db_file), row_factory)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_file, row_factory)
+        return _pools[key]
+
+
+def get_connection(db_file=DEFAULT_DB_FILE, row_factory=None):
+    """
+    Connection for the current thread. Nested calls on the same thread share one
+    connection (and its transaction); it returns to the pool once every caller
+    has closed it.
+    """
+    if not hasattr(_local, 'held'):
+        _local.held = {}
+    key = (os.path.abspath(db_file), row_factory)
+    conn = _local.held.get(key)
+    if conn is None:
+        conn = get_pool(db_file, row_factory).acquire()
+        conn.key = key
+        conn.refs = 0
+        _local.held[key] = conn
+    conn.refs += 1
+    return conn
+
+
+@contextmanager
+def transaction(db_file=DEFAULT_DB_FILE, row_factory=None):
+    # Commits on success, rolls back on error and hands the connection back; nested calls are savepoints
+    conn = get_connection(db_file, row_factory)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            while True:
+                try:
+                    pool.idle.get_nowait().dispose()
+                except queue.Empty:
+                    break
+        _pools.clear()
@@ -2,22 +2,114 @@ import sqlite3
 
 import pandas as pd
 
-def connect_db(db_file='trading_bot.db'):
-    return sqlite3.connect(db_file)
+from db.connection import DEFAULT_DB_FILE, get_connection
+from helpers.data_manipulation import transform_date_to_timestamp
+
+# Binance kline intervals in seconds, used to label rows written before the interval column existed
+INTERVAL_SECONDS = {
+    '1s': 1, '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '8h': 28800, '12h': 43200,
+    '1d': 86400, '3d': 259200, '1w': 604800
+}
+
+def connect_db(db_file=DEFAULT_DB_FILE):
+    # Pooled WAL connection, close() hands it back to the pool
+    return get_connection(db_file)
 
 def get_db_cursor():
-    conn = connect_db()
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(DEFAULT_DB_FILE, row_factory=sqlite3.Row)
 
 def setup_database():
     conn = connect_db()
-    cursor = conn.cursor()
-    # Create tables
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS market_data (
+    try:
+        cursor = conn.cursor()
+        # Create tables
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS market_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_timestamp TEXT,           
+            start_time TEXT,
+            end_time TEXT,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            symbol,
+            UNIQUE(start_time,end_time,symbol)
+        )''')
+    
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY,
+            position_id INTEGER,
+            type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            price REAL,
+            quantity REAL,
+            symbol TEXT NOT NULL,
+            creation_timestamp TEXT NOT NULL,
+            execution_timestamp TEXT,
+            FOREIGN KEY (position_id) REFERENCES positions(id)
+        );
+        """)
+    
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS positions (
+            id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            quantity REAL,
+            entry_price REAL,
+            exit_price REAL,       
+            symbol TEXT NOT NULL,
+            create_timestamp TEXT NOT NULL,
+            entry_timestamp TEXT,
+            exit_timestamp TEXT,
+            profit_loss REAL
+        );
+        """)
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trading_signals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT,           
+            signal_time TEXT,
+            signal_type TEXT,
+            rsi REAL,
+            sma_50 REAL,
+            sma_200 REAL,
+            golden_cross INTEGER,
+            death_cross INTEGER,
+            overbought INTEGER,
+            oversold INTEGER,           
+            UNIQUE(symbol,signal_time));
+        ''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS trades (
+                        id INTEGER PRIMARY KEY,
+                        timestamp TEXT,
+                        symbol TEXT,
+                        side TEXT,
+                        price REAL,
+                        quantity REAL,
+                        total REAL
+                     )''')
+        conn.commit()
+        migrate_database(conn)
+    finally:
+        conn.close()
+
+def migrate_market_data_interval():
+    """
+    Version 1: market_data gets an interval column and epoch-millisecond
+    open/close times, unique and indexed on (symbol, interval, open_time).
+    Existing rows are labelled with the interval matching their duration.
+    Duplicates of an already migrated candle are moved to market_data_skipped.
+    """
+    interval_case = ' '.join(f"WHEN {seconds} THEN '{interval}'" for interval, seconds in INTERVAL_SECONDS.items())
+    return f'''
+    CREATE TABLE market_data_v1 (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        event_timestamp TEXT,           
+        event_timestamp TEXT,
         start_time TEXT,
         end_time TEXT,
         open REAL,
@@ -25,118 +117,267 @@ def setup_database():
         low REAL,
         close REAL,
         volume REAL,
-        symbol,
-        UNIQUE(start_time,end_time,symbol)
-    )''')
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS orders (
-        id INTEGER PRIMARY KEY,
-        position_id INTEGER,
-        type TEXT NOT NULL,
-        status TEXT NOT NULL,
-        price REAL,
-        quantity REAL,
-        symbol TEXT NOT NULL,
-        creation_timestamp TEXT NOT NULL,
-        execution_timestamp TEXT,
-        FOREIGN KEY (position_id) REFERENCES positions(id)
-    );
-    """)
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS positions (
-        id INTEGER PRIMARY KEY,
-        status TEXT NOT NULL,
-        quantity REAL,
-        entry_price REAL,
-        exit_price REAL,       
         symbol TEXT NOT NULL,
-        create_timestamp TEXT NOT NULL,
-        entry_timestamp TEXT,
-        exit_timestamp TEXT,
-        profit_loss REAL
+        interval TEXT NOT NULL,
+        open_time INTEGER NOT NULL,
+        close_time INTEGER NOT NULL,
+        UNIQUE(symbol, interval, open_time)
     );
-    """)
+    -- start_time/end_time are local time text, the duration is taken from the UTC times so DST days stay 1d
+    INSERT OR IGNORE INTO market_data_v1 (id, event_timestamp, start_time, end_time, open, high, low, close, volume, symbol, interval, open_time, close_time)
+    SELECT id, event_timestamp, start_time, end_time, open, high, low, close, volume, symbol,
+           CASE (close_time + 1 - open_time) / 1000 {interval_case}
+                ELSE ((close_time + 1 - open_time) / 1000) || 's' END,
+           open_time, close_time
+    FROM (
+        SELECT *, CAST(strftime('%s', start_time, 'utc') AS INTEGER) * 1000 AS open_time,
+               CAST(strftime('%s', end_time, 'utc') AS INTEGER) * 1000 + 999 AS close_time
+        FROM market_data
+        WHERE symbol IS NOT NULL
+    )
+    ORDER BY id;
+    CREATE TABLE market_data_skipped AS
+    SELECT * FROM market_data WHERE symbol IS NOT NULL AND id NOT IN (SELECT id FROM market_data_v1);
+    DROP TABLE market_data;
+    ALTER TABLE market_data_v1 RENAME TO market_data;
+    '''
+
+def report_skipped_market_data(conn):
+    # Candles dropped by migrate_market_data_interval as duplicates, kept for inspection
+    skipped = conn.execute('SELECT COUNT(*) FROM market_data_skipped').fetchone()[0]
+    if skipped:
+        print(f"{skipped} duplicate market_data rows were not migrated, see table market_data_skipped")
+    return skipped
 
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS trading_signals (
+def migrate_market_data_rollup():
+    """ Version 2: higher timeframe OHLCV bars maintained from base candles """
+    return '''
+    CREATE TABLE IF NOT EXISTS market_data_rollup (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        symbol TEXT,           
-        signal_time TEXT,
-        signal_type TEXT,
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        open_time INTEGER NOT NULL,
+        close_time INTEGER NOT NULL,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume REAL,
+        base_interval TEXT NOT NULL,
+        candles INTEGER NOT NULL,
+        UNIQUE(symbol, interval, open_time)
+    )
+    '''
+
+def migrate_features():
+    """ Version 3: feature store, indicator values and signal flags per candle """
+    return '''
+    CREATE TABLE IF NOT EXISTS features (
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        open_time INTEGER NOT NULL,
+        close REAL,
         rsi REAL,
         sma_50 REAL,
         sma_200 REAL,
+        macd REAL,
+        signal REAL,
+        bb_high REAL,
+        bb_mid REAL,
+        bb_low REAL,
         golden_cross INTEGER,
         death_cross INTEGER,
         overbought INTEGER,
-        oversold INTEGER,           
-        UNIQUE(symbol,signal_time));
-    ''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS trades (
-                    id INTEGER PRIMARY KEY,
-                    timestamp TEXT,
-                    symbol TEXT,
-                    side TEXT,
-                    price REAL,
-                    quantity REAL,
-                    total REAL
-                 )''')
-    conn.commit()
-    conn.close()
-    
+        oversold INTEGER,
+        signal_type TEXT,
+        PRIMARY KEY (symbol, interval, open_time)
+    ) WITHOUT ROWID
+    '''
+
+def migrate_market_data_coverage():
+    """ Version 4: open time ranges already downloaded per symbol and interval, with or without candles """
+    return '''
+    CREATE TABLE IF NOT EXISTS market_data_coverage (
+        symbol TEXT NOT NULL,
+        interval TEXT NOT NULL,
+        first_open_time INTEGER NOT NULL,
+        last_open_time INTEGER NOT NULL,
+        PRIMARY KEY (symbol, interval, first_open_time, last_open_time)
+    ) WITHOUT ROWID
+    '''
+
+def migrate_backtest_results():
+    """ Version 5: backtest runs keyed by a hash of strategy, symbol, date range and parameters, metrics ranked per name """
+    return '''
+    CREATE TABLE IF NOT EXISTS backtest_runs (
+        id INTEGER PRIMARY KEY,
+        run_hash TEXT NOT NULL UNIQUE,
+        strategy TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        start_time INTEGER,
+        end_time INTEGER,
+        params TEXT NOT NULL,
+        seconds REAL,
+        created_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS backtest_runs_strategy ON backtest_runs (strategy, symbol);
+    CREATE TABLE IF NOT EXISTS backtest_metrics (
+        run_id INTEGER NOT NULL,
+        metric TEXT NOT NULL,
+        value REAL,
+        PRIMARY KEY (run_id, metric)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS backtest_metrics_rank ON backtest_metrics (metric, value)
+    '''
+
+# Applied in order, PRAGMA user_version holds the number of migrations already run.
+# Each migration returns the SQL script that is executed in its own transaction.
+MIGRATIONS = [
+    migrate_market_data_interval,
+    migrate_market_data_rollup,
+    migrate_features,
+    migrate_market_data_coverage,
+    migrate_backtest_results,
+]
+
+# Rollup intervals maintained from each base interval. Rollups are only written
+# when base candles are inserted, so 4h/1d/1w bars exist for the symbols whose
+# 1h candles are ingested (utils/fetch_historical_data.get_data backfills 1h by
+# default); stored 1d or 4h candles are not rolled up.
+ROLLUPS = {
+    '1h': ('4h', '1d', '1w'),
+}
+# Binance weeks start on Monday 00:00 UTC, the epoch was a Thursday
+ROLLUP_OFFSETS = {
+    '1w': 4 * 86400 * 1000,
+}
+
+def migrate_database(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.executescript(f'BEGIN; {migration()}; PRAGMA user_version = {number}; COMMIT;')
+        except Exception:
+            conn.rollback()
+            raise
+        if migration is migrate_market_data_interval:
+            report_skipped_market_data(conn)
+
     
-def fetch_data(symbol='BTCUSDT', limit=500):
+def fetch_data(symbol='BTCUSDT', limit=500, interval='1d'):
     # Connect to the SQLite database
     conn = connect_db()
-    # Fetch data for the specified symbol
-    query = f"""SELECT id, start_time, end_time, close, symbol 
-                FROM (
-                    SELECT id, start_time, end_time, close, symbol
-                    FROM market_data 
-                    WHERE symbol = '{symbol}'
-                    ORDER BY id DESC
-                    LIMIT '{limit}'
-                ) AS last_records
-                ORDER BY id ASC"""
-    df = pd.read_sql(query, conn, parse_dates=['start_time'], index_col='id')
-    conn.close()
+    try:
+        # Last candles for the symbol, a backwards seek on the (symbol, interval, open_time) index
+        query = """SELECT id, start_time, end_time, close, symbol 
+                    FROM (
+                        SELECT id, start_time, end_time, close, symbol, open_time
+                        FROM market_data 
+                        WHERE symbol = ? AND interval = ?
+                        ORDER BY open_time DESC
+                        LIMIT ?
+                    ) AS last_records
+                    ORDER BY open_time ASC"""
+        df = pd.read_sql(query, conn, params=(symbol, interval, limit), parse_dates=['start_time'], index_col='id')
+    finally:
+        conn.close()
     return df  
 
+def fetch_market_data_range(symbol, interval='1d', start=None, end=None):
+    """ Candles with start <= open_time < end (epoch milliseconds, open ended when None) """
+    conn = connect_db()
+    try:
+        query = """SELECT open_time, close_time, open, high, low, close, volume, symbol, interval
+                   FROM market_data
+                   WHERE symbol = ? AND interval = ? AND open_time >= ? AND open_time < ?
+                   ORDER BY open_time ASC"""
+        params = (symbol, interval, start if start is not None else 0, end if end is not None else 2 ** 62)
+        df = pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+    return df
+
 def fetch_daily_data(symbol='BTCUSDT'):
-    # Connect to the SQLite database
+    # Daily bars from the rollup, or the stored daily candles when there is no hourly base data
+    df = fetch_rollup(symbol, '1d')
+    if df.empty:
+        df = fetch_market_data_range(symbol, '1d')
+    df['start_time'] = pd.to_datetime(df['open_time'], unit='ms')
+    return df.set_index('start_time').sort_index(ascending=False)
+
+def fetch_rollup(symbol, interval, start=None, end=None):
+    """
+    Rollup bars with start <= open_time < end (epoch milliseconds, open ended
+    when None). Empty unless the base interval of ROLLUPS is ingested.
+    """
     conn = connect_db()
-    # Fetch data for the specified symbol
-    query = f"""
-        SELECT 
-            t1.*
-        FROM 
-            market_data t1
-        INNER JOIN 
-            (
-                SELECT 
-                    DATE(start_time) as date,
-                    MAX(id) as max_id
-                FROM 
-                    market_data
-                GROUP BY 
-                    DATE(start_time)
-            ) t2 ON t1.id = t2.max_id
-        ORDER BY 
-            t1.start_time DESC;
-        """
-    df = pd.read_sql(query, conn, parse_dates=['start_time'], index_col='start_time')
-    conn.close()
-    return df  
+    try:
+        query = """SELECT open_time, close_time, open, high, low, close, volume, symbol, interval, candles
+                   FROM market_data_rollup
+                   WHERE symbol = ? AND interval = ? AND open_time >= ? AND open_time < ?
+                   ORDER BY open_time ASC"""
+        params = (symbol, interval, start if start is not None else 0, end if end is not None else 2 ** 62)
+        df = pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+    return df
 
-def insert_data(event_timestamp,start_time, end_time, open, high, low, close, volume,symbol):
+def update_rollups(conn, symbol, base_interval, first_open_time, last_open_time):
+    """
+    Recomputes the rollup bars overlapping [first_open_time, last_open_time] of the
+    base candles: first open, max high, min low, last close and summed volume.
+    Only the touched buckets are read, so the cost does not grow with history.
+    """
+    for interval in ROLLUPS.get(base_interval, ()):
+        bucket_ms = INTERVAL_SECONDS[interval] * 1000
+        offset = ROLLUP_OFFSETS.get(interval, 0)
+        start = first_open_time - (first_open_time - offset) % bucket_ms
+        end = last_open_time - (last_open_time - offset) % bucket_ms + bucket_ms
+        conn.execute('''INSERT INTO market_data_rollup (symbol, interval, open_time, close_time, open, high, low, close, volume, base_interval, candles)
+                        SELECT g.symbol, :interval, g.bucket, g.bucket + :bucket_ms - 1,
+                               (SELECT open FROM market_data WHERE symbol = g.symbol AND interval = :base AND open_time = g.first_open_time),
+                               g.high, g.low,
+                               (SELECT close FROM market_data WHERE symbol = g.symbol AND interval = :base AND open_time = g.last_open_time),
+                               g.volume, :base, g.candles
+                        FROM (
+                            SELECT symbol, open_time - ((open_time - :offset) % :bucket_ms) AS bucket,
+                                   MIN(open_time) AS first_open_time, MAX(open_time) AS last_open_time,
+                                   MAX(high) AS high, MIN(low) AS low, SUM(volume) AS volume, COUNT(*) AS candles
+                            FROM market_data
+                            WHERE symbol = :symbol AND interval = :base AND open_time >= :start AND open_time < :end
+                            GROUP BY bucket
+                        ) AS g
+                        WHERE true
+                        ON CONFLICT(symbol, interval, open_time) DO UPDATE SET
+                            open = excluded.open,
+                            high = excluded.high,
+                            low = excluded.low,
+                            close = excluded.close,
+                            volume = excluded.volume,
+                            candles = excluded.candles''',
+                     {'interval': interval, 'bucket_ms': bucket_ms, 'offset': offset, 'base': base_interval,
+                      'symbol': symbol, 'start': start, 'end': end})
+
+def rebuild_rollups(symbol, base_interval='1h'):
+    # Builds the rollups over the whole stored history, e.g. after a backfill of older data
+    conn = connect_db()
+    try:
+        with conn:
+            first, last = conn.execute('SELECT MIN(open_time), MAX(open_time) FROM market_data WHERE symbol = ? AND interval = ?',
+                                       (symbol, base_interval)).fetchone()
+            if first is not None:
+                update_rollups(conn, symbol, base_interval, first, last)
+    finally:
+        conn.close()
+
+def insert_data(event_timestamp,start_time, end_time, open, high, low, close, volume,symbol, interval='1d'):
     try:
         conn = connect_db()
         c = conn.cursor()
-        c.execute('''INSERT INTO market_data (event_timestamp, start_time, end_time, open, high, low, close, volume, symbol) 
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
-                  (event_timestamp, start_time, end_time, open, high, low, close, volume, symbol))
+        c.execute('''INSERT INTO market_data (event_timestamp, start_time, end_time, open, high, low, close, volume, symbol, interval, open_time, close_time) 
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
+                  (event_timestamp, start_time, end_time, open, high, low, close, volume, symbol, interval,
+                   transform_date_to_timestamp(start_time), transform_date_to_timestamp(end_time) + 999))
         conn.commit()
     except sqlite3.IntegrityError as e:
         print("SQLite integrity error:", e)
@@ -152,21 +393,114 @@ def insert_data(event_timestamp,start_time, end_time, open, high, low, close, vo
         if conn:
             conn.close()
 
+def insert_market_data(rows):
+    """
+    Bulk upsert of processed klines (dicts shaped like process_kline output)
+    in a single transaction. Existing candles are only rewritten when their
+    prices or volume changed (e.g. the last, still open candle of a backfill).
+    Returns a dict with the number of inserted, updated and skipped rows.
+    """
+    rows = list(rows)
+    conn = connect_db()
+    try:
+        c = conn.cursor()
+        last_id = c.execute('SELECT COALESCE(MAX(id), 0) FROM market_data').fetchone()[0]
+        changes_before = conn.total_changes
+        with conn:
+            c.executemany('''INSERT INTO market_data (event_timestamp, start_time, end_time, open, high, low, close, volume, symbol, interval, open_time, close_time)
+                             VALUES (:event_timestamp, :start_time, :end_time, :open, :high, :low, :close, :volume, :symbol, :interval, :open_time, :close_time)
+                             ON CONFLICT(symbol, interval, open_time) DO UPDATE SET
+                                event_timestamp = excluded.event_timestamp,
+                                open = excluded.open,
+                                high = excluded.high,
+                                low = excluded.low,
+                                close = excluded.close,
+                                volume = excluded.volume
+                             WHERE market_data.high <> excluded.high
+                                OR market_data.low <> excluded.low
+                                OR market_data.close <> excluded.close
+                                OR market_data.volume <> excluded.volume''', rows)
+            changed = conn.total_changes - changes_before
+            # Keep the rollups of the touched buckets in step, in the same transaction
+            touched = {}
+            for row in rows:
+                if row['interval'] in ROLLUPS:
+                    key = (row['symbol'], row['interval'])
+                    first, last = touched.get(key, (row['open_time'], row['open_time']))
+                    touched[key] = (min(first, row['open_time']), max(last, row['open_time']))
+            for (symbol, interval), (first, last) in touched.items():
+                update_rollups(conn, symbol, interval, first, last)
+        inserted = c.execute('SELECT COUNT(*) FROM market_data WHERE id > ?', (last_id,)).fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'inserted': inserted,
+        'updated': changed - inserted,
+        'skipped': len(rows) - changed
+    }
+
+def fetch_market_data_gaps(symbol, interval, interval_ms):
+    """
+    Returns (last_open_time, gaps) for the candles of one symbol and interval,
+    all values in epoch milliseconds. Each gap is an
+    (first_missing_open_time, last_missing_open_time) tuple.
+    """
+    conn = connect_db()
+    try:
+        query = '''SELECT open_time, next_open_time FROM (
+                       SELECT open_time, LEAD(open_time) OVER (ORDER BY open_time) AS next_open_time
+                       FROM market_data
+                       WHERE symbol = ? AND interval = ?
+                   )
+                   WHERE next_open_time IS NULL OR next_open_time - open_time > ?'''
+        rows = conn.execute(query, (symbol, interval, interval_ms)).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return None, []
+    last_open_time = rows[-1][0]
+    gaps = [(open_time + interval_ms, next_open_time - interval_ms) for open_time, next_open_time in rows[:-1]]
+    return last_open_time, gaps
+
+def fetch_market_data_coverage(symbol, interval):
+    """ [(first_open_time, last_open_time)] ranges recorded by insert_market_data_coverage """
+    conn = connect_db()
+    try:
+        rows = conn.execute('''SELECT first_open_time, last_open_time FROM market_data_coverage
+                               WHERE symbol = ? AND interval = ? ORDER BY first_open_time''', (symbol, interval)).fetchall()
+    finally:
+        conn.close()
+    return [tuple(row) for row in rows]
+
+def insert_market_data_coverage(symbol, interval, first_open_time, last_open_time):
+    # Marks a downloaded range as complete, even where the exchange had no candles
+    conn = connect_db()
+    try:
+        with conn:
+            conn.execute('''INSERT OR IGNORE INTO market_data_coverage (symbol, interval, first_open_time, last_open_time)
+                            VALUES (?, ?, ?, ?)''', (symbol, interval, int(first_open_time), int(last_open_time)))
+    finally:
+        conn.close()
+
 def store_last_signal(symbol, signal_time, signal_type, rsi, sma_50, sma_200, golden_cross, death_cross, overbought, oversold):
     conn = connect_db()
-    cursor = conn.cursor()
-    # INSERT OR REPLACE based on the uniqueness of (symbol, signal_time)
-    query = '''INSERT OR REPLACE INTO trading_signals (symbol, signal_time, signal_type, rsi, sma_50, sma_200, golden_cross, death_cross, overbought, oversold) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
-    cursor.execute(query, (symbol, signal_time.isoformat(), signal_type, rsi, sma_50, sma_200, golden_cross, death_cross, overbought, oversold))
-    conn.commit()
-    conn.close()     
+    try:
+        cursor = conn.cursor()
+        # INSERT OR REPLACE based on the uniqueness of (symbol, signal_time)
+        query = '''INSERT OR REPLACE INTO trading_signals (symbol, signal_time, signal_type, rsi, sma_50, sma_200, golden_cross, death_cross, overbought, oversold) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+        cursor.execute(query, (symbol, signal_time.isoformat(), signal_type, rsi, sma_50, sma_200, golden_cross, death_cross, overbought, oversold))
+        conn.commit()
+    finally:
+        conn.close()
 
 def log_trade(symbol, side, price, quantity):
     conn = connect_db()
-    c = conn.cursor()
-    total = price * quantity
-    c.execute("INSERT INTO trades (timestamp, symbol, side, price, quantity, total) VALUES (datetime('now'), ?, ?, ?, ?, ?)",
-              (symbol, side, price, quantity, total))
-    conn.commit()
-    conn.close()       
\ No newline at end of file
+    try:
+        c = conn.cursor()
+        total = price * quantity
+        c.execute("INSERT INTO trades (timestamp, symbol, side, price, quantity, total) VALUES (datetime('now'), ?, ?, ?, ?, ?)",
+                  (symbol, side, price, quantity, total))
+        conn.commit()
+    finally:
+        conn.close()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import math
+
+import pandas as pd
+
+from db.database import connect_db
+from helpers.data_manipulation import transform_date_to_timestamp
+
+# Indicator values and signal flags stored per (symbol, interval, open_time)
+FEATURE_COLUMNS = [
+    'close', 'rsi', 'sma_50', 'sma_200', 'macd', 'signal', 'bb_high', 'bb_mid', 'bb_low',
+    'golden_cross', 'death_cross', 'overbought', 'oversold', 'signal_type'
+]
+
+
+def _sql_value(value):
+    # NaN warm-up values become NULL, boolean flags 0/1
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def last_feature_time(symbol, interval='1d'):
+    conn = connect_db()
+    try:
+        row = conn.execute('SELECT MAX(open_time) FROM features WHERE symbol = ? AND interval = ?', (symbol, interval)).fetchone()
+    finally:
+        conn.close()
+    return row[0]
+
+
+def fetch_feature_candles(symbol, interval='1d', since=None, warmup=500):
+    """
+    Candles with open_time >= since plus the warmup candles before it, enough
+    history for the indicators of the new candles. All candles when since is None.
+    """
+    conn = connect_db()
+    try:
+        query = """SELECT open_time, start_time, close, symbol
+                   FROM market_data
+                   WHERE symbol = :symbol AND interval = :interval AND open_time >= COALESCE((
+                       SELECT open_time FROM market_data
+                       WHERE symbol = :symbol AND interval = :interval AND open_time < :since
+                       ORDER BY open_time DESC
+                       LIMIT 1 OFFSET :offset
+                   ), 0)
+                   ORDER BY open_time ASC"""
+        params = {'symbol': symbol, 'interval': interval, 'since': int(since) if since is not None else 0, 'offset': max(warmup - 1, 0)}
+        df = pd.read_sql(query, conn, params=params, parse_dates=['start_time'])
+    finally:
+        conn.close()
+    return df
+
+
+def store_features(symbol, interval, df):
+    """
+    Upserts the FEATURE_COLUMNS of df (one row per candle, open_time column)
+    in a single transaction. Returns the number of rows written.
+    """
+    columns = [column for column in FEATURE_COLUMNS if column in df.columns]
+    values = zip(*(df[column].tolist() for column in ['open_time'] + columns))
+    rows = [(symbol, interval) + tuple(_sql_value(value) for value in row) for row in values]
+    conn = connect_db()
+    try:
+        with conn:
+            conn.executemany(f'''INSERT INTO features (symbol, interval, open_time, {', '.join(columns)})
+                                 VALUES (?, ?, ?, {', '.join('?' for _ in columns)})
+                                 ON CONFLICT(symbol, interval, open_time) DO UPDATE SET
+                                 {', '.join(f'{column} = excluded.{column}' for column in columns)}''', rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def fetch_features(symbol, interval='1d', start=None, end=None, columns=None):
+    """ Feature rows with start <= open_time < end (epoch milliseconds, open ended when None) """
+    columns = [column for column in (columns or FEATURE_COLUMNS) if column in FEATURE_COLUMNS]
+    conn = connect_db()
+    try:
+        query = f"""SELECT symbol, interval, open_time, {', '.join(columns)}
+                    FROM features
+                    WHERE symbol = ? AND interval = ? AND open_time >= ? AND open_time < ?
+                    ORDER BY open_time ASC"""
+        params = (symbol, interval, int(start) if start is not None else 0, int(end) if end is not None else 2 ** 62)
+        df = pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+    return df
+
+
+def last_signal_open_time(symbol):
+    # trading_signals holds start_time.isoformat(), the local time string of the candle
+    conn = connect_db()
+    try:
+        row = conn.execute('SELECT MAX(signal_time) FROM trading_signals WHERE symbol = ?', (symbol,)).fetchone()
+    finally:
+        conn.close()
+    return transform_date_to_timestamp(row[0].replace('T', ' ')) if row[0] else None
+
+
+def store_signals(since_by_symbol, interval='1d'):
+    """
+    Upserts the feature rows of every symbol with open_time >= since (all rows
+    when since is None) into trading_signals, in one transaction. The rows look
+    like the ones store_last_signal writes. Returns the number of rows written.
+    """
+    conn = connect_db()
+    try:
+        with conn:
+            changes_before = conn.total_changes
+            for symbol, since in since_by_symbol.items():
+                conn.execute('''INSERT INTO trading_signals (symbol, signal_time, signal_type, rsi, sma_50, sma_200, golden_cross, death_cross, overbought, oversold)
+                                SELECT f.symbol, replace(m.start_time, ' ', 'T'), f.signal_type, f.rsi, f.sma_50, f.sma_200,
+                                       f.golden_cross, f.death_cross, f.overbought, f.oversold
+                                FROM features AS f
+                                JOIN market_data AS m ON m.symbol = f.symbol AND m.interval = f.interval AND m.open_time = f.open_time
+                                WHERE f.symbol = ? AND f.interval = ? AND f.open_time >= ?
+                                ON CONFLICT(symbol, signal_time) DO UPDATE SET
+                                    signal_type = excluded.signal_type,
+                                    rsi = excluded.rsi,
+                                    sma_50 = excluded.sma_50,
+                                    sma_200 = excluded.sma_200,
+                                    golden_cross = excluded.golden_cross,
+                                    death_cross = excluded.death_cross,
+                                    overbought = excluded.overbought,
+                                    oversold = excluded.oversold''',
+                             (symbol, interval, int(since) if since is not None else 0))
+            written = conn.total_changes - changes_before
+    finally:
+        conn.close()
+    return written
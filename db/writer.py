@@ -0,0 +1,44 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class DatabaseWriter:
+    """
+    Runs every database write on one background thread so concurrent
+    producers (download workers, websocket callbacks) never contend for
+    the SQLite write lock. submit() returns a Future with the result.
+    """
+    def __init__(self, name='db-writer'):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.queue.put((future, fn, args, kwargs))
+        return future
+
+    def close(self):
+        # Pending writes are flushed before the thread exits
+        self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
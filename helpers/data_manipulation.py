@@ -3,6 +3,10 @@ import datetime
 def transform_timestamp_to_date(timestamp):
     return datetime.datetime.fromtimestamp(timestamp / 1000.0).strftime('%Y-%m-%d %H:%M:%S')
 
+def transform_date_to_timestamp(date):
+    # Inverse of transform_timestamp_to_date, epoch milliseconds
+    return int(datetime.datetime.strptime(date, '%Y-%m-%d %H:%M:%S').timestamp() * 1000)
+
 def current_datetime():
     # Get the current date and time
     current_date_time = datetime.datetime.now()
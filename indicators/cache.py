@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Memory budget of the in-process cache
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def fingerprint(values):
+    """ Hash of the input data, so a changed candle never reuses old indicator values """
+    data = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+
+
+class IndicatorCache:
+    """
+    Memoized indicator outputs keyed by (symbol, interval, indicator, params,
+    first and last candle timestamp, data hash). Results are dicts of NumPy
+    arrays held in an LRU bounded by max_bytes. With a directory, results are
+    also written there as .npz files, so a later run over unchanged candles
+    loads them instead of computing again.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(symbol, interval, indicator, params, first_time, last_time, values):
+        return (symbol, interval, indicator, tuple(sorted(params.items())),
+                str(first_time), str(last_time), fingerprint(values))
+
+    def _path(self, key):
+        name = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f'{name}.npz')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError) as e:
+            print(f"Error reading indicator cache file {path}: {e}")
+            return None
+
+    def _save(self, key, result):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **result)
+        os.replace(tmp, path)
+
+    def _put(self, key, result):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = result
+            self.size += sum(array.nbytes for array in result.values())
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(array.nbytes for array in evicted.values())
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+        result = self._load(key)
+        if result is not None:
+            with self.lock:
+                self.disk_hits += 1
+            self._put(key, result)
+        return result
+
+    def get_or_compute(self, key, compute):
+        """ Cached result for key, compute() returns {name: array} on a miss. Returned arrays are copies """
+        result = self.get(key)
+        if result is None:
+            with self.lock:
+                self.misses += 1
+            result = {name: np.asarray(array) for name, array in compute().items()}
+            self._put(key, result)
+            if self.directory is not None:
+                self._save(key, result)
+        return {name: array.copy() for name, array in result.items()}
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'entries': len(self.entries), 'bytes': self.size}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+# One cache per process; INDICATOR_CACHE_DIR keeps results across runs
+shared_indicator_cache = IndicatorCache(directory=os.environ.get('INDICATOR_CACHE_DIR'))
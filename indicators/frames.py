@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from indicators import kernels
+from indicators.cache import IndicatorCache, shared_indicator_cache
+
+# DataFrame wrappers around the batched kernels, filling the same columns the
+# bots used to fill with ta one Series at a time. Results are memoized in the
+# shared IndicatorCache, so recomputing over unchanged candles is a lookup.
+
+TIME_COLUMNS = ('open_time', 'timestamp', 'start_time')
+
+
+def _time_range(df):
+    for name in TIME_COLUMNS:
+        if name in df.columns:
+            times = df[name].to_numpy()
+            break
+    else:
+        times = df.index.to_numpy()
+    return (times[0], times[-1]) if len(times) else (None, None)
+
+
+def _cache_key(df, close, indicator, params, symbol=None, interval=None):
+    if symbol is None and 'symbol' in df.columns and len(df):
+        symbol = df['symbol'].iloc[-1]
+    first_time, last_time = _time_range(df)
+    return IndicatorCache.key(symbol, interval, indicator, params, first_time, last_time, close)
+
+
+def cached_columns(df, indicator, params, compute, symbol=None, interval=None, cache=None):
+    """
+    Adds the columns compute(close) returns ({column: array}) to df, reusing the
+    cached result when the same indicator already ran over the same candles.
+    """
+    cache = shared_indicator_cache if cache is None else cache
+    close = df['close'].to_numpy(dtype=np.float64)
+    key = _cache_key(df, close, indicator, params, symbol, interval)
+    for name, values in cache.get_or_compute(key, lambda: compute(close)).items():
+        df[name] = values
+    return df
+
+
+def add_macd_rsi(df, fast_length=12, slow_length=26, signal_smoothing=9, rsi_length=14, interval=None):
+    def compute(close):
+        macd, signal, _ = kernels.macd(close, fast_length, slow_length, signal_smoothing)
+        return {'macd': macd, 'signal': signal, 'rsi': kernels.rsi(close, rsi_length)}
+    params = {'fast': fast_length, 'slow': slow_length, 'signal': signal_smoothing, 'rsi': rsi_length}
+    return cached_columns(df, 'macd_rsi', params, compute, interval=interval)
+
+
+def add_rsi_sma(df, rsi_length=14, sma_short=50, sma_long=200, interval=None):
+    def compute(close):
+        return {'rsi': kernels.rsi(close, rsi_length), 'sma_50': kernels.sma(close, sma_short),
+                'sma_200': kernels.sma(close, sma_long)}
+    params = {'rsi': rsi_length, 'sma_short': sma_short, 'sma_long': sma_long}
+    return cached_columns(df, 'rsi_sma', params, compute, interval=interval)
+
+
+def add_bollinger_indicators(df, window=20, window_dev=2, interval=None):
+    # Same columns as ta's bollinger_hband_indicator / bollinger_mavg / bollinger_lband_indicator:
+    # bb_high and bb_low are 1.0 when the close is outside the band, else 0.0
+    def compute(close):
+        high, mid, low = kernels.bollinger_bands(close, window, window_dev)
+        with np.errstate(invalid='ignore'):
+            return {'bb_high': np.where(close > high, 1.0, 0.0), 'bb_mid': mid,
+                    'bb_low': np.where(close < low, 1.0, 0.0)}
+    return cached_columns(df, 'bollinger_indicators', {'window': window, 'window_dev': window_dev}, compute, interval=interval)
+
+
+def ema_close(df, window=200, interval=None):
+    """ df['close'].ewm(span=window).mean() as a Series """
+    close = df['close'].to_numpy(dtype=np.float64)
+    key = _cache_key(df, close, 'ema_adjust', {'window': window}, interval=interval)
+    values = shared_indicator_cache.get_or_compute(key, lambda: {'ema': kernels.ema(close, window, adjust=True, min_periods=1)})
+    return pd.Series(values['ema'], index=df.index)
+
+
+def add_indicators_batch(frames, columns=None, interval=None, **params):
+    """
+    Computes the indicators for {symbol: DataFrame} in one batched pass and adds
+    them as columns to every frame (all of kernels.compute_indicators unless
+    columns names a subset). Frames already in the cache are not recomputed.
+    Returns frames.
+    """
+    keys = {}
+    results = {}
+    for symbol, df in frames.items():
+        close = df['close'].to_numpy(dtype=np.float64)
+        keys[symbol] = _cache_key(df, close, 'indicator_set', params, symbol, interval)
+        results[symbol] = shared_indicator_cache.get(keys[symbol])
+    missing = {symbol: frames[symbol]['close'].to_numpy(dtype=np.float64) for symbol, result in results.items() if result is None}
+    if missing:
+        symbols, matrix = kernels.stack_closes(missing)
+        values = kernels.compute_indicators(matrix, **params)
+        for i, symbol in enumerate(symbols):
+            # Rows are aligned on the latest candle, so each frame owns the tail of its row
+            start = matrix.shape[1] - len(missing[symbol])
+            row = {name: values[name][i, start:].copy() for name in values if name != 'close'}
+            results[symbol] = shared_indicator_cache.get_or_compute(keys[symbol], lambda row=row: row)
+    for symbol, df in frames.items():
+        for name in columns or list(results[symbol]):
+            df[name] = results[symbol][name].copy()
+    return frames
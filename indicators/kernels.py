@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+# Batched versions of the indicators the bots compute with the ta library.
+# Every kernel takes a float array shaped (symbols, time), oldest candle first,
+# and returns arrays of the same shape, so one call covers a whole universe of
+# symbols. A 1-D array is treated as a single symbol and a 1-D array comes back.
+# Rows may start with NaN (symbols with a shorter history are padded on the
+# left); each row warms up from its own first value, exactly like the same
+# series computed on its own with ta. Warm-up positions are NaN, as in ta.
+# Zero-length input (no stored candles yet) gives (symbols, 0) arrays back.
+
+
+def _as_matrix(values):
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values.reshape(1, -1), True
+    return values, False
+
+
+def _result(values, vector):
+    return values[0] if vector else values
+
+
+def ema(values, window, adjust=False, min_periods=None, alpha=None):
+    """
+    pandas ewm(span=window, adjust=...).mean() per row. alpha overrides the
+    span (Wilder smoothing uses alpha=1/window). The recursion runs in pandas'
+    compiled ewm over all rows at once (one column per symbol).
+    """
+    x, vector = _as_matrix(values)
+    if x.shape[1] == 0:
+        return _result(np.empty(x.shape), vector)
+    alpha = 2.0 / (window + 1) if alpha is None else alpha
+    min_periods = window if min_periods is None else min_periods
+    out = pd.DataFrame(x.T).ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean().to_numpy().T
+    return _result(np.ascontiguousarray(out), vector)
+
+
+def _rolling_sums(x, window):
+    # Window sums of x and x^2 from cumulative sums. Values are taken relative to
+    # the first value of each row to limit cancellation errors.
+    valid = ~np.isnan(x)
+    first = np.argmax(valid, axis=1)
+    shift = np.where(valid.any(axis=1), x[np.arange(x.shape[0]), first], 0.0)[:, None]
+    y = np.where(valid, x - shift, 0.0)
+    zeros = np.zeros((x.shape[0], 1))
+    total = np.concatenate([zeros, np.cumsum(y, axis=1)], axis=1)
+    total_sq = np.concatenate([zeros, np.cumsum(y * y, axis=1)], axis=1)
+    count = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    return (total[:, window:] - total[:, :-window], total_sq[:, window:] - total_sq[:, :-window],
+            count[:, window:] - count[:, :-window], shift)
+
+
+def sma(values, window):
+    """ ta.trend.SMAIndicator: rolling mean, NaN until the window is full """
+    x, vector = _as_matrix(values)
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= window:
+        total, _, count, shift = _rolling_sums(x, window)
+        out[:, window - 1:] = np.where(count == window, total / window + shift, np.nan)
+    return _result(out, vector)
+
+
+def rolling_std(values, window):
+    """ Population standard deviation over the last window values (ddof=0, as ta uses) """
+    x, vector = _as_matrix(values)
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= window:
+        total, total_sq, count, _ = _rolling_sums(x, window)
+        mean = total / window
+        std = np.sqrt(np.maximum(total_sq / window - mean * mean, 0.0))
+        out[:, window - 1:] = np.where(count == window, std, np.nan)
+    return _result(out, vector)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """ ta.trend.MACD: returns (macd, signal, histogram) """
+    x, vector = _as_matrix(close)
+    line = ema(x, fast) - ema(x, slow)
+    # The signal line starts with the first defined MACD value
+    signal_line = ema(line, signal)
+    return _result(line, vector), _result(signal_line, vector), _result(line - signal_line, vector)
+
+
+def rsi(close, window=14):
+    """ ta.momentum.RSIIndicator: Wilder smoothing of gains and losses """
+    x, vector = _as_matrix(close)
+    if x.shape[1] == 0:
+        return _result(np.empty(x.shape), vector)
+    diff = np.empty(x.shape)
+    diff[:, 0] = np.nan
+    diff[:, 1:] = x[:, 1:] - x[:, :-1]
+    # ta counts the first difference of a series as 0
+    diff = np.where(np.isnan(diff), 0.0, diff)
+    present = ~np.isnan(x)
+    gain = np.where(present, np.maximum(diff, 0.0), np.nan)
+    loss = np.where(present, np.maximum(-diff, 0.0), np.nan)
+    up = ema(gain, window, alpha=1.0 / window)
+    down = ema(loss, window, alpha=1.0 / window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = np.where(down == 0, 100.0, 100.0 - 100.0 / (1.0 + up / down))
+    return _result(out, vector)
+
+
+def bollinger_bands(close, window=20, window_dev=2):
+    """ ta.volatility.BollingerBands: returns (high, mid, low) """
+    x, vector = _as_matrix(close)
+    mid = sma(x, window)
+    std = rolling_std(x, window)
+    return _result(mid + window_dev * std, vector), _result(mid, vector), _result(mid - window_dev * std, vector)
+
+
+def compute_indicators(closes, fast_length=12, slow_length=26, signal_smoothing=9, rsi_length=14,
+                       sma_short=50, sma_long=200, ema_long=200, bb_window=20, bb_dev=2):
+    """
+    Every indicator the bots use, for all rows of closes in one pass. Keys match
+    the streaming IndicatorSet; EMA 200 follows pandas ewm(span=200) as in
+    CryptoTradingBot.
+    """
+    x, vector = _as_matrix(closes)
+    macd_line, signal_line, _ = macd(x, fast_length, slow_length, signal_smoothing)
+    bb_high, bb_mid, bb_low = bollinger_bands(x, bb_window, bb_dev)
+    values = {
+        'close': x,
+        'macd': macd_line,
+        'signal': signal_line,
+        'rsi': rsi(x, rsi_length),
+        'sma_50': sma(x, sma_short),
+        'sma_200': sma(x, sma_long),
+        'ema_200': ema(x, ema_long, adjust=True, min_periods=1),
+        'bb_high': bb_high,
+        'bb_mid': bb_mid,
+        'bb_low': bb_low,
+    }
+    return {name: _result(value, vector) for name, value in values.items()}
+
+
+def stack_closes(closes_by_symbol, length=None):
+    """
+    Builds the (symbols, time) matrix from {symbol: closes}. Rows are aligned on
+    their latest candle and shorter histories are padded with NaN on the left.
+    Returns (symbols, matrix).
+    """
+    symbols = list(closes_by_symbol)
+    rows = [np.asarray(closes_by_symbol[symbol], dtype=np.float64) for symbol in symbols]
+    if length is None:
+        length = max((len(row) for row in rows), default=0)
+    matrix = np.full((len(rows), length), np.nan)
+    for i, row in enumerate(rows):
+        row = row[-length:] if length else row[:0]
+        if len(row):
+            matrix[i, length - len(row):] = row
+    return symbols, matrix
@@ -0,0 +1,258 @@
+import math
+from collections import deque
+
+# Streaming versions of the indicators the bots compute with the ta library.
+# Every indicator keeps its running state, update(value) consumes one closed
+# candle in O(1) and peek(value) returns what update would give without
+# changing the state (useful for the still open candle). Values are None until
+# the same warm-up period ta uses has passed.
+
+# Rolling sums are recomputed from the window every RESUM_EVERY windows so
+# floating point drift cannot build up over long streams
+RESUM_EVERY = 100
+
+
+class EMA:
+    """ Exponential moving average, pandas ewm(span=window, adjust=...) semantics """
+    def __init__(self, window, adjust=False, min_periods=None):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.adjust = adjust
+        self.min_periods = window if min_periods is None else min_periods
+        self.count = 0
+        self.value = None
+        # adjust=True keeps the weighted sum and the sum of weights
+        self.numerator = 0.0
+        self.denominator = 0.0
+
+    def _next(self, x):
+        if self.adjust:
+            numerator = x + (1 - self.alpha) * self.numerator
+            denominator = 1 + (1 - self.alpha) * self.denominator
+            return numerator / denominator, numerator, denominator
+        if self.value is None:
+            return x, 0.0, 0.0
+        return self.alpha * x + (1 - self.alpha) * self.value, 0.0, 0.0
+
+    def update(self, x):
+        self.value, self.numerator, self.denominator = self._next(x)
+        self.count += 1
+        return self.current
+
+    def peek(self, x):
+        value = self._next(x)[0]
+        return value if self.count + 1 >= self.min_periods else None
+
+    @property
+    def current(self):
+        return self.value if self.count >= self.min_periods else None
+
+
+class SMA:
+    """ Simple moving average over the last window values """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, x):
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        self.updates += 1
+        if self.updates % (self.window * RESUM_EVERY) == 0:
+            self.total = math.fsum(self.values)
+        return self.current
+
+    def peek(self, x):
+        if len(self.values) + 1 < self.window:
+            return None
+        dropped = self.values[0] if len(self.values) == self.window else 0.0
+        return (self.total - dropped + x) / self.window
+
+    @property
+    def current(self):
+        return self.total / self.window if len(self.values) == self.window else None
+
+
+class MACD:
+    """ ta.trend.MACD: EMA(fast) - EMA(slow) and its EMA(signal) """
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def _macd(self, fast, slow):
+        return None if fast is None or slow is None else fast - slow
+
+    def update(self, x):
+        macd = self._macd(self.fast.update(x), self.slow.update(x))
+        # The signal line starts with the first defined MACD value
+        signal = self.signal.update(macd) if macd is not None else None
+        return macd, signal
+
+    def peek(self, x):
+        macd = self._macd(self.fast.peek(x), self.slow.peek(x))
+        signal = self.signal.peek(macd) if macd is not None else None
+        return macd, signal
+
+
+class RSI:
+    """ ta.momentum.RSIIndicator: Wilder smoothing of gains and losses """
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.previous = None
+        self.count = 0
+        self.up = None
+        self.down = None
+
+    def _next(self, x):
+        diff = 0.0 if self.previous is None else x - self.previous
+        gain, loss = max(diff, 0.0), max(-diff, 0.0)
+        if self.up is None:
+            return gain, loss
+        return (self.alpha * gain + (1 - self.alpha) * self.up,
+                self.alpha * loss + (1 - self.alpha) * self.down)
+
+    @staticmethod
+    def _rsi(up, down):
+        return 100.0 if down == 0 else 100.0 - 100.0 / (1.0 + up / down)
+
+    def update(self, x):
+        self.up, self.down = self._next(x)
+        self.previous = x
+        self.count += 1
+        return self.current
+
+    def peek(self, x):
+        if self.count + 1 < self.window:
+            return None
+        return self._rsi(*self._next(x))
+
+    @property
+    def current(self):
+        return self._rsi(self.up, self.down) if self.count >= self.window else None
+
+
+class BollingerBands:
+    """ ta.volatility.BollingerBands: SMA +/- window_dev population standard deviations """
+    def __init__(self, window=20, window_dev=2):
+        self.window = window
+        self.window_dev = window_dev
+        self.values = deque()
+        # Sums are kept relative to the first value to limit cancellation errors
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    def _bands(self, total, total_sq, shift):
+        mean = total / self.window
+        std = math.sqrt(max(total_sq / self.window - mean * mean, 0.0))
+        mid = mean + shift
+        return mid + self.window_dev * std, mid, mid - self.window_dev * std
+
+    def update(self, x):
+        if self.shift is None:
+            self.shift = x
+        y = x - self.shift
+        self.values.append(y)
+        self.total += y
+        self.total_sq += y * y
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        self.updates += 1
+        if self.updates % (self.window * RESUM_EVERY) == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(y * y for y in self.values)
+        return self.current
+
+    def peek(self, x):
+        if len(self.values) + 1 < self.window:
+            return None
+        shift = x if self.shift is None else self.shift
+        y = x - shift
+        old = self.values[0] if len(self.values) == self.window else 0.0
+        return self._bands(self.total - old + y, self.total_sq - old * old + y * y, shift)
+
+    @property
+    def current(self):
+        if len(self.values) < self.window:
+            return None
+        return self._bands(self.total, self.total_sq, self.shift)
+
+
+class IndicatorSet:
+    """
+    The indicators used by the bots for one symbol/interval: MACD, RSI,
+    SMA 50/200, EMA 200 (pandas ewm(span=200) as in CryptoTradingBot) and
+    Bollinger Bands. update()/peek() return a dict with the latest values.
+    """
+    def __init__(self, fast_length=12, slow_length=26, signal_smoothing=9, rsi_length=14,
+                 sma_short=50, sma_long=200, ema_long=200, bb_window=20, bb_dev=2):
+        self.macd = MACD(fast_length, slow_length, signal_smoothing)
+        self.rsi = RSI(rsi_length)
+        self.sma_short = SMA(sma_short)
+        self.sma_long = SMA(sma_long)
+        self.ema_long = EMA(ema_long, adjust=True, min_periods=1)
+        self.bollinger = BollingerBands(bb_window, bb_dev)
+        self.close = None
+        self.count = 0
+
+    def _values(self, close, macd, rsi, sma_short, sma_long, ema_long, bands):
+        bb_high, bb_mid, bb_low = bands if bands is not None else (None, None, None)
+        return {
+            'close': close,
+            'macd': macd[0],
+            'signal': macd[1],
+            'rsi': rsi,
+            'sma_50': sma_short,
+            'sma_200': sma_long,
+            'ema_200': ema_long,
+            'bb_high': bb_high,
+            'bb_mid': bb_mid,
+            'bb_low': bb_low,
+        }
+
+    def update(self, close):
+        self.close = close
+        self.count += 1
+        return self._values(close, self.macd.update(close), self.rsi.update(close), self.sma_short.update(close),
+                            self.sma_long.update(close), self.ema_long.update(close), self.bollinger.update(close))
+
+    def peek(self, close):
+        return self._values(close, self.macd.peek(close), self.rsi.peek(close), self.sma_short.peek(close),
+                            self.sma_long.peek(close), self.ema_long.peek(close), self.bollinger.peek(close))
+
+
+class IndicatorEngine:
+    """
+    Indicator state per (symbol, interval, params). warm_up() replays history
+    once, afterwards on_close() costs a handful of float operations per candle.
+    """
+    def __init__(self):
+        self.states = {}
+
+    def state(self, symbol, interval, **params):
+        key = (symbol, interval, tuple(sorted(params.items())))
+        if key not in self.states:
+            self.states[key] = IndicatorSet(**params)
+        return self.states[key]
+
+    def warm_up(self, symbol, interval, closes, **params):
+        state = self.state(symbol, interval, **params)
+        values = None
+        for close in closes:
+            values = state.update(float(close))
+        return values
+
+    def on_close(self, symbol, interval, close, **params):
+        return self.state(symbol, interval, **params).update(float(close))
+
+    def peek(self, symbol, interval, close, **params):
+        return self.state(symbol, interval, **params).peek(float(close))
@@ -0,0 +1,54 @@
+import itertools
+
+import numpy as np
+
+from indicators import kernels
+
+# Output channels of a surface, in order
+SURFACE_COLUMNS = ('macd', 'signal', 'rsi')
+
+
+def parameter_grid(fast_lengths, slow_lengths, signal_smoothings, rsi_lengths):
+    """ Every (fast, slow, signal, rsi_length) combination with fast < slow """
+    return [params for params in itertools.product(fast_lengths, slow_lengths, signal_smoothings, rsi_lengths)
+            if params[0] < params[1]]
+
+
+def macd_rsi_surface(close, grid):
+    """
+    MACD, signal and RSI of one close array for every (fast, slow, signal,
+    rsi_length) in grid. Returns an array shaped (len(grid), 3, len(close));
+    surface[i] holds SURFACE_COLUMNS for grid[i], with the same values as
+    kernels.macd and kernels.rsi. Each distinct EMA span, MACD signal line and
+    RSI length is computed once and shared by every combination using it.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    surface = np.empty((len(grid), len(SURFACE_COLUMNS), len(close)))
+    if not grid:
+        return surface
+
+    spans = sorted({params[0] for params in grid} | {params[1] for params in grid})
+    emas = {span: kernels.ema(close, span) for span in spans}
+
+    pairs = sorted({(fast, slow) for fast, slow, _, _ in grid})
+    lines = {pair: emas[pair[0]] - emas[pair[1]] for pair in pairs}
+    signals = {}
+    # One batched EMA per signal length over all MACD lines that need it
+    for signal in sorted({params[2] for params in grid}):
+        needed = sorted({(fast, slow) for fast, slow, s, _ in grid if s == signal})
+        smoothed = kernels.ema(np.vstack([lines[pair] for pair in needed]), signal)
+        for pair, row in zip(needed, smoothed):
+            signals[pair + (signal,)] = row
+
+    rsis = {window: kernels.rsi(close, window) for window in sorted({params[3] for params in grid})}
+
+    for i, (fast, slow, signal, rsi_length) in enumerate(grid):
+        surface[i, 0] = lines[(fast, slow)]
+        surface[i, 1] = signals[(fast, slow, signal)]
+        surface[i, 2] = rsis[rsi_length]
+    return surface
+
+
+def grid_index(grid):
+    """ {params: index into the surface} """
+    return {params: i for i, params in enumerate(grid)}
@@ -1,4 +1,7 @@
 from binance.client import Client
+from analysis.rules import Rule
+from brokers.candle_cache import get_klines
+from brokers.exchange_info import symbol_rules
 import pandas as pd
 import asyncio
 import time
@@ -7,12 +10,18 @@ from configuration.telegram_config import config as telegram_config
 from db.database import log_trade, setup_database
 from notifications.telegram import send_telegram_message
 import pandas_ta as ta
+from indicators.frames import cached_columns
+from utils.candle_events import run_on_candle_close
 
-# Initialize the Binance client
-binance_config = binance_config()
-api_key = binance_config['api_key']
-api_secret = binance_config['api_secret']
-client = Client(api_key, api_secret)
+# Binance client, created on first use so importing the rules needs no network
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        config = binance_config()
+        client = Client(config['api_key'], config['api_secret'])
+    return client
 
 symbol = 'ETHUSDT'
 timeframe = '1h'
@@ -24,31 +33,50 @@ macd_signal = 9
 rsi_period = 14
 trade_percentage = 0.10  # 10% of equity for each trade
 
-def fetch_data(symbol, interval):
-    klines = client.get_klines(symbol=symbol, interval=interval)
+# Entry and exit rules, shared with main_new_bot_backtest
+BUY_RULE = Rule({
+    'sma_cross_up': 'SMA[1] < LMA[1] and SMA > LMA',
+    'macd_above_signal': 'MACD > MACD_Signal',
+    'rsi_in_range': 'RSI > 50 and RSI < 70',
+})
+SELL_RULE = Rule({
+    'sma_cross_down': 'SMA[1] > LMA[1] and SMA < LMA',
+    'macd_below_signal': 'MACD < MACD_Signal',
+    'rsi_in_range': 'RSI < 50 and RSI > 30',
+})
+
+def fetch_data(symbol, interval, closed=False):
+    klines = get_klines(get_client(), symbol, interval, closed=closed)
     df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
     df['close'] = df['close'].astype(float)
     return df
 
 def fetch_historical_data(symbol, interval, start_str, end_str=None):
-    klines = client.get_historical_klines(symbol, interval, start_str, end_str)
+    klines = get_client().get_historical_klines(symbol, interval, start_str, end_str)
     df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
     df['close'] = df['close'].astype(float)
     return df
 
 def calculate_indicators(df):
-    df['SMA'] = ta.sma(df['close'], length=sma_period)
-    df['LMA'] = ta.sma(df['close'], length=lma_period)
+    params = {'sma': sma_period, 'lma': lma_period, 'macd_short': macd_short, 'macd_long': macd_long,
+              'macd_signal': macd_signal, 'rsi': rsi_period}
+    return cached_columns(df, 'pandas_ta_sma_macd_rsi', params, compute_indicators)
+
+def compute_indicators(close):
+    close = pd.Series(close)
+    values = {}
+    values['SMA'] = ta.sma(close, length=sma_period)
+    values['LMA'] = ta.sma(close, length=lma_period)
     
     # Calculate MACD and MACD Signal separately
-    df['MACD'] = ta.ema(df['close'], length=macd_short) - ta.ema(df['close'], length=macd_long)
-    df['MACD_Signal'] = ta.ema(df['MACD'], length=macd_signal)
+    values['MACD'] = ta.ema(close, length=macd_short) - ta.ema(close, length=macd_long)
+    values['MACD_Signal'] = ta.ema(values['MACD'], length=macd_signal)
     
-    df['RSI'] = ta.rsi(df['close'], length=rsi_period)
-    return df
+    values['RSI'] = ta.rsi(close, length=rsi_period)
+    return {name: series.to_numpy(dtype=float) for name, series in values.items()}
 
 def get_balance(asset):
-    balance = client.get_asset_balance(asset=asset)
+    balance = get_client().get_asset_balance(asset=asset)
     return float(balance['free'])
 
 def calculate_trade_quantity(symbol, trade_percentage, side):
@@ -56,16 +84,21 @@ def calculate_trade_quantity(symbol, trade_percentage, side):
     if side == Client.SIDE_BUY:
         equity = get_balance('USDT')
         trade_amount_in_usdt = equity * trade_percentage
-        price = float(client.get_symbol_ticker(symbol=symbol)['price'])
+        price = float(get_client().get_symbol_ticker(symbol=symbol)['price'])
         quantity = trade_amount_in_usdt / price
     else:  # side == Client.SIDE_SELL
         equity = get_balance(asset)
         quantity = equity * trade_percentage
-    return round(quantity, 6)  # rounding to 6 decimal places for precision
+    rules = symbol_rules(get_client(), symbol)
+    if rules is None:
+        print(f"No exchange rules for {symbol}, unknown or delisted symbol")
+        return None
+    # Round down to the symbol's step size, exactly
+    return float(rules.quantity(quantity))
 
 def place_order(symbol, side, quantity, order_type=Client.ORDER_TYPE_MARKET):
     try:
-        order = client.create_order(
+        order = get_client().create_order(
             symbol=symbol,
             side=side,
             type=order_type,
@@ -85,22 +118,39 @@ def telegram(message):
     config = telegram_config()
     asyncio.run(send_telegram_message(config['token'], config['chat_id'], message))
 
-def main():
+def trade(symbol, closed=False):
+    # closed=True evaluates the candle that just closed instead of the open one
+    df = fetch_data(symbol, timeframe, closed)
+    df = calculate_indicators(df)        
+
+    if BUY_RULE.evaluate(df)[0][-1]:
+        print("Buy Signal")
+        quantity = calculate_trade_quantity(symbol, trade_percentage,Client.SIDE_BUY)
+        if quantity is not None:
+            place_order(symbol, Client.SIDE_BUY, quantity)
+    if SELL_RULE.evaluate(df)[0][-1]:
+        print("Sell Signal")
+        quantity = calculate_trade_quantity(symbol, trade_percentage,Client.SIDE_SELL)
+        if quantity is not None:
+            place_order(symbol, Client.SIDE_SELL, quantity)
+
+def main(event_driven=True, stream=True):
+    # Trades when the candle closes; event_driven=False keeps the hourly sleep loop
     telegram('New BOT Started')
     setup_database()
     heartbeat = 0
-    while True:
-        df = fetch_data(symbol, timeframe)
-        df = calculate_indicators(df)        
+    if event_driven:
+        def on_cycle():
+            nonlocal heartbeat
+            heartbeat += 1
+            if heartbeat % 24 == 0:
+                telegram('Heartbeat - bot is alive')
 
-        if df['SMA'].iloc[-2] < df['LMA'].iloc[-2] and df['SMA'].iloc[-1] > df['LMA'].iloc[-1] and df['MACD'].iloc[-1] > df['MACD_Signal'].iloc[-1] and df['RSI'].iloc[-1] > 50 and df['RSI'].iloc[-1] < 70:
-            print("Buy Signal")
-            quantity = calculate_trade_quantity(symbol, trade_percentage,Client.SIDE_BUY)
-            place_order(symbol, Client.SIDE_BUY, quantity)
-        if df['SMA'].iloc[-2] > df['LMA'].iloc[-2] and df['SMA'].iloc[-1] < df['LMA'].iloc[-1] and df['MACD'].iloc[-1] < df['MACD_Signal'].iloc[-1] and df['RSI'].iloc[-1] < 50 and df['RSI'].iloc[-1] > 30:
-            print("Sell Signal")
-            quantity = calculate_trade_quantity(symbol, trade_percentage,Client.SIDE_SELL)
-            place_order(symbol, Client.SIDE_SELL, quantity)
+        run_on_candle_close([symbol], timeframe, lambda symbol: trade(symbol, closed=True),
+                            client=get_client(), stream=stream, on_cycle=on_cycle)
+        return
+    while True:
+        trade(symbol)
         time.sleep(60 * 60)  # Wait for 1 hour before the next iteration
         heartbeat += 1
         if heartbeat % 24 == 0:
@@ -3,13 +3,8 @@ from binance.client import Client
 from datetime import datetime
 import matplotlib.pyplot as plt
 
-# Initialize the Binance client
-from configuration.binance_config import config as binance_config
-from main_new_bot import calculate_indicators
-binance_config = binance_config()
-api_key = binance_config['api_key']
-api_secret = binance_config['api_secret']
-client = Client(api_key, api_secret)
+from backtesting.data import load_candles
+from main_new_bot import BUY_RULE, SELL_RULE, calculate_indicators
 
 symbol = 'ETHUSDT'
 timeframe = '1h'
@@ -23,10 +18,8 @@ trade_percentage = 0.20  # 10% of equity for each trade
 initial_balance = 1000  # Initial balance in USDT
 
 def fetch_historical_data(symbol, interval, start_str, end_str=None):
-    klines = client.get_historical_klines(symbol, interval, start_str, end_str)
-    df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-    df['close'] = df['close'].astype(float)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    # Local candles, only the missing ranges are downloaded
+    df = load_candles(symbol, interval, start_str, end_str)
     df.set_index('timestamp', inplace=True)
     return df
 
@@ -42,9 +35,12 @@ def backtest(df, initial_balance, trade_percentage):
     balance = initial_balance
     eth_balance = 0
     trades = []
+    # Same compiled rules as the live bot, evaluated for every candle at once
+    buy_signals, _ = BUY_RULE.evaluate(df)
+    sell_signals, _ = SELL_RULE.evaluate(df)
 
     for i in range(1, len(df)):
-        if df['SMA'].iloc[i-1] < df['LMA'].iloc[i-1] and df['SMA'].iloc[i] > df['LMA'].iloc[i] and df['MACD'].iloc[i] > df['MACD_Signal'].iloc[i] and df['RSI'].iloc[i] > 50 and df['RSI'].iloc[i] < 70:
+        if buy_signals[i]:
             # Buy Signal
             trade_amount_in_usdt = balance * trade_percentage
             trade_amount_in_eth = trade_amount_in_usdt / df['close'].iloc[i]
@@ -52,7 +48,7 @@ def backtest(df, initial_balance, trade_percentage):
             eth_balance += trade_amount_in_eth
             trades.append({'timestamp': df.index[i], 'type': 'buy', 'price': df['close'].iloc[i], 'amount': trade_amount_in_eth, 'amount(USDT)':trade_amount_in_usdt})
 
-        if df['SMA'].iloc[i-1] > df['LMA'].iloc[i-1] and df['SMA'].iloc[i] < df['LMA'].iloc[i] and df['MACD'].iloc[i] < df['MACD_Signal'].iloc[i] and df['RSI'].iloc[i] < 50 and df['RSI'].iloc[i] > 30:
+        if sell_signals[i]:
             # Sell Signal
             trade_amount_in_eth = eth_balance * trade_percentage
             trade_amount_in_usdt = trade_amount_in_eth * df['close'].iloc[i]
@@ -1,13 +1,15 @@
 import asyncio
-import pandas as pd
-import ta
 import time
+import pandas as pd
+from indicators.frames import add_macd_rsi
 from binance.client import Client
+from brokers.candle_cache import get_klines
 from binance.enums import *
 from configuration.binance_config import config as binance_config
 from db.database import log_trade, setup_database
 from configuration.telegram_config import config as telegram_config
 from notifications.telegram import send_telegram_message
+from utils.candle_events import run_on_candle_close
 
 # Set up Binance API
 binance_config = binance_config()
@@ -28,18 +30,18 @@ rsi_entry_min = 40
 rsi_entry_max = 60
 investment_percentage = 0.1  # 10% of equity
 
-def fetch_ohlcv(symbol, timeframe):
-    klines = client.get_klines(symbol=symbol, interval=timeframe)
+# Live 4h candles stay on REST (delta fetches through the candle cache): the
+# market_data_rollup 4h bars are only as current as the ingested 1h candles and
+# never hold the still open candle.
+def fetch_ohlcv(symbol, timeframe, closed=False):
+    klines = get_klines(client, symbol, timeframe, closed=closed)
     df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
     df['close'] = df['close'].astype(float)
     return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
 
 def calculate_indicators(df):
-    macd = ta.trend.MACD(df['close'], window_slow=slow_length, window_fast=fast_length, window_sign=signal_smoothing)
-    df['macd'] = macd.macd()
-    df['signal'] = macd.macd_signal()
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=rsi_length).rsi()
+    add_macd_rsi(df, fast_length, slow_length, signal_smoothing, rsi_length)
     return df
 
 def generate_signals(df):
@@ -76,8 +78,9 @@ def execute_trade(signal, symbol, side, quantity):
         # Log the trade
         log_trade(symbol, side, price, quantity)
 
-def run_bot():
-    df = fetch_ohlcv(symbol, timeframe)
+def run_bot(closed=False):
+    # closed=True evaluates the candle that just closed instead of the open one
+    df = fetch_ohlcv(symbol, timeframe, closed)
     df = calculate_indicators(df)
     df = generate_signals(df)
     
@@ -100,9 +103,16 @@ def telegram(message):
     config = telegram_config()
     asyncio.run(send_telegram_message(config['token'], config['chat_id'], message))     
 
-if __name__ == "__main__":
+def main(event_driven=True, stream=True):
+    # Runs as each timeframe candle closes; event_driven=False keeps the sleep loop
     setup_database()
     telegram('Trading bot started')
+    if event_driven:
+        run_on_candle_close([symbol], timeframe, lambda symbol: run_bot(closed=True), client=client, stream=stream)
+        return
     while True:
         run_bot()
         time.sleep(60 * 240)  # Run every hour (timeframe = 1h)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-import ta
+from indicators.frames import add_bollinger_indicators, add_rsi_sma
 import time
 from binance.client import Client
+from analysis.rules import SignalRules
+from brokers.candle_cache import get_historical_klines
 from configuration.binance_config import config as binance_config
 from db.database import fetch_data, store_last_signal
 from analysis.send_signal import send_signal
 from notifications.telegram import send_telegram_message
+from utils.candle_events import run_on_candle_close
 from configuration.telegram_config import config as telegram_config
 import asyncio
 import pandas as pd
@@ -16,24 +19,14 @@ api_secret = binance_config['api_secret']
 client = Client(api_key, api_secret)
 
 def calculate_indicators(df):
-    # Symbol
-    df['symbol'] = df['symbol']
-    # Calculate the 14-period RSI
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
-    
-    # Calculate the 50-period SMA
-    df['sma_50'] = ta.trend.SMAIndicator(df['close'], window=50).sma_indicator()
-    
-    # Calculate the 200-period SMA
-    df['sma_200'] = ta.trend.SMAIndicator(df['close'], window=200).sma_indicator()
-    
-    # Calculate Bollinger Bands
-    df['bb_high'], df['bb_mid'], df['bb_low'] = ta.volatility.bollinger_hband_indicator(df['close']), ta.volatility.bollinger_mavg(df['close']), ta.volatility.bollinger_lband_indicator(df['close'])
-    
+    # 14-period RSI, 50-period SMA and 200-period SMA
+    add_rsi_sma(df)
+    # Bollinger Bands: band indicators and moving average, as ta's bollinger_*band_indicator and bollinger_mavg
+    add_bollinger_indicators(df)
     return df
 
-def get_historical_data(symbol, interval, lookback):
-    klines = client.get_historical_klines(symbol, interval, lookback)
+def get_historical_data(symbol, interval, lookback, closed=False):
+    klines = get_historical_klines(client, symbol, interval, lookback, closed)
     data = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 
                                          'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 
                                          'taker_buy_quote_asset_volume', 'ignore'])
@@ -44,22 +37,21 @@ def get_historical_data(symbol, interval, lookback):
     data['symbol'] = symbol
     return data
 
-def generate_signals(data):
-    signals = pd.DataFrame(index=data.index)
-    signals['signal'] = 0
-
+# Later rules override earlier ones on the same candle
+SIGNAL_RULES = SignalRules([
     # Buy signal: RSI below 30 and price crosses above the lower Bollinger Band
-    signals.loc[(data['rsi'] < 30) & (data['close'] > data['bb_low']), 'signal'] = 1
-
+    (1, 'rsi < 30 and close > bb_low'),
     # Sell signal: RSI above 70 and price crosses below the upper Bollinger Band
-    signals.loc[(data['rsi'] > 70) & (data['close'] < data['bb_high']), 'signal'] = -1
-    
+    (-1, 'rsi > 70 and close < bb_high'),
     # Golden cross signal: 50 SMA crosses above 200 SMA
-    signals.loc[(data['sma_50'].shift(1) < data['sma_200'].shift(1)) & (data['sma_50'] > data['sma_200']), 'signal'] = 2
-    
+    (2, 'sma_50[1] < sma_200[1] and sma_50 > sma_200'),
     # Death cross signal: 50 SMA crosses below 200 SMA
-    signals.loc[(data['sma_50'].shift(1) > data['sma_200'].shift(1)) & (data['sma_50'] < data['sma_200']), 'signal'] = -2
+    (-2, 'sma_50[1] > sma_200[1] and sma_50 < sma_200'),
+], default=0)
 
+def generate_signals(data):
+    signals = pd.DataFrame(index=data.index)
+    signals['signal'] = SIGNAL_RULES.evaluate(data)
     return signals
 
 def get_last_signal(signals, data, symbol):
@@ -79,14 +71,28 @@ def telegram(message):
     config = telegram_config()
     asyncio.run(send_telegram_message(config['token'], config['chat_id'], message))
 
-def zeus_main(symbols=['BTCUSDT', 'ETHUSDT', 'TRXUSDT', 'SOLUSDT','BNBUSDT','XRPUSDT'], sleep=3600):
+def analyze_symbol(symbol, closed=False):
+    df = get_historical_data(symbol, '1h', '1 month ago UTC', closed)
+    df = calculate_indicators(df)
+    signals = generate_signals(df)
+    get_last_signal(signals, df, symbol)
+
+def zeus_main(symbols=['BTCUSDT', 'ETHUSDT', 'TRXUSDT', 'SOLUSDT','BNBUSDT','XRPUSDT'], sleep=3600, event_driven=True, stream=True):
+    # Symbols are analyzed when their hourly candle closes; event_driven=False sleeps between loops
     heartbeat = 0
+    if event_driven:
+        def on_cycle():
+            nonlocal heartbeat
+            heartbeat += 1
+            if heartbeat % 24 == 0:
+                telegram('Heartbeat - ZEUS is alive')
+
+        run_on_candle_close(symbols, '1h', lambda symbol: analyze_symbol(symbol, closed=True),
+                            client=client, stream=stream, on_cycle=on_cycle)
+        return
     while True:
         for symbol in symbols:
-            df = get_historical_data(symbol, '1h', '1 month ago UTC')
-            df = calculate_indicators(df)
-            signals = generate_signals(df)
-            get_last_signal(signals, df, symbol)
+            analyze_symbol(symbol)
         time.sleep(sleep)
         heartbeat += 1
         if heartbeat % 24 == 0:
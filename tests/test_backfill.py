@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+import brokers.binance as binance
+from brokers.binance import backfill_historical_data, process_trading_pairs
+from db.database import fetch_market_data_coverage, fetch_rollup, setup_database
+
+DAY = 24 * 3600 * 1000
+START = 1_600_041_600_000
+
+
+def kline(open_time, duration=DAY):
+    return [open_time, '1', '1', '1', '1', '1', open_time + duration - 1, '0', 0, '0', '0', '0']
+
+
+class HistoryClient:
+    # Daily candles with the days in missing never traded
+    def __init__(self, days, missing):
+        self.open_times = [START + i * DAY for i in range(days) if i not in missing]
+        self.requests = []
+
+    def get_historical_klines(self, symbol, interval, start_str, end_str=None):
+        self.requests.append((start_str, end_str))
+        start = START if isinstance(start_str, str) else start_str
+        return [kline(t) for t in self.open_times if t >= start and (end_str is None or t <= end_str)]
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    setup_database()
+
+
+def test_backfill_skips_gaps_without_candles(database):
+    client = HistoryClient(20, missing={5, 6})
+    backfill_historical_data(client, 'AAA', interval='1d')
+    # The exchange has nothing for days 5-6, one attempt is enough
+    backfill_historical_data(client, 'AAA', interval='1d')
+    assert client.requests[1:] == [(START + 5 * DAY, START + 6 * DAY), (START + 19 * DAY, None)]
+    assert fetch_market_data_coverage('AAA', '1d') == [(START + 5 * DAY, START + 6 * DAY)]
+    backfill_historical_data(client, 'AAA', interval='1d')
+    assert client.requests[3:] == [(START + 19 * DAY, None)]
+
+
+def test_hourly_backfill_fills_rollups(database):
+    # The 4h/1d/1w rollups are built from 1h candles only
+    hour = DAY // 24
+    client = HistoryClient(0, missing=set())
+    client.get_historical_klines = lambda symbol, interval, start_str, end_str=None: [kline(START + i * hour, hour) for i in range(48)]
+    backfill_historical_data(client, 'AAA', interval='1h')
+    assert fetch_rollup('AAA', '4h')['candles'].tolist() == [4] * 12
+    assert fetch_rollup('AAA', '1d')['candles'].tolist() == [24] * 2
+
+
+def test_concurrent_backfill_writes_coverage_on_the_writer_thread(database, monkeypatch):
+    threads = set()
+    insert_coverage = binance.insert_market_data_coverage
+
+    def record(*args):
+        threads.add(threading.current_thread().name)
+        return insert_coverage(*args)
+
+    monkeypatch.setattr(binance, 'insert_market_data_coverage', record)
+    client = HistoryClient(20, missing={5, 6})
+    client._request = client._handle_response = None
+    process_trading_pairs(client, ['AAA', 'BBB'], backfill_historical_data, max_workers=2)
+    process_trading_pairs(client, ['AAA', 'BBB'], backfill_historical_data, max_workers=2)
+    assert threads == {'db-writer'}
+    assert fetch_market_data_coverage('BBB', '1d') == [(START + 5 * DAY, START + 6 * DAY)]
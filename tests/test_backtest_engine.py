@@ -0,0 +1,85 @@
+import math
+
+import numpy as np
+import pytest
+
+from backtesting.engine import simulate_take_profit
+
+
+def reference_loop(close, high, buy_signals, balance, take_profit_percentage=0.03, diversification_percentage=0.1):
+    # The bar-by-bar loop CryptoTradingBotBacktest.simulate_trading used before the engine
+    positions = []
+    trades = []
+    for i in range(1, len(close)):
+        if buy_signals[i]:
+            investment_amount = math.ceil(balance * diversification_percentage)
+            if investment_amount > 10:
+                quantity = investment_amount / float(close[i])
+                entry_price = float(close[i])
+                balance -= investment_amount
+                positions.append({'entry_price': entry_price, 'quantity': quantity,
+                                  'take_profit_price': entry_price * (1 + take_profit_percentage)})
+        for position in positions[:]:
+            if float(high[i]) >= position['take_profit_price']:
+                balance += position['quantity'] * position['take_profit_price']
+                trades.append({'entry_price': position['entry_price'], 'exit_price': position['take_profit_price'],
+                               'quantity': position['quantity'],
+                               'profit': (position['take_profit_price'] - position['entry_price']) * position['quantity']})
+                positions.remove(position)
+    open_positions_value = sum(position['quantity'] * close[-1] for position in positions)
+    return balance, trades, positions, open_positions_value
+
+
+def assert_same_as_loop(close, high, buy_signals, balance=1000, **kwargs):
+    close, high = np.asarray(close, dtype=float), np.asarray(high, dtype=float)
+    expected_balance, expected_trades, expected_positions, expected_value = reference_loop(close, high, buy_signals, balance, **kwargs)
+    result = simulate_take_profit(close, high, buy_signals, balance, **kwargs)
+    assert result['balance'] == pytest.approx(expected_balance, rel=1e-12)
+    assert result['open_positions_value'] == pytest.approx(expected_value, rel=1e-12)
+    trades = result['trades']
+    assert [{name: trades[name][i] for name in ('entry_price', 'exit_price', 'quantity', 'profit')}
+            for i in range(len(trades['entry_price']))] == [pytest.approx(trade, rel=1e-12) for trade in expected_trades]
+    positions = result['positions']
+    assert [{name: positions[name][i] for name in ('entry_price', 'quantity', 'take_profit_price')}
+            for i in range(len(positions['entry_price']))] == [pytest.approx(position, rel=1e-12) for position in expected_positions]
+    return result
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_random_walks(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 400))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + rng.uniform(0, 0.03, n))
+    buy_signals = rng.random(n) < rng.uniform(0.02, 0.5)
+    assert_same_as_loop(close, high, buy_signals, balance=float(rng.uniform(50, 5000)),
+                        take_profit_percentage=float(rng.uniform(0.005, 0.05)))
+
+
+def test_exit_on_entry_bar():
+    result = assert_same_as_loop([100, 100, 100], [100, 104, 100], [False, True, False])
+    assert result['trades']['entry_bar'].tolist() == result['trades']['exit_bar'].tolist() == [1]
+
+
+def test_several_exits_on_one_bar():
+    result = assert_same_as_loop([100, 100, 101, 102, 100], [100, 100, 101, 102, 110], [False, True, True, True, False])
+    assert result['trades']['exit_bar'].tolist() == [4, 4, 4]
+    assert result['trades']['entry_bar'].tolist() == [1, 2, 3]
+
+
+def test_sale_funds_a_later_entry():
+    # Money from the exit on bar 2 is in the balance of the entry on bar 3
+    assert_same_as_loop([100, 100, 100, 100, 100], [100, 100, 110, 100, 100], [False, True, False, True, False],
+                        balance=120, diversification_percentage=0.5)
+
+
+def test_signal_on_first_bar_is_ignored():
+    result = assert_same_as_loop([100, 100], [110, 100], [True, False])
+    assert len(result['trades']['entry_price']) == len(result['positions']['entry_price']) == 0
+
+
+@pytest.mark.parametrize('close, high, buy_signals', [([], [], []), ([100], [110], [True])])
+def test_empty_and_one_bar_input(close, high, buy_signals):
+    result = assert_same_as_loop(close, high, buy_signals)
+    assert result['balance'] == 1000
+    assert result['open_positions_value'] == 0
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from db import connection
+from db.connection import get_connection, transaction
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    with transaction() as conn:
+        conn.execute('CREATE TABLE items (value INTEGER)')
+    yield
+    connection.close_all()
+
+
+def values():
+    # A separate connection sees committed rows only
+    conn = sqlite3.connect(connection.DEFAULT_DB_FILE)
+    rows = [row[0] for row in conn.execute('SELECT value FROM items ORDER BY value')]
+    conn.close()
+    return rows
+
+
+def test_failed_inner_transaction_keeps_outer_work(database):
+    with transaction() as outer:
+        outer.execute('INSERT INTO items VALUES (1)')
+        with pytest.raises(ValueError):
+            with transaction() as inner:
+                inner.execute('INSERT INTO items VALUES (2)')
+                raise ValueError
+        outer.execute('INSERT INTO items VALUES (3)')
+    assert values() == [1, 3]
+
+
+def test_inner_transaction_does_not_commit_outer_work(database):
+    with pytest.raises(ValueError):
+        with transaction() as outer:
+            outer.execute('INSERT INTO items VALUES (1)')
+            with transaction() as inner:
+                inner.execute('INSERT INTO items VALUES (2)')
+            assert values() == []
+            raise ValueError
+    assert values() == []
+
+
+def test_failed_write_releases_the_connection(database):
+    with pytest.raises(sqlite3.OperationalError):
+        with transaction() as conn:
+            conn.execute('INSERT INTO items VALUES (1)')
+            conn.execute('INSERT INTO missing VALUES (1)')
+    assert connection._local.held == {}
+    # The write lock is free again
+    other = sqlite3.connect(connection.DEFAULT_DB_FILE, timeout=0)
+    other.execute('INSERT INTO items VALUES (2)')
+    other.commit()
+    other.close()
+    assert values() == [2]
+
+
+def test_double_close_is_ignored(database):
+    conn = get_connection()
+    conn.close()
+    conn.close()
+    assert conn.refs == 0
@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+
+from indicators import kernels
+
+
+@pytest.mark.parametrize('shape', [(0,), (3, 0), (0, 0)])
+def test_zero_length_input(shape):
+    closes = np.empty(shape)
+    values = kernels.compute_indicators(closes)
+    assert {name: value.shape for name, value in values.items()} == {name: shape for name in values}
+    assert kernels.rsi(closes).shape == shape
+    assert kernels.ema(closes, 10).shape == shape
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from db.database import setup_database
+from db.connection import close_all, get_connection
+from helpers.data_manipulation import transform_timestamp_to_date
+
+DAY = 24 * 3600 * 1000
+# 2024-03-31 00:00 UTC, the day Europe/Athens switches to summer time
+DST_DAY = 1_711_843_200_000
+
+
+@pytest.fixture
+def athens(monkeypatch):
+    monkeypatch.setenv('TZ', 'Europe/Athens')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_interval_migration_labels_dst_days(athens, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect('trading_bot.db')
+    # market_data as it was before the interval column, times written as local time text
+    conn.execute('''CREATE TABLE market_data (id INTEGER PRIMARY KEY AUTOINCREMENT, event_timestamp TEXT, start_time TEXT,
+                    end_time TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL, symbol,
+                    UNIQUE(start_time, end_time, symbol))''')
+    for open_time in (DST_DAY - DAY, DST_DAY, DST_DAY + DAY):
+        conn.execute('INSERT INTO market_data (start_time, end_time, close, symbol) VALUES (?, ?, 1, ?)',
+                     (transform_timestamp_to_date(open_time), transform_timestamp_to_date(open_time + DAY - 1), 'AAA'))
+    conn.commit()
+    conn.close()
+    setup_database()
+    conn = get_connection()
+    rows = conn.execute('SELECT interval, open_time, close_time FROM market_data ORDER BY open_time').fetchall()
+    skipped = conn.execute('SELECT COUNT(*) FROM market_data_skipped').fetchone()[0]
+    conn.close()
+    close_all()
+    assert [tuple(row) for row in rows] == [('1d', t, t + DAY - 1) for t in (DST_DAY - DAY, DST_DAY, DST_DAY + DAY)]
+    assert skipped == 0
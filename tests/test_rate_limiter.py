@@ -0,0 +1,56 @@
+import threading
+import types
+
+from binance.client import Client
+
+from brokers.rate_limiter import RequestWeightLimiter, rate_limit_client
+
+
+class SessionClient(Client):
+    # Answers from a fake session; the used weight header is the one given in the request params
+    def __init__(self):
+        self.session = self
+        self.barrier = threading.Barrier(2)
+
+    def _get_request_kwargs(self, method, signed, force_params=False, **kwargs):
+        return kwargs
+
+    def get(self, uri, params=None):
+        return types.SimpleNamespace(status_code=200, headers={'x-mbx-used-weight-1m': str(params['weight'])},
+                                     json=lambda: self.answer(params['weight']))
+
+    def answer(self, weight):
+        # Both threads have stored their response in client.response before either call returns
+        self.barrier.wait()
+        return weight
+
+    def close_connection(self):
+        pass
+
+
+class RecordingLimiter(RequestWeightLimiter):
+    def __init__(self):
+        super().__init__()
+        self.synced = []
+
+    def sync(self, used_weight):
+        self.synced.append(used_weight)
+        super().sync(used_weight)
+
+
+def test_used_weight_is_read_from_each_calls_response():
+    client = SessionClient()
+    limiter = RecordingLimiter()
+    rate_limit_client(client, limiter)
+    results = {}
+
+    def call(weight):
+        results[weight] = client._request('get', 'https://api.binance.com/api/v3/ping', False, params={'weight': weight})
+
+    threads = [threading.Thread(target=call, args=(weight,)) for weight in (100, 200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {100: 100, 200: 200}
+    assert sorted(limiter.synced) == [100, 200]
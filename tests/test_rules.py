@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from analysis.rules import Rule
+
+
+def test_negative_literals():
+    values = {'macd': np.array([-2.0, -1.0, -0.5, 0.5]), 'signal': np.array([-1.5, -1.5, 0.0, 0.0])}
+    signal, masks = Rule({'a': 'macd > -1', 'b': 'macd <= -.5', 'c': 'signal == -1.5'}).evaluate(values)
+    assert masks['a'].tolist() == [False, False, True, True]
+    assert masks['b'].tolist() == [True, True, True, False]
+    assert masks['c'].tolist() == [True, True, False, False]
+    assert signal.tolist() == [False, False, False, False]
+
+
+def test_negative_literal_on_the_left():
+    signal, _ = Rule({'a': '-1 < macd and macd < 1'}).evaluate({'macd': np.array([-2.0, 0.0, 2.0])})
+    assert signal.tolist() == [False, True, False]
+
+
+def test_lone_minus_is_invalid():
+    with pytest.raises(ValueError):
+        Rule({'a': 'macd > - 1'})
+
+
+@pytest.mark.parametrize('expression', ['close[-1] > 2', 'close[1.5] > 2'])
+def test_lookback_has_to_be_a_whole_number(expression):
+    with pytest.raises(ValueError):
+        Rule({'a': expression})
+
+
+def test_lookback():
+    rule = Rule({'a': 'close > close[2]'})
+    signal, _ = rule.evaluate({'close': np.array([1.0, 3.0, 2.0, 4.0])})
+    assert signal.tolist() == [False, False, True, True]
+    assert rule.window == 3
@@ -0,0 +1,144 @@
+import types
+
+import numpy as np
+import pytest
+from binance.client import Client
+
+import trading_bot.claude as claude
+from analysis.strategy import CLAUDE_STRATEGY, parity_mismatches
+
+HOUR = 3600 * 1000
+SEEDS = [0, 1, 2, 3, 4]
+# The live parameters and variants whose entry bands fire more often
+PARAMETER_SETS = [
+    {},
+    {'rsi_entry_min': 55, 'rsi_entry_max': 80},
+    {'fast_length': 8, 'slow_length': 21, 'signal_smoothing': 7, 'rsi_length': 10, 'rsi_entry_min': 60, 'rsi_entry_max': 85},
+]
+
+
+def random_walk(seed, length=5000):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+
+
+def rest_klines(close, start=1_600_000_000_000):
+    # REST layout, only open time, close and close time matter to the strategy
+    return [[start + i * HOUR, '0', '0', '0', repr(float(value)), '0', start + (i + 1) * HOUR - 1,
+             '0', 0, '0', '0', '0'] for i, value in enumerate(close)]
+
+
+class FakeClient(Client):
+    # No REST session, CryptoTradingBot only needs the attribute
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def close_connection(self):
+        pass
+
+
+@pytest.fixture
+def bot(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(claude, 'Client', FakeClient)
+    return claude.CryptoTradingBot({'AAA': {}})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {'ms': 0}
+    monkeypatch.setattr(claude, 'time', types.SimpleNamespace(time=lambda: now['ms'] / 1000))
+    return now
+
+
+@pytest.mark.parametrize('params', PARAMETER_SETS)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_stream_matches_vectorized(seed, params):
+    strategy = CLAUDE_STRATEGY.replace(**params)
+    assert parity_mismatches(strategy, random_walk(seed)) == []
+
+
+@pytest.mark.parametrize('params', PARAMETER_SETS)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_parameter_sets_produce_signals(seed, params):
+    # Parity over candles without a single signal would prove little
+    strategy = CLAUDE_STRATEGY.replace(**params)
+    assert strategy.signals(random_walk(seed))[0][1500:].sum() > 0
+
+
+@pytest.mark.parametrize('params', PARAMETER_SETS)
+@pytest.mark.parametrize('seed', SEEDS[:3])
+def test_live_signal_matches_vectorized(bot, clock, seed, params):
+    """
+    CryptoTradingBot.strategy_signal fed the klines it asks for (history_limit)
+    once per closed candle, the still open candle included, with missed cycles
+    short enough to be caught up and one long enough to reset the state.
+    """
+    bot.strategy = CLAUDE_STRATEGY.replace(**params)
+    close = random_walk(seed)
+    klines = rest_klines(close)
+    missed = {2600} | set(range(3500, 3520))
+    warm_up_starts = []
+    expected = {}
+    signals = 0
+    for end in range(1500, len(close)):
+        # One second into the candle after the last closed one
+        clock['ms'] = klines[end - 1][6] + 1000
+        limit = bot.history_limit('AAA')
+        if end in missed:
+            continue
+        if limit == claude.STRATEGY_HISTORY:
+            warm_up_starts.append(end - limit)
+        start = warm_up_starts[-1]
+        # The REST answer ends with the open candle
+        window = klines[max(0, end + 1 - limit):end + 1]
+        signal = bot.strategy_signal('AAA', window)
+        if start not in expected:
+            # Indicators are causal, one pass from the warm-up start covers every later candle
+            expected[start] = bot.strategy.signals(close[start:])[0]
+        assert signal == bool(expected[start][end - 1 - start]), f"candle {end - 1}"
+        signals += signal
+    # The short gap was caught up, the long one replayed a full history
+    assert warm_up_starts == [1500 - claude.STRATEGY_HISTORY, 3520 - claude.STRATEGY_HISTORY]
+    assert signals > 0
+
+
+def test_live_signal_peeks_open_candle(bot, clock):
+    close = random_walk(3)
+    klines = rest_klines(close)
+    clock['ms'] = klines[-1][6] - 1000
+    signal = bot.strategy_signal('AAA', klines[-claude.STRATEGY_HISTORY:], closed=False)
+    expected, _ = bot.strategy.signals(close[-claude.STRATEGY_HISTORY:])
+    assert signal == bool(expected[-1])
+    # Peeking does not consume the open candle
+    assert bot.streams['AAA'].open_time == klines[-2][0]
+
+
+def test_live_signal_with_short_history_resets(bot, clock):
+    close = random_walk(4)
+    klines = rest_klines(close)
+    clock['ms'] = klines[2999][6] + 1000
+    bot.strategy_signal('AAA', klines[2000:3000])
+    # Five candles later than the state can continue from
+    clock['ms'] = klines[3099][6] + 1000
+    assert bot.history_limit('AAA') == claude.STRATEGY_HISTORY
+    bot.strategy_signal('AAA', klines[3095:3100])
+    assert bot.streams['AAA'].count == 5
+
+
+def test_live_signal_against_210_candle_window():
+    """
+    The bot used to compute the indicators over the last 210 candles. MACD and
+    RSI conditions agree with that; ema_200 now averages the whole history, so
+    only price_above_ema200 may differ.
+    """
+    close = random_walk(0)
+    signals, masks = CLAUDE_STRATEGY.signals(close)
+    differs = set()
+    flipped = 0
+    for end in range(1000, 2500):
+        window_signals, window_masks = CLAUDE_STRATEGY.signals(close[end - 209:end + 1])
+        differs.update(name for name in masks if window_masks[name][-1] != masks[name][end])
+        flipped += window_signals[-1] != signals[end]
+    assert differs == {'price_above_ema200'}
+    assert flipped <= 1
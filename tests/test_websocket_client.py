@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import utils.websocket_client as websocket_client
+
+
+def closed_kline(open_time):
+    return {'e': 'kline', 's': 'AAA', 'E': open_time + 60_000, 'k': {'i': '1m', 'x': True, 't': open_time, 'T': open_time + 59_999,
+                                                       'o': '1', 'h': '1', 'l': '1', 'c': '1', 'v': '1'}}
+
+
+def test_flush_retries_locked_database(monkeypatch):
+    written = []
+    failures = iter([sqlite3.OperationalError('database is locked')] * 2)
+
+    def insert_market_data(rows):
+        for error in failures:
+            raise error
+        written.extend(rows)
+
+    monkeypatch.setattr(websocket_client, 'insert_market_data', insert_market_data)
+    writer = websocket_client.KlineWriteBehind(retry_delay=0)
+    for i in range(3):
+        writer.on_kline('aaa@kline_1m', closed_kline(i * 60_000))
+    writer.close()
+    assert [row['open_time'] for row in written] == [0, 60_000, 120_000]
+
+
+def test_flush_gives_up_after_max_retries(monkeypatch):
+    calls = []
+
+    def insert_market_data(rows):
+        calls.append(len(rows))
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(websocket_client, 'insert_market_data', insert_market_data)
+    writer = websocket_client.KlineWriteBehind(max_retries=2, retry_delay=0)
+    batch = [('AAA', '1m', 60_000, websocket_client.kline_message_to_list(closed_kline(0)['k']))]
+    assert writer.flush(batch) is False
+    assert calls == [1, 1, 1]
+    writer.close()
+
+
+class SlowClient:
+    # get_historical_klines blocks until released
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def get_historical_klines(self, symbol, interval, start_str):
+        self.calls.append((symbol, interval, start_str))
+        self.release.wait(5)
+        return [[start_str, '1', '1', '1', '1', '1', start_str + 59_999, '0', 0, '0', '0', '0']]
+
+
+class StopLoop(Exception):
+    pass
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def test_gap_fill_does_not_block_on_open(monkeypatch):
+    client = SlowClient()
+    received = []
+    stream_client = websocket_client.CombinedStreamClient(['AAA', 'BBB'], ['1m'], default_handler=lambda stream, data: received.append(data),
+                                                          client=client)
+    stream_client.running = True
+    for stream in stream_client.streams:
+        stream_client.dispatch(stream, closed_kline(0))
+    sockets = []
+
+    class App:
+        # Opens, then returns like a dropped connection; the second connection stops the loop
+        def __init__(self, url, on_message, on_error, on_open):
+            self.on_open = on_open
+
+        def run_forever(self, **kwargs):
+            ws = FakeSocket()
+            sockets.append(ws)
+            started = time.monotonic()
+            self.on_open(ws)
+            assert time.monotonic() - started < 1
+            if len(sockets) == 2:
+                raise StopLoop
+
+    monkeypatch.setattr(websocket_client.websocket, 'WebSocketApp', App)
+    monkeypatch.setattr(websocket_client.time, 'sleep', lambda seconds: None)
+    with pytest.raises(StopLoop):
+        stream_client.run_connection(list(stream_client.streams))
+    assert all(ws.sent for ws in sockets)
+    client.release.set()
+    for thread in threading.enumerate():
+        if thread.name == 'gap-fill':
+            thread.join()
+    assert len(client.calls) == 2
+    assert len(received) == 4
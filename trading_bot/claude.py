@@ -2,32 +2,45 @@ import asyncio
 from datetime import datetime
 import logging
 import time
-import pandas as pd
 import sqlite3
-from binance.client import Client
+from binance.client import AsyncClient, Client
 from binance.exceptions import BinanceAPIException
-import ta
+from binance.helpers import interval_to_milliseconds
+from analysis.strategy import CLAUDE_STRATEGY
+from brokers.candle_cache import get_klines
+from brokers.exchange_info import format_decimal, quantizer, shared_exchange_info, symbol_rules
 from configuration.binance_config import config as binance_config
 from configuration.telegram_config import config as telegram_config
+from db.connection import get_connection, transaction
 from notifications.telegram import send_telegram_message
+from utils.candle_events import next_boundary, run_on_candle_close
 import math
 # Configure logging
 logging.basicConfig(filename='trading_bot.log', level=logging.INFO, 
                     format='%(asctime)s %(message)s')
+
+# Candles replayed into a new strategy state (one REST call); later cycles only
+# fetch the last few candles. The bot used to recompute the indicators over the
+# last 210 candles every cycle. MACD and RSI forget their seed within ~200
+# candles, so their conditions match that computation; ema_200 (adjust=True)
+# does not, it now averages the whole history carried by the state instead of
+# 210 candles, like the backtests do. On hourly random walks the
+# price_above_ema200 condition differs on about 7% of the candles and about 1 in
+# 20 signals (tests/test_strategy_parity.py).
+STRATEGY_HISTORY = 1000
+RECENT_CANDLES = 5
+
 class CryptoTradingBot:
     heartbeat = 0
     def __init__(self, trading_pairs_config):
         bnc = binance_config()
         self.client = Client(bnc['api_key'], bnc['api_secret'])
         self.trading_pairs_config = trading_pairs_config
-        self.conn = sqlite3.connect('trading_positions.db')
+        self.db_file = 'trading_positions.db'
         self.create_positions_table()
-        self.fast_length = 12
-        self.slow_length = 26
-        self.signal_smoothing = 9
-        self.rsi_length = 14
-        self.rsi_entry_min = 50
-        self.rsi_entry_max = 70
+        self.strategy = CLAUDE_STRATEGY
+        # Incremental strategy state per trading pair
+        self.streams = {}
 
     def telegram(self, message):
         try:
@@ -38,7 +51,11 @@ class CryptoTradingBot:
             logging.error(f"Telegram error: {str(e)}")
 
     def create_positions_table(self):
-        cursor = self.conn.cursor()
+        with transaction(self.db_file) as conn:
+            self._create_positions_table(conn)
+
+    def _create_positions_table(self, conn):
+        cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS positions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -55,70 +72,53 @@ class CryptoTradingBot:
                 updated TEXT             
             )
         ''')
-        self.conn.commit()
-
-    def get_market_data(self, symbol, interval=Client.KLINE_INTERVAL_1HOUR, limit=210):
-        klines = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
-        df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['close'] = df['close'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-        df['symbol'] = symbol
-        # message = f"---Get data for symbol---: {symbol}"
-        # logging.info(message)
-        # print(message)
-        message = f"---Get data for symbol---: {symbol}"
-        logging.info(message)
-        print(message)
-        return df
-
-    def calculate_indicators(self, df):
-        macd = ta.trend.MACD(df['close'], window_slow=self.slow_length, window_fast=self.fast_length, window_sign=self.signal_smoothing)
-        df['macd'] = macd.macd()
-        df['signal'] = macd.macd_signal()
-        df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=self.rsi_length).rsi()
-        message = f"Indicators: madc: {df['macd'].iloc[-1]}, signal: {df['signal'].iloc[-1]}, rsi: {df['rsi'].iloc[-1]}"
-        logging.info(message)
-        print(message)
-
-        return df
-
-    def generate_buy_signal(self, df):
-        # Store each condition separately
-        conditions = {
-            'macd_cross': (df['macd'] > df['signal']) & (df['macd'].shift() <= df['signal'].shift()),
-            'macd_above_zero': (df['macd'] > 0),
-            'rsi_cross': (df['rsi'].shift(1) < self.rsi_entry_min) & (df['rsi'] > self.rsi_entry_min),
-            'rsi_below_max': (df['rsi'] < self.rsi_entry_max),
-            'price_above_ema200': (df['close'] > df['close'].ewm(span=200).mean())
-            #'volume_above_avg': (df['volume'] > df['volume'].rolling(20).mean())
-        }
-        
-        # Combine all conditions
-        df['buy_signal'] = pd.Series(True, index=df.index)
-        for cond_name, cond in conditions.items():
-            df['buy_signal'] = df['buy_signal'] & cond
-        
-        # Check if current bar has signal
-        has_signal = df['buy_signal'].iloc[-1]
-        
+
+    def history_limit(self, trading_pair, interval=Client.KLINE_INTERVAL_1HOUR):
+        # Full history for a new (or stale) state, otherwise the candles since the last one it consumed
+        stream = self.streams.get(trading_pair)
+        interval_ms = interval_to_milliseconds(interval)
+        if stream is None or stream.open_time is None or stream.open_time < time.time() * 1000 - (RECENT_CANDLES - 1) * interval_ms:
+            return STRATEGY_HISTORY
+        return RECENT_CANDLES
+
+    def strategy_signal(self, trading_pair, klines, interval=Client.KLINE_INTERVAL_1HOUR, closed=True):
+        """
+        Buy signal of the last candle of klines (REST layout) from the pair's
+        incremental strategy state. Closed candles the state has not seen are
+        fed to it one at a time, all of them when the state is new or klines do
+        not continue it. With closed=False an open last candle is only peeked at.
+        ema_200 covers everything the state has seen, not only the last 210
+        candles as before (see STRATEGY_HISTORY).
+        """
+        now = int(time.time() * 1000)
+        done = [kline for kline in klines if kline[6] < now]
+        stream = self.streams.get(trading_pair)
+        if stream is None or stream.open_time is None or (done and done[0][0] > stream.open_time + interval_to_milliseconds(interval)):
+            stream = self.streams[trading_pair] = self.strategy.stream()
+        for kline in done:
+            if stream.open_time is None or kline[0] > stream.open_time:
+                stream.update(float(kline[4]), kline[0])
+        has_signal, conditions = stream.last
+        if not closed and klines and klines[-1][6] >= now:
+            has_signal, conditions = stream.peek(float(klines[-1][4]))
+
+        if stream.history:
+            values = stream.history[-1]
+            message = f"Indicators: madc: {values['macd']}, signal: {values['signal']}, rsi: {values['rsi']}"
+            logging.info(message)
+            print(message)
         if has_signal:
-            message = f"Buy signal generated({df['symbol'].iloc[-1]}): {has_signal}"
+            message = f"Buy signal generated({trading_pair}): {has_signal}"
             logging.info(message)
             print(message)
         else:
             # Print which conditions failed
-            failed_conditions = []
-            for cond_name, cond in conditions.items():
-                if not cond.iloc[-1]:
-                    failed_conditions.append(cond_name)
-            
+            failed_conditions = [name for name, held in conditions.items() if not held]
             if failed_conditions:
-                message = f"No buy signal({df['symbol'].iloc[-1]}). Failed conditions: {', '.join(failed_conditions)}"
+                message = f"No buy signal({trading_pair}). Failed conditions: {', '.join(failed_conditions)}"
                 logging.info(message)
                 print(message)
-        
-        return df
+        return has_signal
 
     def place_buy_order(self, symbol, quantity):
         try:
@@ -140,22 +140,7 @@ class CryptoTradingBot:
 
     def place_sell_order(self, symbol, quantity, price):
         try:
-            price_filter = self.get_price_filter(symbol)
-            if not price_filter:
-                raise Exception("PRICE_FILTER not found for the symbol")
-            
-            # Adjust the price to be within the allowed limits
-            price = max(price_filter['minPrice'], min(price, price_filter['maxPrice']))
-            price = round(price - (price % price_filter['tickSize']), 8)
-            
-            order = self.client.create_order(
-                symbol=symbol,
-                side=Client.SIDE_SELL,
-                type=Client.ORDER_TYPE_LIMIT,
-                timeInForce=Client.TIME_IN_FORCE_GTC,
-                quantity=quantity,
-                price=str(price)
-            )
+            order = self.client.create_order(**self.sell_order_params(symbol_rules(self.client, symbol), quantity, price))
             return order
         except BinanceAPIException as e:
             message = f"Error placing sell order: {e}"
@@ -164,15 +149,28 @@ class CryptoTradingBot:
             send_telegram_message(message)
             return None
 
+    def sell_order_params(self, rules, quantity, price):
+        if rules is None or not rules.has_price_filter:
+            raise Exception("PRICE_FILTER not found for the symbol")
+        
+        # Price on the tick grid and within the allowed limits, exact decimal strings
+        return {
+            'symbol': rules.symbol,
+            'side': Client.SIDE_SELL,
+            'type': Client.ORDER_TYPE_LIMIT,
+            'timeInForce': Client.TIME_IN_FORCE_GTC,
+            'quantity': format_decimal(rules.quantity(quantity)),
+            'price': format_decimal(rules.price(price))
+        }
+
     def store_position(self, trading_pair, entry_price, quantity, take_profit_price, buy_order_id, sell_order_id):
         try:
-            cursor = self.conn.cursor()
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute('''
-                INSERT INTO positions (trading_pair, entry_price, quantity, take_profit_price, status, buy_order_id, sell_order_id, created, updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (trading_pair, entry_price, quantity, take_profit_price, 'open', buy_order_id, sell_order_id, current_time, current_time))
-            self.conn.commit()
+            with transaction(self.db_file) as conn:
+                conn.execute('''
+                    INSERT INTO positions (trading_pair, entry_price, quantity, take_profit_price, status, buy_order_id, sell_order_id, created, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (trading_pair, entry_price, quantity, take_profit_price, 'open', buy_order_id, sell_order_id, current_time, current_time))
         except sqlite3.Error as e:
             error_message = f"Database error in store_position: {str(e)}"
             logging.error(error_message)
@@ -181,14 +179,13 @@ class CryptoTradingBot:
 
     def update_position(self, position_id, actual_profit, actual_profit_percentage):
         try:
-            cursor = self.conn.cursor()
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute('''
-                UPDATE positions
-                SET status = ?, actual_profit = ?, actual_profit_percentage = ?, updated = ?
-                WHERE id = ?
-            ''', ('closed', actual_profit, actual_profit_percentage, current_time, position_id))
-            self.conn.commit()
+            with transaction(self.db_file) as conn:
+                conn.execute('''
+                    UPDATE positions
+                    SET status = ?, actual_profit = ?, actual_profit_percentage = ?, updated = ?
+                    WHERE id = ?
+                ''', ('closed', actual_profit, actual_profit_percentage, current_time, position_id))
         except sqlite3.Error as e:
             error_message = f"Database error in update_position: {str(e)}"
             logging.error(error_message)
@@ -196,17 +193,8 @@ class CryptoTradingBot:
             raise
     
     def adjust_amount(self, amount, step_size):
-        # Convert step_size to a string and check if it has a decimal part
-        step_size_str = str(step_size)
-        if '.' in step_size_str:
-            # If there's a decimal part, calculate the number of decimal places
-            decimal_places = len(step_size_str.split('.')[1])
-        else:
-            # If there's no decimal part, set decimal_places to 0
-            decimal_places = 0
-
-        # Ensure the quantity is rounded down to the nearest stepSize
-        adjusted_amount = round(amount - (amount % step_size), decimal_places)
+        # Ensure the quantity is rounded down to the nearest stepSize, in exact decimal arithmetic
+        adjusted_amount = float(quantizer(step_size)(amount))
 
         # Check if adjusted amount is 0 or less, which would be invalid
         if adjusted_amount <= 0:
@@ -214,104 +202,218 @@ class CryptoTradingBot:
         
         return adjusted_amount
 
-
-    
+    # Symbol filters come from the shared exchange info cache, no request per order
     def get_lot_size(self, symbol):
-        info = self.client.get_symbol_info(symbol)
-        for filt in info['filters']:
-            if filt['filterType'] == 'LOT_SIZE':
-                return {
-                    'minQty': float(filt['minQty']),
-                    'maxQty': float(filt['maxQty']),
-                    'stepSize': float(filt['stepSize'])
-                }
-        return None
+        rules = symbol_rules(self.client, symbol)
+        if rules is None or not rules.has_lot_size:
+            return None
+        return {
+            'minQty': float(rules.min_qty),
+            'maxQty': float(rules.max_qty),
+            'stepSize': float(rules.step_size)
+        }
 
     def get_price_filter(self, symbol):
         """ Refers to price """
-        info = self.client.get_symbol_info(symbol)
-        for filt in info['filters']:
-            if filt['filterType'] == 'PRICE_FILTER':
-                return {
-                    'minPrice': float(filt['minPrice']),
-                    'maxPrice': float(filt['maxPrice']),
-                    'tickSize': float(filt['tickSize'])
-                }
-        return None
+        rules = symbol_rules(self.client, symbol)
+        if rules is None or not rules.has_price_filter:
+            return None
+        return {
+            'minPrice': float(rules.min_price),
+            'maxPrice': float(rules.max_price),
+            'tickSize': float(rules.tick_size)
+        }
 
     def get_notional_filter(self, symbol):
         """Refers to quantity for limit_stop_loss"""
-        info = self.client.get_symbol_info(symbol)
-        for filt in info['filters']:
-            if filt['filterType'] == 'MIN_NOTIONAL':
-                return float(filt['minNotional'])
-        return None
+        rules = symbol_rules(self.client, symbol)
+        if rules is None or not rules.has_notional:
+            return None
+        return float(rules.min_notional)
+
+    def trade_pair(self, trading_pair, config, closed=False):
+        # closed=True evaluates the candle that just closed instead of the open one
+        klines = get_klines(self.client, trading_pair, Client.KLINE_INTERVAL_1HOUR, self.history_limit(trading_pair), closed)
+        if self.strategy_signal(trading_pair, klines, closed=closed):
+            account = self.client.get_account()
+            usdc_balance = float(next(asset['free'] for asset in account['balances'] if asset['asset'] == 'USDC'))
+
+            quantity = self.investment_amount(trading_pair, config, usdc_balance)
+            if quantity is None:
+                return
+            
+            # Place the buy order
+            buy_order = self.place_buy_order(trading_pair, quantity)
+
+            if buy_order:
+                message = f"Buy order placed for: {trading_pair}, amount: {quantity}"
+                print(message)
+                self.telegram(message)
+                logging.info(message)
+                entry_price = float(buy_order['fills'][0]['price'])
+                
+                quantity = float(buy_order['executedQty'])
+                take_profit_price = entry_price * (1 + config['take_profit_percentage'])
+                sell_order = self.place_sell_order(trading_pair, quantity, take_profit_price)
+                logging.info(f"Entry Price: {entry_price}, Quantity: {quantity}, Take Profit: {take_profit_price}")
+
+                if sell_order:            
+                    message = f"Sell order placed for {trading_pair}"
+                    print(message)
+                    logging.info(message)
+                    self.telegram(message)
+                    self.store_position(trading_pair, entry_price, quantity, take_profit_price, buy_order['orderId'], sell_order['orderId'])
+
+    def investment_amount(self, trading_pair, config, usdc_balance):
+        # Specify the fixed amount of USDC to invest for each trading pair
+        investment_amount = max(10,math.floor(config.get('percentage_investment_amount', None) * usdc_balance))
+
+        if not investment_amount:
+            message = f"Fixed investment amount not set for {trading_pair}. Skipping..."
+            logging.info(message)
+            print(message)
+            return None
 
-    def run(self):
+        # Ensure that the USDC balance is enough for the fixed investment
+        if investment_amount > usdc_balance :
+            message = f"Not enough USDC balance to place the trade for {trading_pair}. Required: {investment_amount}, Available: {usdc_balance}"
+            logging.info(message)
+            print(message)
+            return None
+        
+        # Adjust the amount to be within the allowed step size
+        return investment_amount #self.adjust_amount(amount, float(lot_size['stepSize']))
+
+    def housekeeping(self):
+        self.check_completed_orders()
+        self.heartbeat += 1
+        if self.heartbeat % 24 == 0:
+            self.telegram('Heartbeat - Claude is alive')
+            logging.info('Heartbeat - Claude is alive')
+
+    def run(self, event_driven=True, stream=True):
+        """
+        Evaluates every pair when its hourly candle closes (stream=False polls
+        REST on the boundary instead of using the kline stream). event_driven=False
+        keeps the old loop that sleeps an hour between iterations.
+        """
+        if event_driven:
+            run_on_candle_close(list(self.trading_pairs_config), Client.KLINE_INTERVAL_1HOUR,
+                                lambda trading_pair: self.trade_pair(trading_pair, self.trading_pairs_config[trading_pair], closed=True),
+                                client=self.client, stream=stream, on_cycle=self.housekeeping)
+            return
         while True:
             for trading_pair, config in self.trading_pairs_config.items():
-                df = self.get_market_data(trading_pair)
-                df = self.calculate_indicators(df)
-                df = self.generate_buy_signal(df)
-                if df['buy_signal'].iloc[-1]:
-                    account = self.client.get_account()
-                    usdc_balance = float(next(asset['free'] for asset in account['balances'] if asset['asset'] == 'USDC'))
-
-                    # Specify the fixed amount of USDC to invest for each trading pair
-                    investment_amount = max(10,math.floor(config.get('percentage_investment_amount', None) * usdc_balance))
-
-                    if not investment_amount:
-                        message = f"Fixed investment amount not set for {trading_pair}. Skipping..."
-                        logging.info(message)
-                        print(message)
-                        continue
-
-                   
-
-                    # Ensure that the USDC balance is enough for the fixed investment
-                    if investment_amount > usdc_balance :
-                        message = f"Not enough USDC balance to place the trade for {trading_pair}. Required: {investment_amount}, Available: {usdc_balance}"
-                        logging.info(message)
-                        print(message)
-                        continue
-                    
-                    # Adjust the amount to be within the allowed step size
-                    quantity = investment_amount #self.adjust_amount(amount, float(lot_size['stepSize']))
-                    
-                    # Place the buy order
-                    buy_order = self.place_buy_order(trading_pair, quantity)
-
-                    if buy_order:
-                        message = f"Buy order placed for: {trading_pair}, amount: {quantity}"
-                        print(message)
-                        self.telegram(message)
-                        logging.info(message)
-                        entry_price = float(buy_order['fills'][0]['price'])
-                        
-                        quantity = float(buy_order['executedQty'])
-                        take_profit_price = entry_price * (1 + config['take_profit_percentage'])
-                        sell_order = self.place_sell_order(trading_pair, quantity, take_profit_price)
-                        logging.info(f"Entry Price: {entry_price}, Quantity: {quantity}, Take Profit: {take_profit_price}")
-
-                        if sell_order:            
-                            message = f"Sell order placed for {trading_pair}"
-                            print(message)
-                            logging.info(message)
-                            self.telegram(message)
-                            self.store_position(trading_pair, entry_price, quantity, take_profit_price, buy_order['orderId'], sell_order['orderId'])
-
-            self.check_completed_orders()
-            self.heartbeat += 1
-            if self.heartbeat % 24 == 0:
-                self.telegram('Heartbeat - Claude is alive')
-                logging.info('Heartbeat - Claude is alive')
+                self.trade_pair(trading_pair, config)
+            self.housekeeping()
             time.sleep(3600)  # Wait for 1 hour before next iteration
 
+    async def async_telegram(self, message):
+        # telegram() for coroutines, asyncio.run cannot be nested in the running loop
+        try:
+            config = telegram_config()
+            await send_telegram_message(config['token'], config['chat_id'], message)
+            logging.info(f"Telegram message sent: {message}")
+        except Exception as e: 
+            logging.error(f"Telegram error: {str(e)}")
+
+    async def evaluate_pair_async(self, client, semaphore, trading_pair, interval, closed=True):
+        # Only the REST round-trip counts against the cap, the indicators take milliseconds
+        async with semaphore:
+            klines = await client.get_klines(symbol=trading_pair, interval=interval, limit=self.history_limit(trading_pair, interval))
+        return self.strategy_signal(trading_pair, klines, interval, closed)
+
+    async def buy_async(self, client, trading_pair, config):
+        # The account lock covers balance check, buy, take profit and position row,
+        # so the next pair sees the balance this order left
+        async with self.order_lock:
+            account = await client.get_account()
+            usdc_balance = float(next(asset['free'] for asset in account['balances'] if asset['asset'] == 'USDC'))
+            quantity = self.investment_amount(trading_pair, config, usdc_balance)
+            if quantity is None:
+                return
+
+            try:
+                buy_order = await client.create_order(
+                    symbol=trading_pair,
+                    side=Client.SIDE_BUY,
+                    type=Client.ORDER_TYPE_MARKET,
+                    quoteOrderQty=quantity
+                )
+            except BinanceAPIException as e:
+                message = f"Error placing buy order: {e}"
+                print(message)
+                logging.error(message)
+                return
+
+            message = f"Buy order placed for: {trading_pair}, amount: {quantity}"
+            print(message)
+            await self.async_telegram(message)
+            logging.info(message)
+            entry_price = float(buy_order['fills'][0]['price'])
+
+            quantity = float(buy_order['executedQty'])
+            take_profit_price = entry_price * (1 + config['take_profit_percentage'])
+            try:
+                rules = await shared_exchange_info.get_async(client, trading_pair)
+                sell_order = await client.create_order(**self.sell_order_params(rules, quantity, take_profit_price))
+            except BinanceAPIException as e:
+                message = f"Error placing sell order: {e}"
+                print(message)
+                logging.error(message)
+                await self.async_telegram(message)
+                return
+            logging.info(f"Entry Price: {entry_price}, Quantity: {quantity}, Take Profit: {take_profit_price}")
+
+            message = f"Sell order placed for {trading_pair}"
+            print(message)
+            logging.info(message)
+            await self.async_telegram(message)
+            self.store_position(trading_pair, entry_price, quantity, take_profit_price, buy_order['orderId'], sell_order['orderId'])
+
+    async def trade_pair_async(self, client, semaphore, trading_pair, config, interval, closed=True):
+        try:
+            if await self.evaluate_pair_async(client, semaphore, trading_pair, interval, closed):
+                await self.buy_async(client, trading_pair, config)
+        except Exception as e:
+            message = f"Error trading {trading_pair}: {e}"
+            print(message)
+            logging.error(message)
+
+    async def run_cycle_async(self, client, semaphore, interval=Client.KLINE_INTERVAL_1HOUR, closed=True):
+        await asyncio.gather(*(self.trade_pair_async(client, semaphore, trading_pair, config, interval, closed)
+                               for trading_pair, config in self.trading_pairs_config.items()))
+
+    async def run_async(self, max_concurrency=50, interval=Client.KLINE_INTERVAL_1HOUR, delay=1):
+        """
+        asyncio run mode: at every candle close all pairs are fetched and
+        evaluated concurrently over python-binance's AsyncClient, with at most
+        max_concurrency requests in flight. Orders are serialized per account.
+        Start with asyncio.run(bot.run_async()).
+        """
+        bnc = binance_config()
+        client = await AsyncClient.create(bnc['api_key'], bnc['api_secret'])
+        semaphore = asyncio.Semaphore(max_concurrency)
+        self.order_lock = asyncio.Lock()
+        try:
+            while True:
+                now = int(time.time() * 1000)
+                await asyncio.sleep((next_boundary(now, interval) - now) / 1000 + delay)
+                started = time.monotonic()
+                await self.run_cycle_async(client, semaphore, interval)
+                logging.info(f"Evaluated {len(self.trading_pairs_config)} pairs in {time.monotonic() - started:.2f}s")
+                # Order housekeeping still uses the blocking client
+                await asyncio.to_thread(self.housekeeping)
+        finally:
+            await client.close_connection()
+
 
     def check_completed_orders(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, trading_pair, entry_price, quantity, sell_order_id FROM positions WHERE status = 'open'")
-        open_positions = cursor.fetchall()
+        conn = get_connection(self.db_file)
+        try:
+            open_positions = conn.execute("SELECT id, trading_pair, entry_price, quantity, sell_order_id FROM positions WHERE status = 'open'").fetchall()
+        finally:
+            conn.close()
 
         for position in open_positions:
             position_id, trading_pair, entry_price, quantity, sell_order_id = position
@@ -1,12 +1,15 @@
-import sqlite3
 from binance.client import Client
+from brokers.candle_cache import get_klines
+from brokers.exchange_info import format_decimal, quantizer, symbol_rules
 import pandas as pd
 import asyncio
 import time
 from configuration.binance_config import config as binance_config
 from configuration.telegram_config import config as telegram_config
+from db.connection import transaction
 from notifications.telegram import send_telegram_message
-import ta
+from indicators.frames import add_macd_rsi
+from utils.candle_events import run_on_candle_close
 from binance.enums import *
 import logging
 import threading
@@ -34,7 +37,11 @@ stop_loss_percentage = 0.05
 
 # SQLite database setup
 def setup_database():
-    conn = sqlite3.connect('trades.db')
+    with transaction('trades.db') as conn:
+        create_tables(conn)
+    logging.info('Database setup complete')
+
+def create_tables(conn):
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS trades (
@@ -62,20 +69,16 @@ def setup_database():
             is_closed INTEGER DEFAULT 0
         )
     ''')
-    conn.commit()
-    conn.close()
-    logging.info('Database setup complete')
 
 setup_database()
 
 def log_trade(symbol, side, open_price, close_price, profit_loss_percentage, open_datetime, close_datetime, quantity):
-    with sqlite3.connect('trades.db') as conn:
+    with transaction('trades.db') as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO trades (symbol, side, open_price, close_price, profit_loss_percentage, open_datetime, close_datetime, quantity)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (symbol, side, open_price, close_price, profit_loss_percentage, open_datetime, close_datetime, quantity))
-        conn.commit()
     logging.info(f"Trade logged: {symbol} {side} at {open_price}/{close_price} for {quantity} with P/L {profit_loss_percentage}%")
 
 def telegram(message):
@@ -84,8 +87,8 @@ def telegram(message):
     logging.info(f"Telegram message sent: {message}")
 
 # Fetch historical data
-def fetch_historical_data(symbol, interval, limit=300):
-    klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+def fetch_historical_data(symbol, interval, limit=300, closed=False):
+    klines = get_klines(client, symbol, interval, limit, closed)
     df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
     df['close'] = df['close'].astype(float)
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -94,10 +97,7 @@ def fetch_historical_data(symbol, interval, limit=300):
 
 # Calculate indicators
 def calculate_indicators(df):
-    macd = ta.trend.MACD(df['close'], window_slow=slow_length, window_fast=fast_length, window_sign=signal_smoothing)
-    df['macd'] = macd.macd()
-    df['signal'] = macd.macd_signal()
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=rsi_length).rsi()
+    add_macd_rsi(df, fast_length, slow_length, signal_smoothing, rsi_length)
     logging.info("Indicators calculated")
     return df
 
@@ -111,39 +111,34 @@ def generate_signals(df):
     return df
 
 def get_lot_size(symbol):
-    info = client.get_symbol_info(symbol)
-    for filt in info['filters']:
-        if filt['filterType'] == 'LOT_SIZE':
-            return {
-                'minQty': float(filt['minQty']),
-                'maxQty': float(filt['maxQty']),
-                'stepSize': float(filt['stepSize'])
-            }
-    return None
+    # From the shared exchange info cache, no request per order
+    rules = symbol_rules(client, symbol)
+    if rules is None or not rules.has_lot_size:
+        return None
+    return {
+        'minQty': float(rules.min_qty),
+        'maxQty': float(rules.max_qty),
+        'stepSize': float(rules.step_size)
+    }
 
 def adjust_amount(amount, step_size):
-    return round(amount - (amount % step_size), 8)
+    return float(quantizer(step_size)(amount))
 
 def place_buy_order(symbol, amount):
     try:
-        lot_size = get_lot_size(symbol)
-        if not lot_size:
+        rules = symbol_rules(client, symbol)
+        if rules is None or not rules.has_lot_size:
             raise Exception("LOT_SIZE filter not found for the symbol")
 
-        # Ensure the amount is within the allowed range
-        if amount < lot_size['minQty']:
-            raise Exception(f"Amount {amount} is less than the minimum allowed quantity {lot_size['minQty']}")
-        if amount > lot_size['maxQty']:
-            raise Exception(f"Amount {amount} is greater than the maximum allowed quantity {lot_size['maxQty']}")
-
-        # Adjust the amount to be a multiple of stepSize
-        amount = adjust_amount(amount, lot_size['stepSize'])
+        # Ensure the amount is within the allowed range and a multiple of stepSize
+        quantity = rules.check_quantity(amount)
+        amount = float(quantity)
 
         order = client.create_order(
             symbol=symbol,
             side=Client.SIDE_BUY,
             type=Client.ORDER_TYPE_MARKET,
-            quantity=amount
+            quantity=format_decimal(quantity)
         )
         if order:
             logging.info(f"Buy order placed for {symbol} amount {amount}")
@@ -156,6 +151,22 @@ def place_buy_order(symbol, amount):
         logging.error(message)
         return None, None
 
+def stop_loss_order_params(symbol, quantity, stop_price):
+    # Stop and limit price on the symbol's tick grid instead of two decimals
+    rules = symbol_rules(client, symbol)
+    if rules is None:
+        raise Exception(f"No exchange rules for {symbol}, unknown or delisted symbol")
+    price = format_decimal(rules.price(stop_price))
+    return {
+        'symbol': symbol,
+        'side': SIDE_SELL,
+        'type': ORDER_TYPE_STOP_LOSS_LIMIT,
+        'timeInForce': TIME_IN_FORCE_GTC,
+        'quantity': format_decimal(rules.quantity(quantity)),
+        'price': price,
+        'stopPrice': price
+    }
+
 def update_trailing_stop_loss(symbol, stop_loss_order_id, current_stop_loss_price, new_stop_price, quantity):
     try:
         if new_stop_price <= current_stop_loss_price:
@@ -166,15 +177,7 @@ def update_trailing_stop_loss(symbol, stop_loss_order_id, current_stop_loss_pric
             return None  # Order already filled
 
         client.cancel_order(symbol=symbol, orderId=stop_loss_order_id)
-        new_order = client.create_order(
-            symbol=symbol,
-            side=SIDE_SELL,
-            type=ORDER_TYPE_STOP_LOSS_LIMIT,
-            timeInForce=TIME_IN_FORCE_GTC,
-            quantity=quantity,
-            price=str(round(new_stop_price, 2)),
-            stopPrice=str(round(new_stop_price, 2))
-        )
+        new_order = client.create_order(**stop_loss_order_params(symbol, quantity, new_stop_price))
         logging.info(f"Trailing stop loss updated for {symbol}")
         return new_order['orderId']
     except Exception as e:
@@ -184,28 +187,23 @@ def update_trailing_stop_loss(symbol, stop_loss_order_id, current_stop_loss_pric
         return None
 
 def store_open_position(symbol, open_price, stop_loss_price, quantity, open_datetime, stop_loss_order_id):
-    with sqlite3.connect('trades.db') as conn:
+    with transaction('trades.db') as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO open_positions (symbol, open_price, stop_loss_price, quantity, open_datetime, stop_loss_order_id)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (symbol, open_price, stop_loss_price, quantity, open_datetime, stop_loss_order_id))
-        conn.commit()
     logging.info(f"Open position stored for {symbol}")
 
 def close_position(position_id):
-    with sqlite3.connect('trades.db') as conn:
-        cursor = conn.cursor()
-        cursor.execute('UPDATE open_positions SET is_closed = 1 WHERE id = ?', (position_id,))
-        conn.commit()
+    with transaction('trades.db') as conn:
+        conn.execute('UPDATE open_positions SET is_closed = 1 WHERE id = ?', (position_id,))
     logging.info(f"Position {position_id} marked as closed")
 
 def monitor_open_positions():
     while True:
-        with sqlite3.connect('trades.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM open_positions WHERE is_closed = 0')
-            open_positions = cursor.fetchall()
+        with transaction('trades.db') as conn:
+            open_positions = conn.execute('SELECT * FROM open_positions WHERE is_closed = 0').fetchall()
 
         for position in open_positions:
             position_id, symbol, open_price, stop_loss_price, quantity, open_datetime, stop_loss_order_id, _ = position
@@ -227,17 +225,18 @@ def monitor_open_positions():
                 logging.info(sell_message)
                 telegram(sell_message)
             elif new_stop_loss_order_id != stop_loss_order_id:
-                cursor.execute('UPDATE open_positions SET stop_loss_price = ?, stop_loss_order_id = ? WHERE id = ?', 
-                               (new_stop_loss_price, new_stop_loss_order_id, position_id))
-                conn.commit()
+                with transaction('trades.db') as conn:
+                    conn.execute('UPDATE open_positions SET stop_loss_price = ?, stop_loss_order_id = ? WHERE id = ?', 
+                                 (new_stop_loss_price, new_stop_loss_order_id, position_id))
                 logging.info(f"Updated stop loss for {symbol}: new price {new_stop_loss_price}, new order ID {new_stop_loss_order_id}")
 
         time.sleep(60)  # Wait for 1 minute before the next check
 
 # Trading logic
-def trade(symbol):
+def trade(symbol, closed=False):
+    # closed=True evaluates the candle that just closed instead of the open one
     logging.info(f"--- SYMBOL LOOP START ---")
-    df = fetch_historical_data(symbol, timeframe)
+    df = fetch_historical_data(symbol, timeframe, closed=closed)
     df = calculate_indicators(df)
     df = generate_signals(df)
     
@@ -257,15 +256,7 @@ def trade(symbol):
             
             if buy_order:
                 stop_loss_price = current_price * (1 - stop_loss_percentage)
-                stop_loss_order = client.create_order(
-                    symbol=symbol,
-                    side=SIDE_SELL,
-                    type=ORDER_TYPE_STOP_LOSS_LIMIT,
-                    timeInForce=TIME_IN_FORCE_GTC,
-                    quantity=amount,
-                    price=str(round(stop_loss_price, 2)),
-                    stopPrice=str(round(stop_loss_price, 2))
-                )
+                stop_loss_order = client.create_order(**stop_loss_order_params(symbol, amount, stop_loss_price))
                 stop_loss_order_id = stop_loss_order['orderId']
                 message = f"Buy order placed for {symbol} at {current_price}, stop loss at {stop_loss_price}"
                 logging.info(message)
@@ -275,7 +266,8 @@ def trade(symbol):
                 store_open_position(symbol, current_price, stop_loss_price, amount, open_datetime, stop_loss_order_id)
 
 # Main trading loop
-def main():
+def main(event_driven=True, stream=True):
+    # Symbols are traded when their candle closes; event_driven=False keeps the hourly sleep loop
     heartbeat = 0
     telegram('Superman BOT started')
     logging.info('Superman BOT started')
@@ -283,6 +275,18 @@ def main():
     # Start the position monitoring thread
     monitoring_thread = threading.Thread(target=monitor_open_positions)
     monitoring_thread.start()
+
+    if event_driven:
+        def on_cycle():
+            nonlocal heartbeat
+            heartbeat += 1
+            if heartbeat % 24 == 0:
+                telegram('Heartbeat - bot is alive')
+                logging.info('Heartbeat - bot is alive')
+
+        run_on_candle_close(symbols, timeframe, lambda symbol: trade(symbol, closed=True),
+                            client=client, stream=stream, on_cycle=on_cycle)
+        return
     
     while True:
         logging.info(f"Iteration ({heartbeat + 1})")
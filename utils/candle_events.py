@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from binance.helpers import interval_to_milliseconds
+
+from brokers.candle_cache import shared_candle_cache
+from utils.websocket_client import CombinedStreamClient, kline_message_to_rest
+
+# Strategy evaluation driven by candle closes instead of fixed sleeps. Closed
+# candles come from the combined kline stream (the last message of a candle has
+# k.x set) or, without a stream, from a poller that wakes up on the candle
+# boundary and asks REST for the candle that just closed. Either way handlers
+# run within a second of the close, whenever the process was started.
+
+# Weekly candles open on Monday 00:00 UTC, four days after the epoch (a Thursday)
+BOUNDARY_OFFSETS = {'1w': 4 * 24 * 60 * 60 * 1000}
+
+
+def next_boundary(now_ms, interval):
+    """ Open time (epoch ms) of the first candle of interval that starts after now_ms """
+    interval_ms = interval_to_milliseconds(interval)
+    if interval_ms is None:
+        raise ValueError(f"Candle boundaries are not supported for interval {interval}")
+    offset = BOUNDARY_OFFSETS.get(interval, 0)
+    return now_ms - (now_ms - offset) % interval_ms + interval_ms
+
+
+class CandleCloseDispatcher:
+    """
+    Calls handler(symbol, interval, kline) once for every closed candle of a
+    subscribed symbol/interval, kline in the REST layout. The candle is put in
+    the shared candle cache first, so handlers reading klines need no REST
+    call. Handlers run on worker threads and never block the stream; with one
+    worker (the default) they run one after the other like the old loops did.
+    Stream messages are passed on to forward(stream, data) when given.
+    """
+    def __init__(self, forward=None, max_workers=1, candle_cache=None):
+        self.forward = forward
+        self.candle_cache = shared_candle_cache if candle_cache is None else candle_cache
+        self.handlers = {}
+        self.last_open_time = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='candle-close')
+
+    def subscribe(self, symbol, interval, handler):
+        self.handlers.setdefault((symbol.upper(), interval), []).append(handler)
+
+    def keys(self):
+        return list(self.handlers)
+
+    def on_kline(self, stream, data):
+        # default_handler of a CombinedStreamClient
+        k = data['k']
+        if k['x']:
+            self.on_closed(data['s'], k['i'], kline_message_to_rest(k))
+        if self.forward is not None:
+            self.forward(stream, data)
+
+    def on_closed(self, symbol, interval, kline):
+        """ Queues the handlers of a closed candle. Returns False for repeated or superseded candles. """
+        key = (symbol.upper(), interval)
+        with self.lock:
+            if key not in self.handlers or kline[0] <= self.last_open_time.get(key, -1):
+                return False
+            self.last_open_time[key] = kline[0]
+        self.candle_cache.put_kline(symbol, interval, kline)
+        # Candles replayed after a reconnect are stale once a newer one has closed too
+        if kline[6] + interval_to_milliseconds(interval) < time.time() * 1000:
+            return False
+        for handler in self.handlers[key]:
+            self.submit(handler, symbol, interval, kline)
+        return True
+
+    def submit(self, handler, *args):
+        return self.executor.submit(self._run, handler, *args)
+
+    def _run(self, handler, *args):
+        try:
+            handler(*args)
+        except Exception as e:
+            print(f"Candle close handler failed {args[:2]}:", e)
+            logging.exception(f"Candle close handler failed {args[:2]}")
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class BoundaryPoller:
+    """
+    Closed candles without a stream. Sleeps until the next candle boundary of
+    the subscribed intervals, then polls REST through the candle cache until the
+    candle that just closed and the one after it are there, and hands the closed
+    one to the dispatcher.
+    """
+    def __init__(self, client, dispatcher, delay=0.2, retry_delay=0.5, max_wait=30):
+        self.client = client
+        self.dispatcher = dispatcher
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self.max_wait = max_wait
+        self.stopped = threading.Event()
+
+    def poll(self, symbol, interval, boundary):
+        open_time = boundary - interval_to_milliseconds(interval)
+        deadline = time.monotonic() + self.max_wait
+        while not self.stopped.is_set():
+            try:
+                klines = self.dispatcher.candle_cache.get_klines(self.client, symbol, interval, 2)
+            except Exception as e:
+                print(f"Failed to poll klines for {symbol} {interval}:", e)
+                klines = []
+            closed = [kline for kline in klines if kline[0] == open_time]
+            if closed and klines[-1][0] >= boundary:
+                return self.dispatcher.on_closed(symbol, interval, closed[0])
+            if time.monotonic() >= deadline:
+                print(f"No closed {interval} candle for {symbol} at {open_time} after {self.max_wait}s")
+                return False
+            self.stopped.wait(self.retry_delay)
+        return False
+
+    def run(self):
+        while not self.stopped.is_set():
+            now = int(time.time() * 1000)
+            boundaries = {key: next_boundary(now, key[1]) for key in self.dispatcher.keys()}
+            boundary = min(boundaries.values())
+            if self.stopped.wait((boundary - now) / 1000 + self.delay):
+                break
+            for (symbol, interval), at in boundaries.items():
+                if at == boundary:
+                    self.poll(symbol, interval, boundary)
+
+    def start(self):
+        self.stopped.clear()
+        thread = threading.Thread(target=self.run, name='candle-poller', daemon=True)
+        thread.start()
+        return [thread]
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_candle_events(dispatcher, client=None, stream=True):
+    """
+    Starts feeding dispatcher the closed candles of its subscriptions, from the
+    combined kline stream or from a BoundaryPoller. Returns the started source;
+    source.stop() ends it.
+    """
+    keys = dispatcher.keys()
+    if stream:
+        symbols = sorted({symbol for symbol, _ in keys})
+        intervals = sorted({interval for _, interval in keys})
+        source = CombinedStreamClient(symbols, intervals, default_handler=dispatcher.on_kline, client=client)
+    else:
+        source = BoundaryPoller(client, dispatcher)
+    source.start()
+    return source
+
+
+def run_on_candle_close(symbols, interval, handler, client=None, stream=True, on_cycle=None, cycle_delay=5):
+    """
+    Event-driven replacement for `for symbol in symbols: ...; time.sleep(...)`
+    loops: handler(symbol) runs as soon as a candle of symbol closes. on_cycle()
+    (heartbeats, order housekeeping) runs once per candle, cycle_delay seconds
+    after the boundary, after the handlers queued by then. Blocks until
+    interrupted.
+    """
+    dispatcher = CandleCloseDispatcher()
+    for symbol in symbols:
+        dispatcher.subscribe(symbol, interval, lambda symbol, interval, kline: handler(symbol))
+    source = start_candle_events(dispatcher, client, stream)
+    try:
+        while True:
+            now = int(time.time() * 1000)
+            time.sleep((next_boundary(now, interval) - now) / 1000 + cycle_delay)
+            if on_cycle is not None:
+                dispatcher.submit(on_cycle)
+    finally:
+        source.stop()
+        dispatcher.close()
@@ -1,14 +1,19 @@
 
+import functools
 import os
-from brokers.binance import binance_client, fetch_and_process_historical_data, process_trading_pairs, trading_pairs
+from brokers.binance import backfill_historical_data, binance_client, fetch_and_process_historical_data, process_trading_pairs, trading_pairs
 from configuration.binance_config import config 
 from db.database import setup_database
 
 from binance.client import Client
 
-def get_data():
+# 1h candles are the base of the 4h/1d/1w rollups (db.database.ROLLUPS)
+def get_data(incremental=True, max_workers=4, intervals=(Client.KLINE_INTERVAL_1DAY, Client.KLINE_INTERVAL_1HOUR)):
     setup_database()
     conf = config()
     client = binance_client(conf)
     pairs = trading_pairs()
-    process_trading_pairs(client, pairs, fetch_and_process_historical_data)
\ No newline at end of file
+    # Incremental mode resumes from the stored candles and only fills the gaps
+    process_fn = backfill_historical_data if incremental else fetch_and_process_historical_data
+    for interval in intervals:
+        process_trading_pairs(client, pairs, functools.partial(process_fn, interval=interval), max_workers=max_workers)
\ No newline at end of file
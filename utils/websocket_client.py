@@ -1,29 +1,33 @@
 import websocket
 import json
+import logging
+import queue
+import threading
+import time
 
-from db.database import insert_data
+from brokers.binance import process_kline, trading_pairs
+from db.database import insert_market_data
 from helpers.data_manipulation import transform_timestamp_to_date
 
+COMBINED_STREAM_URL = "wss://stream.binance.com:9443/stream"
+# Binance accepts up to 1024 streams per connection and 5 incoming messages per second
+MAX_STREAMS_PER_CONNECTION = 200
+
+# Write-behind buffer shared by the websocket callbacks, created on first use
+write_behind = None
+
+def get_write_behind():
+    global write_behind
+    if write_behind is None:
+        write_behind = KlineWriteBehind()
+    return write_behind
+
 # WebSocket Callbacks
 def on_message(ws, message):
     data = json.loads(message)
-    # Simplified: Assuming data contains the necessary fields
-     # Example data extraction (adjust according to actual message format)
-    start_time = transform_timestamp_to_date(data['k']['t'])  # Start Timestamp of the candlestick
-    end_time = transform_timestamp_to_date(data['k']['T'])  # End Timestamp of the candlestick
-    open_price = data['k']['o']
-    high_price = data['k']['h']
-    low_price = data['k']['l']
-    close_price = data['k']['c']
-    volume = data['k']['v']
-    symbol = data['s']
-    event_timestamp = transform_timestamp_to_date(data['E'])
-    
-    # Insert extracted data into SQLite database
-    insert_data(event_timestamp,start_time, end_time, open_price, high_price, low_price, close_price, volume, symbol)
-
-    print("Received a message")
-    print(json.loads(message))
+    if data.get('e') == 'kline':
+        # Only closed candles reach the database, in batches from the writer thread
+        get_write_behind().on_kline(None, data)
 
 def on_open(ws):
     subscribe_message = json.dumps({
@@ -43,5 +47,202 @@ def start_websocket():
                                 on_message=on_message,
                                 on_error = on_error,
                                 on_open=on_open)
-    ws.run_forever()    
+    ws.run_forever()
+
+
+def kline_stream_name(symbol, interval):
+    return f"{symbol.lower()}@kline_{interval}"
+
+def kline_message_to_list(k):
+    # Same layout as a REST kline so both paths share process_kline
+    return [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T']]
+
+def kline_message_to_rest(k):
+    # All twelve REST kline fields, for the candle cache. Gap-filled messages lack the volume details.
+    return [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'],
+            k.get('q', '0'), k.get('n', 0), k.get('V', '0'), k.get('Q', '0'), '0']
+
+
+
+class KlineWriteBehind:
+    """
+    Buffered persistence for websocket klines. The latest in-progress candle of
+    every symbol/interval is kept in memory only; closed candles (k.x) are queued
+    and upserted in batches by a background thread once batch_size rows are
+    waiting or flush_interval seconds have passed. on_kline never touches disk.
+    A failed write (e.g. "database is locked") is retried up to max_retries
+    times with a doubling delay before the batch is dropped.
+    """
+    def __init__(self, batch_size=500, flush_interval=1.0, max_retries=3, retry_delay=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.open_candles = {}
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='kline-writer', daemon=True)
+        self.thread.start()
+
+    def on_kline(self, stream, data):
+        k = data['k']
+        key = (data['s'], k['i'])
+        if not k['x']:
+            self.open_candles[key] = k
+            return
+        self.open_candles.pop(key, None)
+        self.queue.put((data['s'], k['i'], data['E'], kline_message_to_list(k)))
+
+    def latest(self, symbol, interval):
+        # Most recent in-progress candle, None once it has closed
+        return self.open_candles.get((symbol, interval))
+
+    def _run(self):
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            if batch:
+                self.flush(batch)
+
+    def flush(self, batch):
+        rows = [process_kline(kline, symbol, interval, transform_timestamp_to_date(event_time))
+                for symbol, interval, event_time, kline in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                insert_market_data(rows)
+                return True
+            except Exception as e:
+                # New klines keep queueing up meanwhile and go out with the next batch
+                logging.error(f"Failed to write {len(rows)} websocket klines (attempt {attempt + 1} of {self.max_retries + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        print(f"Dropped {len(rows)} websocket klines after {self.max_retries + 1} failed writes")
+        return False
+
+    def close(self):
+        # Writes whatever is still queued before returning
+        self.queue.put(None)
+        self.thread.join()
+
+
+class CombinedStreamClient:
+    """
+    Live klines for many symbols and intervals over Binance combined streams.
+    Streams are spread over as many connections as needed, every connection
+    resubscribes after a reconnect and closed candles missed while disconnected
+    are fetched over REST (when a client is given). Messages are routed by their
+    stream name: route() registers a handler for one stream, everything else goes
+    to default_handler(stream, data), by default the shared KlineWriteBehind.
+    """
+    def __init__(self, symbols=None, intervals=('1d',), default_handler=None, client=None,
+                 max_streams_per_connection=MAX_STREAMS_PER_CONNECTION, reconnect_delay=1, max_reconnect_delay=60):
+        self.symbols = symbols or trading_pairs()
+        self.intervals = list(intervals)
+        self.default_handler = default_handler or get_write_behind().on_kline
+        self.client = client
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.handlers = {}
+        # stream name -> (symbol, interval) and open time of the last candle received
+        self.streams = {kline_stream_name(symbol, interval): (symbol, interval)
+                        for symbol in self.symbols for interval in self.intervals}
+        self.last_open_time = {}
+        names = list(self.streams)
+        self.chunks = [names[i:i + max_streams_per_connection] for i in range(0, len(names), max_streams_per_connection)]
+        self.connections = []
+        self.running = False
+
+    def route(self, stream, handler):
+        self.handlers[stream] = handler
+
+    def on_message(self, ws, message):
+        payload = json.loads(message)
+        stream = payload.get('stream')
+        if stream is None:
+            return  # subscription acknowledgements
+        self.dispatch(stream, payload['data'])
+
+    def dispatch(self, stream, data):
+        if data.get('e') == 'kline':
+            # Gap fills run next to the live stream, an older candle must not move the mark back
+            self.last_open_time[stream] = max(data['k']['t'], self.last_open_time.get(stream, data['k']['t']))
+        self.handlers.get(stream, self.default_handler)(stream, data)
+
+    def subscribe(self, ws, streams):
+        # Resubscribing on every open restores the subscriptions after a reconnect
+        ws.send(json.dumps({"method": "SUBSCRIBE", "params": streams, "id": int(time.time() * 1000)}))
+
+    def fill_gaps(self, streams):
+        if self.client is None:
+            return
+        for stream in streams:
+            if stream not in self.last_open_time or not self.running:
+                continue
+            symbol, interval = self.streams[stream]
+            try:
+                klines = self.client.get_historical_klines(symbol, interval, self.last_open_time[stream])
+            except Exception as e:
+                print(f"Failed to fill the gap of {stream}: {e}")
+                continue
+            event_time = int(time.time() * 1000)
+            for kline in klines:
+                data = {'e': 'kline', 'E': event_time, 's': symbol, 'k': {
+                    't': kline[0], 'T': kline[6], 's': symbol, 'i': interval,
+                    'o': kline[1], 'h': kline[2], 'l': kline[3], 'c': kline[4], 'v': kline[5],
+                    'x': kline[6] < event_time
+                }}
+                self.dispatch(stream, data)
+
+    def run_connection(self, streams):
+        delay = self.reconnect_delay
+        connected_before = False
+        while self.running:
+            def on_open(ws):
+                nonlocal delay
+                delay = self.reconnect_delay
+                self.subscribe(ws, streams)
+                # REST calls for every stream would block the socket's read loop (and its pings), so they run aside
+                if connected_before:
+                    threading.Thread(target=self.fill_gaps, args=(streams,), name='gap-fill', daemon=True).start()
+
+            ws = websocket.WebSocketApp(COMBINED_STREAM_URL,
+                                        on_message=self.on_message,
+                                        on_error=on_error,
+                                        on_open=on_open)
+            self.connections.append(ws)
+            ws.run_forever(ping_interval=180, ping_timeout=10)
+            self.connections.remove(ws)
+            connected_before = True
+            if self.running:
+                print(f"### stream connection lost, reconnecting in {delay}s ###")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self):
+        self.running = True
+        threads = [threading.Thread(target=self.run_connection, args=(streams,), daemon=True) for streams in self.chunks]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def stop(self):
+        self.running = False
+        for ws in list(self.connections):
+            ws.close()
+
+    def run_forever(self):
+        for thread in self.start():
+            thread.join()
+
 
+def start_combined_websocket(intervals=('1d',), client=None):
+    CombinedStreamClient(trading_pairs(), intervals, client=client).run_forever()